@@ -0,0 +1,77 @@
+"""
+Benchmark: janelas de mergulho hora a hora vs. vetorizadas (find_dive_windows)
+
+Uso: python benchmarks/bench_dive_windows.py [locais] [horas] [repetições]
+"""
+import os
+import sys
+import time
+from array import array
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.dive_windows import STATUS_METRICS, find_dive_windows
+from src.services.weather_forecast import FORECAST_METRICS, HourlyForecast
+from src.services.weather_service import WeatherService
+
+
+def build_forecasts(sites: int, hours: int) -> dict:
+    rng = np.random.default_rng(42)
+    start = int(time.time()) // 3600 * 3600
+    scale = {'waveHeight': 2.5, 'windSpeed': 30, 'gust': 40, 'precipitation': 60, 'visibility': 12}
+    forecasts = {}
+    for site in range(sites):
+        times = array('q', range(start, start + hours * 3600, 3600))
+        metrics = {
+            metric: array('f', (rng.random(hours) * scale.get(metric, 20)).astype(np.float32).tobytes())
+            for metric in FORECAST_METRICS
+        }
+        forecasts[f'site-{site}'] = HourlyForecast(times, metrics)
+    return forecasts
+
+
+def scalar_windows(service: WeatherService, forecasts: dict, min_hours: int) -> dict:
+    windows = {}
+    for site, forecast in forecasts.items():
+        runs, run = [], 0
+        for hour in forecast.hours():
+            if service._calculate_hour_status(hour) == 'GREEN':
+                run += 1
+                continue
+            if run >= min_hours:
+                runs.append(run)
+            run = 0
+        if run >= min_hours:
+            runs.append(run)
+        windows[site] = runs
+    return windows
+
+
+def measure(label: str, function, repeats: int) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<28} {best * 1000:9.1f} ms")
+    return best
+
+
+def main() -> None:
+    sites = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    hours = int(sys.argv[2]) if len(sys.argv) > 2 else 168
+    repeats = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+
+    forecasts = build_forecasts(sites, hours)
+    service = WeatherService()
+    print(f"{sites} locais x {hours} horas x {len(STATUS_METRICS)} métricas\n")
+
+    baseline = measure('hora a hora (Python)', lambda: scalar_windows(service, forecasts, 2), repeats)
+    elapsed = measure('vetorizado (NumPy)', lambda: find_dive_windows(forecasts, min_hours=2), repeats)
+    print(f"{'':<28} speedup {baseline / elapsed:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: descriptografia em série vs. em lote (CryptoManager.decrypt_many)
+
+Uso: python benchmarks/bench_encryption.py [registos] [repetições]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.encryption import CryptoManager, SENSITIVE_FIELDS
+
+
+def build_records(manager: CryptoManager, total: int) -> list:
+    records = [
+        {
+            'id': i,
+            'name': f'Aluno {i}',
+            'email': f'aluno{i}@justdive.pt',
+            'phone': f'9{i:08d}',
+            'emergency_contact': f'Contacto {i} - 91{i:07d}',
+            'medical_notes': 'Sem restrições médicas conhecidas.',
+        }
+        for i in range(total)
+    ]
+    return [manager.encrypt_dict(record, SENSITIVE_FIELDS) for record in records]
+
+
+def measure(label: str, function, records: list, repeats: int) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function(records)
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<28} {best * 1000:9.1f} ms  {len(records) / best:10.0f} registos/s")
+    return best
+
+
+def main() -> None:
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    serial = CryptoManager()
+    records = build_records(serial, total)
+    print(f"{total} registos, {len(SENSITIVE_FIELDS)} campos sensíveis, {os.cpu_count()} CPUs\n")
+
+    baseline = measure(
+        'série (decrypt_dict)',
+        lambda rows: [serial.decrypt_dict(row, SENSITIVE_FIELDS) for row in rows],
+        records,
+        repeats,
+    )
+
+    for executor in ('thread', 'process'):
+        os.environ['CRYPTO_BATCH_EXECUTOR'] = executor
+        manager = CryptoManager()
+        manager.decrypt_many(records[:200], SENSITIVE_FIELDS)  # aquecer o pool
+        elapsed = measure(
+            f'lote ({executor}, {manager.batch_workers} workers)',
+            lambda rows: manager.decrypt_many(rows, SENSITIVE_FIELDS),
+            records,
+            repeats,
+        )
+        print(f"{'':<28} speedup {baseline / elapsed:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
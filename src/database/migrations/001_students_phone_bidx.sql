@@ -0,0 +1,12 @@
+-- Índice cego (HMAC) do telefone dos estudantes, usado por
+-- GET /api/students/lookup?phone= sem descriptografar a tabela.
+--
+-- Ordem de implementação:
+--   1. aplicar esta migração no Supabase;
+--   2. definir BLIND_INDEX_ENABLED=true (as escritas passam a gravar phone_bidx);
+--   3. preencher as linhas existentes com POST /api/students/encryption/blind-index.
+-- Até o preenchimento terminar, as pesquisas por telefone percorrem a tabela.
+
+ALTER TABLE students ADD COLUMN IF NOT EXISTS phone_bidx text;
+
+CREATE INDEX IF NOT EXISTS students_phone_bidx_idx ON students (phone_bidx);
@@ -16,6 +16,10 @@ from src.routes.weather import weather_bp
 from src.routes.students import students_bp
 from src.routes.notifications import notifications_bp
 from src.routes.ai import ai_bp
+from src.routes.dive_sites import dive_sites_bp
+from src.services.supabase_service import supabase_service
+from src.services.dive_site_registry import dive_site_registry
+from src.services.weather_poller import weather_poller
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 
@@ -31,6 +35,7 @@ app.register_blueprint(weather_bp)
 app.register_blueprint(students_bp)
 app.register_blueprint(notifications_bp, url_prefix='/api')
 app.register_blueprint(ai_bp)
+app.register_blueprint(dive_sites_bp)
 
 # Configuração da base de dados
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
@@ -39,6 +44,15 @@ db.init_app(app)
 
 with app.app_context():
     db.create_all()
+    # Locais de mergulho (criados com os valores por omissão na primeira execução)
+    dive_site_registry.load()
+
+# Sincronização da réplica local do Supabase (se LOCAL_MIRROR_ENABLED)
+supabase_service.start_background_sync()
+
+# Atualização periódica do semáforo com alertas nas transições (se WEATHER_POLLER_ENABLED)
+if os.getenv('WEATHER_POLLER_ENABLED', 'false').lower() == 'true':
+    weather_poller.start()
 
 # Rota de saúde da API
 @app.route('/api/health')
@@ -0,0 +1,37 @@
+from datetime import datetime
+
+from src.models.user import db
+
+# Locais de mergulho criados quando o registo está vazio
+DEFAULT_DIVE_SITES = [
+    {'key': 'berlengas', 'name': 'Berlengas', 'lat': 39.4161, 'lng': -9.5056},
+    {'key': 'peniche', 'name': 'Peniche', 'lat': 39.3558, 'lng': -9.3811},
+    {'key': 'sesimbra', 'name': 'Sesimbra', 'lat': 38.4444, 'lng': -9.1014},
+]
+
+class DiveSite(db.Model):
+    __tablename__ = 'dive_sites'
+
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(80), unique=True, nullable=False)
+    name = db.Column(db.String(120), nullable=False)
+    lat = db.Column(db.Float, nullable=False)
+    lng = db.Column(db.Float, nullable=False)
+    notes = db.Column(db.Text, default='')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<DiveSite {self.key}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'key': self.key,
+            'name': self.name,
+            'lat': self.lat,
+            'lng': self.lng,
+            'notes': self.notes or '',
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -0,0 +1,215 @@
+"""
+Rotas da API para o registo de locais de mergulho
+"""
+from flask import Blueprint, request, jsonify
+from src.services.dive_site_registry import dive_site_registry
+from src.services.weather_service import weather_service
+
+dive_sites_bp = Blueprint('dive_sites', __name__, url_prefix='/api/dive-sites')
+
+# Número máximo de locais cujo estado meteorológico é verificado em /nearest
+MAX_STATUS_CANDIDATES = 20
+
+# Prazo (segundos) para obter o estado dos candidatos em /nearest
+STATUS_DEADLINE = 3
+
+def _coordinates():
+    """Lê lat/lng dos parâmetros do pedido (None se faltarem ou forem inválidos)."""
+    lat = request.args.get('lat', type=float)
+    lng = request.args.get('lng', type=float)
+    if lat is None or lng is None or not -90 <= lat <= 90 or not -180 <= lng <= 180:
+        return None
+    return lat, lng
+
+@dive_sites_bp.route('', methods=['GET'])
+def list_dive_sites():
+    """
+    Lista os locais de mergulho registados
+    """
+    try:
+        sites = list(dive_site_registry.sites.values())
+
+        return jsonify({
+            'success': True,
+            'version': dive_site_registry.version,
+            'data': sites
+        })
+
+    except Exception as e:
+        return jsonify({
+            'error': 'Erro interno do servidor',
+            'details': str(e)
+        }), 500
+
+@dive_sites_bp.route('', methods=['POST'])
+def create_dive_site():
+    """
+    Regista um novo local de mergulho (key, name, lat, lng, notes)
+    """
+    try:
+        data = request.get_json()
+
+        if not data:
+            return jsonify({'error': 'Dados JSON necessários'}), 400
+
+        try:
+            site = dive_site_registry.create(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify({
+            'success': True,
+            'data': site
+        }), 201
+
+    except Exception as e:
+        return jsonify({
+            'error': 'Erro interno do servidor',
+            'details': str(e)
+        }), 500
+
+@dive_sites_bp.route('/nearest', methods=['GET'])
+def get_nearest_dive_sites():
+    """
+    Locais mais próximos de uma posição GPS
+
+    Parâmetros: `lat`, `lng`, `n` (omissão 1) e, opcionalmente, `status`
+    (GREEN, YELLOW ou RED) para devolver apenas locais com essas condições.
+    """
+    try:
+        coordinates = _coordinates()
+        if coordinates is None:
+            return jsonify({'error': 'Parâmetros lat e lng inválidos'}), 400
+
+        n = request.args.get('n', 1, type=int)
+        if not n or n < 1:
+            return jsonify({'error': 'Parâmetro n inválido'}), 400
+
+        status = request.args.get('status')
+        if not status:
+            sites = dive_site_registry.nearest(*coordinates, n)
+        else:
+            status = status.upper()
+            if status not in ('GREEN', 'YELLOW', 'RED'):
+                return jsonify({'error': 'Parâmetro status inválido'}), 400
+
+            # Estado dos candidatos obtido em paralelo; os que não respondem a
+            # tempo usam o último valor em cache
+            candidates = dive_site_registry.nearest(*coordinates, max(n, MAX_STATUS_CANDIDATES))
+            weather = weather_service.get_weather_many(
+                [site['key'] for site in candidates], deadline=STATUS_DEADLINE
+            )
+            sites = []
+            for site in candidates:
+                weather_data, _source = weather[site['key']]
+                if weather_data and weather_data.get('status') == status:
+                    sites.append(dict(site, weather=weather_data))
+                    if len(sites) >= n:
+                        break
+
+        return jsonify({
+            'success': True,
+            'data': sites
+        })
+
+    except Exception as e:
+        return jsonify({
+            'error': 'Erro interno do servidor',
+            'details': str(e)
+        }), 500
+
+@dive_sites_bp.route('/within', methods=['GET'])
+def get_dive_sites_within():
+    """
+    Locais a uma distância máxima de uma posição GPS (`lat`, `lng`, `radius_km`)
+    """
+    try:
+        coordinates = _coordinates()
+        if coordinates is None:
+            return jsonify({'error': 'Parâmetros lat e lng inválidos'}), 400
+
+        radius_km = request.args.get('radius_km', type=float)
+        if radius_km is None or radius_km <= 0:
+            return jsonify({'error': 'Parâmetro radius_km inválido'}), 400
+
+        return jsonify({
+            'success': True,
+            'data': dive_site_registry.within(*coordinates, radius_km)
+        })
+
+    except Exception as e:
+        return jsonify({
+            'error': 'Erro interno do servidor',
+            'details': str(e)
+        }), 500
+
+@dive_sites_bp.route('/<key>', methods=['GET'])
+def get_dive_site(key):
+    """
+    Obtém um local de mergulho pela chave
+    """
+    site = dive_site_registry.get(key)
+    if not site:
+        return jsonify({'error': 'Local não encontrado'}), 404
+
+    return jsonify({
+        'success': True,
+        'data': site
+    })
+
+@dive_sites_bp.route('/<key>', methods=['PUT'])
+def update_dive_site(key):
+    """
+    Atualiza um local de mergulho (a chave não pode ser alterada)
+    """
+    try:
+        data = request.get_json()
+
+        if not data:
+            return jsonify({'error': 'Dados JSON necessários'}), 400
+
+        previous = dive_site_registry.get(key)
+        try:
+            site = dive_site_registry.update(key, data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        if not site:
+            return jsonify({'error': 'Local não encontrado'}), 404
+
+        # Só coordenadas novas tornam obsoletos os dados meteorológicos em cache
+        if previous is None or (previous['lat'], previous['lng']) != (site['lat'], site['lng']):
+            weather_service.invalidate(site['key'])
+
+        return jsonify({
+            'success': True,
+            'data': site
+        })
+
+    except Exception as e:
+        return jsonify({
+            'error': 'Erro interno do servidor',
+            'details': str(e)
+        }), 500
+
+@dive_sites_bp.route('/<key>', methods=['DELETE'])
+def delete_dive_site(key):
+    """
+    Remove um local de mergulho
+    """
+    try:
+        if not dive_site_registry.delete(key):
+            return jsonify({'error': 'Local não encontrado'}), 404
+
+        weather_service.invalidate(key.lower())
+
+        return jsonify({
+            'success': True,
+            'message': 'Local removido'
+        })
+
+    except Exception as e:
+        return jsonify({
+            'error': 'Erro interno do servidor',
+            'details': str(e)
+        }), 500
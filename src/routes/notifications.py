@@ -44,11 +44,12 @@ def send_notification():
     Send a push notification to all registered devices.
 
     Accepts a JSON body with optional "title" and "body" fields. If not
-    provided, defaults are used. The notification_service will iterate over
-    all registered tokens and send the message via Expo's push API.
+    provided, defaults are used. The notification_service sends the message
+    to all registered tokens in batches via Expo's push API and the response
+    includes one ticket per token.
     """
     data = request.get_json() or {}
     title = data.get('title', 'JustDive Notification')
     body = data.get('body', '')
-    notification_service.send_notification(title, body)
-    return jsonify({'message': 'notifications sent'}), 200
+    result = notification_service.send_notification(title, body)
+    return jsonify({'message': 'notifications sent', **result}), 200
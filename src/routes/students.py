@@ -1,18 +1,29 @@
 """
 Rotas da API para gestão de estudantes
 """
-from flask import Blueprint, request, jsonify
+import os
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from src.services.supabase_service import supabase_service
 from src.services.openai_service import openai_service
-from src.utils.encryption import encrypt_sensitive_data, decrypt_sensitive_data
+from src.services.key_rotation import blind_index_backfill_job, key_rotation_job
+from src.utils.encryption import crypto_manager, encrypt_sensitive_data, decrypt_sensitive_data
+from src.utils.bulk_import import iter_csv_records, iter_ndjson_records
+from src.utils.export import gzip_stream, iter_csv, iter_ndjson
 from datetime import datetime
 
 students_bp = Blueprint('students', __name__, url_prefix='/api/students')
 
+# Limites da paginação da listagem de estudantes
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 500
+
 @students_bp.route('/', methods=['GET'])
 def get_all_students():
     """
     Lista todos os estudantes com filtros opcionais
+    
+    Com os parâmetros `limit` e/ou `cursor` a listagem é paginada por
+    cursor (keyset) e devolve `next_cursor` para obter a página seguinte.
     """
     try:
         # Obter parâmetros de filtro
@@ -25,23 +36,20 @@ def get_all_students():
             filters['status'] = status
         if certification:
             filters['certification_level'] = certification
+        if search:
+            # Pesquisa feita no PostgREST (ilike sobre colunas não criptografadas)
+            filters['search'] = search
         
-        students = supabase_service.get_all_students(filters)
+        if 'limit' in request.args or 'cursor' in request.args:
+            return _get_students_page(filters)
         
-        # Aplicar filtro de pesquisa se fornecido
-        if search:
-            search_lower = search.lower()
-            students = [
-                student for student in students
-                if (search_lower in student.get('name', '').lower() or
-                    search_lower in student.get('email', '').lower() or
-                    search_lower in student.get('certification_level', '').lower())
-            ]
+        students = supabase_service.get_all_students(filters)
         
         return jsonify({
             'success': True,
             'data': students,
-            'total': len(students)
+            'total': len(students),
+            'freshness': supabase_service.freshness('students')
         })
         
     except Exception as e:
@@ -50,6 +58,40 @@ def get_all_students():
             'details': str(e)
         }), 500
 
+def _get_students_page(filters):
+    """
+    Devolve uma página de estudantes paginada por cursor
+    """
+    limit = request.args.get('limit', DEFAULT_PAGE_LIMIT, type=int)
+    if limit is None or limit < 1:
+        return jsonify({'error': 'Parâmetro limit inválido'}), 400
+    limit = min(limit, MAX_PAGE_LIMIT)
+    
+    order_by = request.args.get('order_by', 'id')
+    with_count = request.args.get('count', 'false').lower() in ['true', '1', 'exact']
+    
+    try:
+        page = supabase_service.get_students_page(
+            filters,
+            limit=limit,
+            cursor=request.args.get('cursor'),
+            order_by=order_by,
+            with_count=with_count
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'success': True,
+        'data': page['data'],
+        'limit': limit,
+        'order_by': order_by,
+        'next_cursor': page['next_cursor'],
+        'has_more': page['has_more'],
+        'total': page['total'],
+        'freshness': supabase_service.freshness('students')
+    })
+
 @students_bp.route('/<int:student_id>', methods=['GET'])
 def get_student(student_id):
     """
@@ -63,7 +105,8 @@ def get_student(student_id):
         
         return jsonify({
             'success': True,
-            'data': student
+            'data': student,
+            'freshness': supabase_service.freshness('students')
         })
         
     except Exception as e:
@@ -72,6 +115,79 @@ def get_student(student_id):
             'details': str(e)
         }), 500
 
+@students_bp.route('/lookup', methods=['GET'])
+def lookup_students():
+    """
+    Procura estudantes pelo telefone (índice cego, sem descriptografar a tabela)
+    
+    Até o índice estar ativo e preenchido nas linhas existentes, a pesquisa
+    percorre a tabela; `index` indica o método usado.
+    """
+    phone = request.args.get('phone')
+    if not phone:
+        return jsonify({'error': 'Parâmetro phone é obrigatório'}), 400
+    
+    try:
+        use_index = crypto_manager.blind_index_enabled and blind_index_backfill_job.is_complete()
+        students = supabase_service.find_students_by_phone(phone, use_index=use_index)
+        
+        return jsonify({
+            'success': True,
+            'data': students,
+            'exists': bool(students),
+            'index': 'blind_index' if use_index else 'scan',
+            'freshness': supabase_service.freshness('students')
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'error': 'Erro interno do servidor',
+            'details': str(e)
+        }), 500
+
+# Campos obrigatórios na criação de estudantes
+REQUIRED_STUDENT_FIELDS = ['name', 'email', 'phone']
+
+def _validate_student(data):
+    """
+    Valida os campos obrigatórios de um estudante, devolvendo a mensagem de erro
+    """
+    for field in REQUIRED_STUDENT_FIELDS:
+        if not data.get(field):
+            return f'Campo {field} é obrigatório'
+    return None
+
+def _build_student_data(data):
+    """
+    Constrói o registo do estudante aplicando os valores padrão
+    """
+    return {
+        'name': data['name'],
+        'email': data['email'],
+        'phone': data['phone'],
+        'birth_date': data.get('birth_date'),
+        'certification_level': data.get('certification_level', 'Discover Scuba Diving'),
+        'total_dives': data.get('total_dives', 0),
+        'last_dive': data.get('last_dive'),
+        'medical_form': data.get('medical_form', 'pending'),
+        'waiver': data.get('waiver', 'pending'),
+        'emergency_contact': data.get('emergency_contact'),
+        'notes': data.get('notes', ''),
+        'status': data.get('status', 'active')
+    }
+
+# Colunas que uma linha de importação pode atualizar num estudante existente
+STUDENT_IMPORT_COLUMNS = [
+    'name', 'email', 'phone', 'birth_date', 'certification_level', 'total_dives',
+    'last_dive', 'medical_form', 'waiver', 'emergency_contact', 'notes', 'status'
+]
+
+def _import_fields(data):
+    """
+    Colunas presentes numa linha de importação, sem valores padrão
+    """
+    return {column: data[column] for column in STUDENT_IMPORT_COLUMNS if column in data}
+
 @students_bp.route('/', methods=['POST'])
 def create_student():
     """
@@ -84,28 +200,11 @@ def create_student():
             return jsonify({'error': 'Dados JSON necessários'}), 400
         
         # Validar campos obrigatórios
-        required_fields = ['name', 'email', 'phone']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'Campo {field} é obrigatório'}), 400
-        
-        # Definir valores padrão
-        student_data = {
-            'name': data['name'],
-            'email': data['email'],
-            'phone': data['phone'],
-            'birth_date': data.get('birth_date'),
-            'certification_level': data.get('certification_level', 'Discover Scuba Diving'),
-            'total_dives': data.get('total_dives', 0),
-            'last_dive': data.get('last_dive'),
-            'medical_form': data.get('medical_form', 'pending'),
-            'waiver': data.get('waiver', 'pending'),
-            'emergency_contact': data.get('emergency_contact'),
-            'notes': data.get('notes', ''),
-            'status': data.get('status', 'active')
-        }
-        
-        result = supabase_service.create_student(student_data)
+        error = _validate_student(data)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        result = supabase_service.create_student(_build_student_data(data))
         
         if 'error' in result:
             return jsonify(result), 400
@@ -121,6 +220,113 @@ def create_student():
             'details': str(e)
         }), 500
 
+# Tamanho dos lotes enviados ao Supabase na importação em massa
+DEFAULT_IMPORT_BATCH_SIZE = int(os.getenv('STUDENT_IMPORT_BATCH_SIZE', 500))
+MAX_IMPORT_BATCH_SIZE = 1000
+
+@students_bp.route('/bulk', methods=['POST'])
+def bulk_import_students():
+    """
+    Importa estudantes em massa a partir de CSV (text/csv) ou NDJSON
+    (application/x-ndjson)
+    
+    As linhas são lidas em streaming, validadas com as mesmas regras da
+    criação individual e gravadas em lotes. O parâmetro `mode` define o
+    tratamento de emails já existentes:
+    - `skip` (omissão): o estudante existente não é alterado;
+    - `merge` (ou `upsert`): atualiza apenas as colunas presentes na linha;
+    - `insert`: inserção simples (o lote falha se houver duplicados).
+    Devolve o resultado de cada linha.
+    """
+    if request.mimetype == 'text/csv':
+        records = iter_csv_records(request.stream)
+    elif request.mimetype in ['application/x-ndjson', 'application/jsonl']:
+        records = iter_ndjson_records(request.stream)
+    else:
+        return jsonify({'error': 'Content-Type deve ser text/csv ou application/x-ndjson'}), 415
+    
+    batch_size = request.args.get('batch_size', DEFAULT_IMPORT_BATCH_SIZE, type=int)
+    if batch_size is None or batch_size < 1:
+        return jsonify({'error': 'Parâmetro batch_size inválido'}), 400
+    batch_size = min(batch_size, MAX_IMPORT_BATCH_SIZE)
+    
+    mode = request.args.get('mode', 'skip')
+    if mode == 'upsert':
+        mode = 'merge'
+    if mode not in ['skip', 'merge', 'insert']:
+        return jsonify({'error': 'Parâmetro mode deve ser skip, merge ou insert'}), 400
+    
+    try:
+        results = []
+        batch = []
+        
+        def save(rows, status, **options):
+            if not rows:
+                return
+            outcome = supabase_service.bulk_upsert_students(
+                [student for _, student in rows], **options
+            )
+            saved = {row.get('email'): row for row in outcome.get('data', [])}
+            for row_number, student in rows:
+                result = {'row': row_number, 'email': student['email']}
+                if student['email'] in saved:
+                    result.update({'status': status, 'id': saved[student['email']].get('id')})
+                elif 'error' in outcome:
+                    result.update({'status': 'failed', 'error': outcome['error']})
+                elif mode == 'skip':
+                    result.update({'status': 'skipped', 'error': 'Email já existente'})
+                else:
+                    result.update({'status': 'failed', 'error': 'Linha não devolvida pelo Supabase'})
+                results.append(result)
+        
+        def flush():
+            if not batch:
+                return
+            if mode == 'merge':
+                existing = supabase_service.get_existing_student_emails(
+                    [record['email'] for _, record in batch]
+                )
+                # Estudantes existentes: apenas as colunas presentes na linha
+                save([(n, _import_fields(r)) for n, r in batch if r['email'] in existing],
+                     'updated', on_conflict='email', merge=True)
+                save([(n, _build_student_data(r)) for n, r in batch if r['email'] not in existing],
+                     'imported', on_conflict='email')
+            else:
+                save([(n, _build_student_data(r)) for n, r in batch], 'imported',
+                     on_conflict='email' if mode == 'skip' else None)
+            batch.clear()
+        
+        for row_number, record, parse_error in records:
+            error = parse_error or _validate_student(record)
+            if error:
+                results.append({'row': row_number, 'status': 'invalid', 'error': error})
+                continue
+            
+            # Emails repetidos no mesmo lote fariam falhar o pedido inteiro
+            if any(pending['email'] == record['email'] for _, pending in batch):
+                flush()
+            batch.append((row_number, record))
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+        results.sort(key=lambda r: r['row'])
+        
+        summary = {'total': len(results)}
+        for status in ['imported', 'updated', 'skipped', 'invalid', 'failed']:
+            summary[status] = len([r for r in results if r['status'] == status])
+        
+        return jsonify({
+            'success': summary['failed'] == 0,
+            'summary': summary,
+            'results': results
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'error': 'Erro interno do servidor',
+            'details': str(e)
+        }), 500
+
 @students_bp.route('/<int:student_id>', methods=['PUT'])
 def update_student(student_id):
     """
@@ -231,26 +437,18 @@ def get_students_stats():
     Obtém estatísticas gerais dos estudantes
     """
     try:
-        all_students = supabase_service.get_all_students()
-        
-        stats = {
-            'total': len(all_students),
-            'active': len([s for s in all_students if s.get('status') == 'active']),
-            'inactive': len([s for s in all_students if s.get('status') == 'inactive']),
-            'pending_docs': len([s for s in all_students if 
-                               s.get('medical_form') == 'pending' or s.get('waiver') == 'pending']),
-            'total_dives': sum(s.get('total_dives', 0) for s in all_students),
-            'certifications': {}
-        }
-        
-        # Contar certificações
-        for student in all_students:
-            cert = student.get('certification_level', 'Unknown')
-            stats['certifications'][cert] = stats['certifications'].get(cert, 0) + 1
+        stats = supabase_service.get_student_stats()
+        
+        if stats is None:
+            return jsonify({
+                'error': 'Estatísticas indisponíveis',
+                'details': supabase_service.student_stats.last_error
+            }), 503
         
         return jsonify({
             'success': True,
-            'stats': stats
+            'stats': stats,
+            'freshness': supabase_service.freshness('students')
         })
         
     except Exception as e:
@@ -259,27 +457,113 @@ def get_students_stats():
             'details': str(e)
         }), 500
 
+@students_bp.route('/cache/stats', methods=['GET'])
+def get_student_cache_stats():
+    """
+    Obtém os contadores da cache de estudantes (hits, misses, evictions)
+    """
+    return jsonify({
+        'success': True,
+        'cache': supabase_service.get_student_cache_stats()
+    })
+
+@students_bp.route('/encryption/rotate', methods=['GET'])
+def get_key_rotation_status():
+    """
+    Obtém o progresso da recriptografia dos estudantes com a chave atual
+    """
+    return jsonify({
+        'success': True,
+        'rotation': key_rotation_job.status()
+    })
+
+@students_bp.route('/encryption/rotate', methods=['POST'])
+def start_key_rotation():
+    """
+    Inicia (ou retoma a partir do último ponto gravado) a recriptografia
+    em segundo plano; `?action=stop` pede a paragem
+    """
+    if request.args.get('action') == 'stop':
+        key_rotation_job.stop()
+        return jsonify({'success': True, 'rotation': key_rotation_job.status()})
+    
+    started = key_rotation_job.start()
+    return jsonify({
+        'success': True,
+        'started': started,
+        'rotation': key_rotation_job.status()
+    }), 202 if started else 200
+
+@students_bp.route('/encryption/blind-index', methods=['GET'])
+def get_blind_index_backfill_status():
+    """
+    Obtém o progresso do preenchimento do índice cego nas linhas existentes
+    """
+    return jsonify({
+        'success': True,
+        'enabled': crypto_manager.blind_index_enabled,
+        'backfill': blind_index_backfill_job.status()
+    })
+
+@students_bp.route('/encryption/blind-index', methods=['POST'])
+def start_blind_index_backfill():
+    """
+    Inicia (ou retoma) o preenchimento de phone_bidx nas linhas existentes;
+    requer a migração aplicada e BLIND_INDEX_ENABLED; `?action=stop` pede a paragem
+    """
+    if request.args.get('action') == 'stop':
+        blind_index_backfill_job.stop()
+        return jsonify({'success': True, 'backfill': blind_index_backfill_job.status()})
+    
+    if not crypto_manager.blind_index_enabled:
+        return jsonify({
+            'error': 'Índice cego desativado',
+            'details': 'Aplique a migração 001_students_phone_bidx.sql e defina BLIND_INDEX_ENABLED=true'
+        }), 409
+    
+    started = blind_index_backfill_job.start()
+    return jsonify({
+        'success': True,
+        'started': started,
+        'backfill': blind_index_backfill_job.status()
+    }), 202 if started else 200
+
+# Colunas lidas do Supabase para exportação (nenhuma é sensível)
+EXPORT_COLUMNS = ['id', 'name', 'email', 'certification_level', 'total_dives', 'status', 'created_at']
+EXPORT_FIELDS = ['id', 'name', 'email', 'certification_level', 'total_dives', 'status', 'join_date']
+
+def _export_row(student):
+    """
+    Converte um estudante no formato simplificado de exportação
+    """
+    return {
+        'id': student.get('id'),
+        'name': student.get('name'),
+        'email': student.get('email'),
+        'certification_level': student.get('certification_level'),
+        'total_dives': student.get('total_dives', 0),
+        'status': student.get('status'),
+        'join_date': student.get('created_at', '').split('T')[0] if student.get('created_at') else ''
+    }
+
 @students_bp.route('/export', methods=['GET'])
 def export_students():
     """
     Exporta dados dos estudantes (formato simplificado)
+    
+    `format=csv` ou `format=ndjson` devolvem a exportação em streaming,
+    página a página; `gzip=true` comprime o fluxo.
     """
+    export_format = request.args.get('format', 'json').lower()
+    
+    if export_format in ['csv', 'ndjson']:
+        return _stream_export(export_format)
+    
     try:
-        students = supabase_service.get_all_students()
-        
-        # Remover dados sensíveis para exportação
-        export_data = []
-        for student in students:
-            export_student = {
-                'id': student.get('id'),
-                'name': student.get('name'),
-                'email': student.get('email'),
-                'certification_level': student.get('certification_level'),
-                'total_dives': student.get('total_dives', 0),
-                'status': student.get('status'),
-                'join_date': student.get('created_at', '').split('T')[0] if student.get('created_at') else ''
-            }
-            export_data.append(export_student)
+        export_data = [
+            _export_row(student)
+            for student in supabase_service.iter_students(columns=EXPORT_COLUMNS)
+        ]
         
         return jsonify({
             'success': True,
@@ -294,3 +578,29 @@ def export_students():
             'details': str(e)
         }), 500
 
+def _stream_export(export_format):
+    """
+    Exporta os estudantes em CSV ou NDJSON a partir de um gerador
+    """
+    rows = (_export_row(student) for student in supabase_service.iter_students(columns=EXPORT_COLUMNS))
+    
+    if export_format == 'csv':
+        chunks = iter_csv(rows, EXPORT_FIELDS)
+        mimetype = 'text/csv'
+    else:
+        chunks = iter_ndjson(rows)
+        mimetype = 'application/x-ndjson'
+    
+    filename = f"students-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{export_format}"
+    headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+    
+    if request.args.get('gzip', 'false').lower() in ['true', '1']:
+        chunks = gzip_stream(chunks)
+        headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+    
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers=headers
+    )
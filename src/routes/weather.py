@@ -5,8 +5,8 @@ from flask import Blueprint, request, jsonify
 from src.services.weather_service import weather_service
 from src.services.supabase_service import supabase_service
 from src.services.openai_service import openai_service
-from src.services.notification_service import notification_service
-from datetime import datetime
+from src.services.weather_poller import weather_poller
+from datetime import datetime, timedelta
 
 weather_bp = Blueprint('weather', __name__, url_prefix='/api/weather')
 
@@ -90,10 +90,8 @@ def force_weather_status():
         except Exception as e:
             print(f"Erro ao salvar no Supabase: {e}")
 
-        notification_service.send_notification(
-            'Atualização meteorológica',
-            f"{location} agora {status}"
-        )
+        # Notifica apenas se o status do local mudou
+        weather_poller.observe(location.lower(), forced_data, immediate=True)
 
         return jsonify({
             'success': True,
@@ -139,17 +137,42 @@ def get_weather_analysis(location):
 @weather_bp.route('/history/<location>', methods=['GET'])
 def get_weather_history(location):
     """
-    Obtém histórico meteorológico de um local
+    Obtém histórico meteorológico de um local (em memória)
+    
+    Parâmetros opcionais: `hours` (omissão 24) e `bucket` (15m, 1h ou 1d)
+    para devolver min/max/avg por intervalo em vez das leituras.
     """
     try:
         hours = request.args.get('hours', 24, type=int)
+        bucket = request.args.get('bucket')
+        location_key = location.lower()
+        
+        if not hours or hours < 1:
+            return jsonify({'error': 'Parâmetro hours inválido'}), 400
+        if location_key not in weather_service.locations:
+            return jsonify({
+                'error': 'Local não encontrado',
+                'available_locations': list(weather_service.locations.keys())
+            }), 404
         
-        history = supabase_service.get_weather_history(location, hours)
+        # Período anterior ao arranque: importado do Supabase uma única vez
+        weather_service.history.backfill(
+            location_key, hours,
+            lambda _key, period: supabase_service.get_weather_history(
+                location_key.title(), period, raise_errors=True
+            )
+        )
+        
+        try:
+            history = weather_service.history.query(location_key, hours, bucket)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         return jsonify({
             'success': True,
             'location': location,
             'hours': hours,
+            'bucket': bucket,
             'data': history
         })
         
@@ -165,17 +188,58 @@ def get_available_locations():
     Lista locais disponíveis para consulta meteorológica
     """
     try:
-        locations = []
-        for key, coords in weather_service.locations.items():
-            locations.append({
-                'key': key,
-                'name': key.title(),
-                'coordinates': coords
-            })
+        return jsonify({
+            'success': True,
+            'locations': weather_service.registry.locations_payload()
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'error': 'Erro interno do servidor',
+            'details': str(e)
+        }), 500
+
+# Número de horas devolvidas pela previsão quando não é indicado `end`
+DEFAULT_FORECAST_HOURS = 24
+
+@weather_bp.route('/forecast/<location>', methods=['GET'])
+def get_weather_forecast(location):
+    """
+    Previsão horária (até 72h) com o status do semáforo de cada hora
+    
+    Parâmetros opcionais: `start` e `end` (ISO 8601, UTC) ou `hours`.
+    """
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        hours = request.args.get('hours', DEFAULT_FORECAST_HOURS, type=int)
+        
+        try:
+            start = datetime.fromisoformat(start) if start else None
+            end = datetime.fromisoformat(end) if end else None
+        except ValueError:
+            return jsonify({'error': 'Datas devem estar no formato ISO 8601'}), 400
+        
+        if end is None:
+            if not hours or hours < 1:
+                return jsonify({'error': 'Parâmetro hours inválido'}), 400
+            base = start or datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+            end = base + timedelta(hours=hours)
+        
+        forecast = weather_service.get_forecast(location, start, end)
+        
+        if forecast is None:
+            return jsonify({
+                'error': 'Local não encontrado',
+                'available_locations': list(weather_service.locations.keys())
+            }), 404
+        
+        if not forecast['hours'] and forecast['data_source'] == 'unavailable':
+            return jsonify({'error': 'Previsão indisponível de momento'}), 503
         
         return jsonify({
             'success': True,
-            'locations': locations
+            'data': forecast
         })
         
     except Exception as e:
@@ -184,6 +248,87 @@ def get_available_locations():
             'details': str(e)
         }), 500
 
+@weather_bp.route('/windows', methods=['GET'])
+def get_dive_windows():
+    """
+    Janelas de mergulho com pelo menos `min_hours` horas seguidas GREEN
+    (ou `level=YELLOW` para mergulhadores avançados) em cada local
+    
+    Parâmetros opcionais: `locations` (separados por vírgula), `start`, `end`.
+    """
+    try:
+        min_hours = request.args.get('min_hours', 2, type=int)
+        level = request.args.get('level', 'GREEN').upper()
+        locations = request.args.get('locations')
+        locations = [key.strip() for key in locations.split(',') if key.strip()] if locations else None
+        
+        if not min_hours or min_hours < 1:
+            return jsonify({'error': 'Parâmetro min_hours inválido'}), 400
+        
+        try:
+            start = request.args.get('start')
+            end = request.args.get('end')
+            start = datetime.fromisoformat(start) if start else None
+            end = datetime.fromisoformat(end) if end else None
+        except ValueError:
+            return jsonify({'error': 'Datas devem estar no formato ISO 8601'}), 400
+        
+        try:
+            windows = weather_service.get_dive_windows(locations, min_hours, level, start, end)
+        except ValueError as e:
+            return jsonify({
+                'error': str(e),
+                'available_locations': list(weather_service.locations.keys())
+            }), 400
+        
+        return jsonify({
+            'success': True,
+            'data': windows
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'error': 'Erro interno do servidor',
+            'details': str(e)
+        }), 500
+
+@weather_bp.route('/cache/stats', methods=['GET'])
+def get_weather_cache_stats():
+    """
+    Obtém os contadores da cache meteorológica (hits, misses, atualizações)
+    """
+    return jsonify({
+        'success': True,
+        'cache': weather_service.get_cache_stats()
+    })
+
+@weather_bp.route('/quota', methods=['GET'])
+def get_stormglass_quota():
+    """
+    Quota diária da Stormglass restante e intervalo de atualização de cada local
+    """
+    try:
+        return jsonify({
+            'success': True,
+            'quota': weather_service.get_quota_status()
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'error': 'Erro interno do servidor',
+            'details': str(e)
+        }), 500
+
+@weather_bp.route('/poller', methods=['GET'])
+def get_weather_poller_status():
+    """
+    Estado do poller meteorológico (status por local, transições, alertas)
+    """
+    return jsonify({
+        'success': True,
+        'poller': weather_poller.status()
+    })
+
 @weather_bp.route('/widget/<location>', methods=['GET'])
 def get_weather_widget_data(location):
     """
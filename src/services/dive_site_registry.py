@@ -0,0 +1,331 @@
+"""
+Registo de locais de mergulho com índice espacial em grelha
+"""
+import math
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from flask import current_app, has_app_context
+from sqlalchemy import func
+
+from src.models.dive_site import DEFAULT_DIVE_SITES, DiveSite
+from src.models.user import db
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+# Chaves de locais: letras minúsculas, dígitos e hífens
+SITE_KEY_PATTERN = re.compile(r'^[a-z0-9][a-z0-9-]{0,79}$')
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Distância em quilómetros entre dois pontos (lat/lng em graus)."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GridIndex:
+    """
+    Índice espacial em grelha regular de `cell_degrees` graus. As consultas
+    só visitam as células que podem conter resultados, pelo que o custo
+    depende da densidade local e não do número total de locais.
+    """
+
+    def __init__(self, sites: Iterable[Dict], cell_degrees: float = 0.25):
+        self.cell_degrees = cell_degrees
+        self._cells: Dict[Tuple[int, int], List[Dict]] = {}
+        self._sites: List[Dict] = []
+        for site in sites:
+            self._sites.append(site)
+            self._cells.setdefault(self._cell(site['lat'], site['lng']), []).append(site)
+
+        if self._cells:
+            rows = [cell[0] for cell in self._cells]
+            cols = [cell[1] for cell in self._cells]
+            self._bounds = (min(rows), max(rows), min(cols), max(cols))
+
+    def __len__(self) -> int:
+        return len(self._sites)
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_degrees), math.floor(lng / self.cell_degrees)
+
+    def _ring(self, center: Tuple[int, int], radius: int) -> Iterable[Dict]:
+        row, col = center
+        for r in range(row - radius, row + radius + 1):
+            for c in range(col - radius, col + radius + 1):
+                if max(abs(r - row), abs(c - col)) == radius:
+                    yield from self._cells.get((r, c), ())
+
+    def within(self, lat: float, lng: float, radius_km: float) -> List[Tuple[float, Dict]]:
+        """Locais a `radius_km` ou menos, por ordem de distância: [(km, local)]."""
+        if not self._sites:
+            return []
+        dlat = radius_km / KM_PER_DEGREE
+        cos_lat = max(math.cos(math.radians(min(abs(lat) + dlat, 89.9))), 1e-6)
+        dlng = radius_km / (KM_PER_DEGREE * cos_lat)
+
+        row_min, col_min = self._cell(lat - dlat, lng - dlng)
+        row_max, col_max = self._cell(lat + dlat, lng + dlng)
+        b_row_min, b_row_max, b_col_min, b_col_max = self._bounds
+        found = []
+        for r in range(max(row_min, b_row_min), min(row_max, b_row_max) + 1):
+            for c in range(max(col_min, b_col_min), min(col_max, b_col_max) + 1):
+                for site in self._cells.get((r, c), ()):
+                    distance = haversine_km(lat, lng, site['lat'], site['lng'])
+                    if distance <= radius_km:
+                        found.append((distance, site))
+        found.sort(key=lambda item: item[0])
+        return found
+
+    def nearest(self, lat: float, lng: float, n: int = 1) -> List[Tuple[float, Dict]]:
+        """Os `n` locais mais próximos, por ordem de distância: [(km, local)]."""
+        if not self._sites or n < 1:
+            return []
+        if n >= len(self._sites):
+            return sorted(
+                ((haversine_km(lat, lng, s['lat'], s['lng']), s) for s in self._sites),
+                key=lambda item: item[0]
+            )
+
+        center = self._cell(lat, lng)
+        b_row_min, b_row_max, b_col_min, b_col_max = self._bounds
+        max_radius = max(
+            abs(center[0] - b_row_min), abs(center[0] - b_row_max),
+            abs(center[1] - b_col_min), abs(center[1] - b_col_max)
+        )
+        candidates = []
+        for radius in range(max_radius + 1):
+            for site in self._ring(center, radius):
+                candidates.append((haversine_km(lat, lng, site['lat'], site['lng']), site))
+            if len(candidates) >= n:
+                # Qualquer local fora dos anéis visitados está pelo menos a esta distância
+                cos_lat = math.cos(math.radians(min(abs(lat) + (radius + 1) * self.cell_degrees, 89.9)))
+                covered_km = radius * self.cell_degrees * KM_PER_DEGREE * cos_lat
+                candidates.sort(key=lambda item: item[0])
+                if candidates[n - 1][0] <= covered_km:
+                    break
+        candidates.sort(key=lambda item: item[0])
+        return candidates[:n]
+
+
+class DiveSiteRegistry:
+    """
+    Locais de mergulho persistidos na base local (tabela dive_sites) e
+    mantidos em memória como um instantâneo imutável (locais + índice),
+    substituído de uma vez a cada alteração. `version` aumenta sempre que o
+    registo muda e serve para invalidar dados derivados, como o payload
+    de /api/weather/locations.
+
+    Os acessos (sites, locations, get, nearest, within) verificam, no máximo
+    a cada `reload_interval` segundos, se outro processo alterou a tabela.
+    Os subscritores (`subscribe`) recebem as chaves dos locais cujas
+    coordenadas mudaram ou que foram removidos.
+
+    Antes de `load` (sem contexto da aplicação) usa os locais por omissão.
+    """
+
+    def __init__(self, reload_interval: float = 30):
+        self.reload_interval = reload_interval
+        self.version = 0
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._app = None
+        self._signature = None
+        self._checked_at = 0.0
+        self._payload: Optional[Tuple[int, List[Dict]]] = None
+        self._listeners: List[Callable[[List[str]], None]] = []
+        self._snapshot = None
+        self._install([dict(site, id=None, notes='') for site in DEFAULT_DIVE_SITES])
+
+    # === INSTANTÂNEO ===
+
+    def _install(self, sites: List[Dict]) -> None:
+        sites = sorted(sites, key=lambda site: (site.get('id') or 0, site['key']))
+        previous = self._snapshot[1] if self._snapshot is not None else {}
+        locations = {site['key']: {'lat': site['lat'], 'lng': site['lng']} for site in sites}
+        self._snapshot = (
+            {site['key']: site for site in sites},
+            locations,
+            GridIndex(sites),
+        )
+        self.version += 1
+
+        changed = [key for key, coordinates in previous.items() if locations.get(key) != coordinates]
+        for listener in self._listeners if changed else ():
+            try:
+                listener(changed)
+            except Exception as e:
+                print(f"Erro ao notificar alteração de locais: {e}")
+
+    def subscribe(self, listener: Callable[[List[str]], None]) -> None:
+        """Regista uma função chamada com os locais alterados ou removidos."""
+        self._listeners.append(listener)
+
+    @property
+    def sites(self) -> Dict[str, Dict]:
+        self.refresh_if_changed()
+        return self._snapshot[0]
+
+    @property
+    def locations(self) -> Dict[str, Dict]:
+        """Coordenadas por chave (formato de WeatherService.locations)."""
+        self.refresh_if_changed()
+        return self._snapshot[1]
+
+    @property
+    def index(self) -> GridIndex:
+        self.refresh_if_changed()
+        return self._snapshot[2]
+
+    def _db_signature(self) -> tuple:
+        count, last_update = db.session.query(func.count(DiveSite.id), func.max(DiveSite.updated_at)).one()
+        return count, last_update
+
+    def load(self, seed: bool = True) -> None:
+        """Carrega os locais da base (criando os por omissão se estiver vazia)."""
+        # A aplicação fica guardada para as verificações fora de um pedido (ex.: poller)
+        self._app = current_app._get_current_object()
+        with self._lock:
+            if seed and DiveSite.query.count() == 0:
+                for site in DEFAULT_DIVE_SITES:
+                    db.session.add(DiveSite(**site))
+                db.session.commit()
+            self._install([site.to_dict() for site in DiveSite.query.all()])
+            self._signature = self._db_signature()
+            self._checked_at = time.monotonic()
+
+    def refresh_if_changed(self) -> None:
+        """
+        Recarrega se outro processo alterou o registo (verificado no máximo
+        a cada `reload_interval` segundos, e só depois de `load`).
+        """
+        if self._app is None or time.monotonic() - self._checked_at < self.reload_interval:
+            return
+        # Uma única verificação de cada vez; os restantes usam o instantâneo atual
+        if not self._check_lock.acquire(blocking=False):
+            return
+        try:
+            self._checked_at = time.monotonic()
+            if has_app_context():
+                self._refresh()
+            else:
+                with self._app.app_context():
+                    self._refresh()
+        except Exception as e:
+            print(f"Erro ao verificar registo de locais: {e}")
+        finally:
+            self._check_lock.release()
+
+    def _refresh(self) -> None:
+        if self._db_signature() != self._signature:
+            with self._lock:
+                self._reload()
+
+    def locations_payload(self) -> List[Dict]:
+        """Lista de locais para a API, calculada uma vez por versão do registo."""
+        self.refresh_if_changed()
+        cached = self._payload
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+
+        payload = [
+            {
+                'key': site['key'],
+                'name': site['name'],
+                'coordinates': {'lat': site['lat'], 'lng': site['lng']}
+            }
+            for site in self.sites.values()
+        ]
+        self._payload = (self.version, payload)
+        return payload
+
+    # === CONSULTAS ===
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self.sites.get((key or '').lower())
+
+    def nearest(self, lat: float, lng: float, n: int = 1) -> List[Dict]:
+        """Os `n` locais mais próximos, com a distância em `distance_km`."""
+        return [dict(site, distance_km=round(km, 2)) for km, site in self.index.nearest(lat, lng, n)]
+
+    def within(self, lat: float, lng: float, radius_km: float) -> List[Dict]:
+        return [dict(site, distance_km=round(km, 2)) for km, site in self.index.within(lat, lng, radius_km)]
+
+    # === ALTERAÇÕES ===
+
+    def _validate(self, data: Dict, partial: bool = False) -> Dict:
+        fields = {}
+        if 'key' in data or not partial:
+            key = str(data.get('key') or '').strip().lower()
+            if not SITE_KEY_PATTERN.match(key):
+                raise ValueError('Campo key deve conter apenas letras minúsculas, dígitos e hífens')
+            fields['key'] = key
+        if 'name' in data or not partial:
+            name = str(data.get('name') or '').strip()
+            if not name:
+                raise ValueError('Campo name é obrigatório')
+            fields['name'] = name
+        for field, limit in (('lat', 90), ('lng', 180)):
+            if field in data or not partial:
+                try:
+                    value = float(data.get(field))
+                except (TypeError, ValueError):
+                    raise ValueError(f'Campo {field} deve ser numérico')
+                if not -limit <= value <= limit:
+                    raise ValueError(f'Campo {field} fora do intervalo permitido')
+                fields[field] = value
+        if 'notes' in data:
+            fields['notes'] = data.get('notes') or ''
+        return fields
+
+    def _reload(self) -> None:
+        self._install([site.to_dict() for site in DiveSite.query.all()])
+        self._signature = self._db_signature()
+        self._checked_at = time.monotonic()
+
+    def create(self, data: Dict) -> Dict:
+        fields = self._validate(data)
+        with self._lock:
+            if DiveSite.query.filter_by(key=fields['key']).first():
+                raise ValueError(f"Já existe um local com a chave {fields['key']}")
+            site = DiveSite(**fields)
+            db.session.add(site)
+            db.session.commit()
+            self._reload()
+            return site.to_dict()
+
+    def update(self, key: str, data: Dict) -> Optional[Dict]:
+        fields = self._validate(data, partial=True)
+        fields.pop('key', None)
+        with self._lock:
+            site = DiveSite.query.filter_by(key=key.lower()).first()
+            if site is None:
+                return None
+            for field, value in fields.items():
+                setattr(site, field, value)
+            db.session.commit()
+            self._reload()
+            return site.to_dict()
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            site = DiveSite.query.filter_by(key=key.lower()).first()
+            if site is None:
+                return False
+            db.session.delete(site)
+            db.session.commit()
+            self._reload()
+            return True
+
+
+# Instância global do registo de locais
+dive_site_registry = DiveSiteRegistry(
+    reload_interval=float(os.getenv('DIVE_SITE_RELOAD_SECONDS', 30))
+)
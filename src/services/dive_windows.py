@@ -0,0 +1,136 @@
+"""
+Cálculo vetorizado (NumPy) de janelas de mergulho sobre previsões horárias
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.services.weather_forecast import LOWER_IS_WORSE, STATUS_THRESHOLDS, HourlyForecast, to_timestamp
+
+# Métricas usadas no semáforo, pela ordem do último eixo da grelha
+STATUS_METRICS = ("waveHeight", "windSpeed", "gust", "precipitation", "visibility")
+
+# Códigos do semáforo; UNKNOWN marca horas sem previsão e interrompe qualquer janela
+STATUS_NAMES = ("GREEN", "YELLOW", "RED")
+STATUS_CODES = {name: code for code, name in enumerate(STATUS_NAMES)}
+UNKNOWN = len(STATUS_NAMES)
+
+HOUR = 3600
+
+
+class ForecastGrid:
+    """
+    Previsões de vários locais alinhadas numa grelha horária comum:
+    `values` tem a forma (locais, horas, métricas) em float32 e `present`
+    indica as horas com previsão em cada local.
+    """
+
+    def __init__(self, sites: List[str], times: np.ndarray, values: np.ndarray, present: np.ndarray):
+        self.sites = sites
+        self.times = times
+        self.values = values
+        self.present = present
+
+    @classmethod
+    def from_forecasts(cls, forecasts: Dict[str, HourlyForecast]) -> "ForecastGrid":
+        sites = [site for site, forecast in forecasts.items() if len(forecast)]
+        if not sites:
+            return cls([], np.empty(0, np.int64), np.empty((0, 0, len(STATUS_METRICS)), np.float32),
+                       np.empty((0, 0), bool))
+
+        series = [np.frombuffer(forecasts[site].times, dtype=np.int64) for site in sites]
+        first = min(int(times[0]) for times in series) // HOUR * HOUR
+        last = max(int(times[-1]) for times in series)
+        times = np.arange(first, last + 1, HOUR, dtype=np.int64)
+
+        values = np.full((len(sites), len(times), len(STATUS_METRICS)), np.nan, dtype=np.float32)
+        present = np.zeros((len(sites), len(times)), dtype=bool)
+        for row, (site, site_times) in enumerate(zip(sites, series)):
+            columns = (site_times - first) // HOUR
+            present[row, columns] = True
+            for index, metric in enumerate(STATUS_METRICS):
+                values[row, columns, index] = np.frombuffer(forecasts[site].metrics[metric], dtype=np.float32)
+
+        return cls(sites, times, values, present)
+
+    def classify(self) -> np.ndarray:
+        """Status de todas as células (locais x horas) numa só passagem."""
+        return classify(self.values, self.present)
+
+
+def classify(values: np.ndarray, present: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Converte uma grelha (..., métricas STATUS_METRICS) em códigos do semáforo,
+    com os mesmos limites e valores por omissão do cálculo hora a hora.
+    """
+    metric = {name: values[..., index] for index, name in enumerate(STATUS_METRICS)}
+    # Valores em falta ou nulos, como `valor or omissão` no cálculo hora a hora
+    wind = np.where(np.isnan(metric["windSpeed"]), 0, metric["windSpeed"])
+    filled = {
+        "waveHeight": np.nan_to_num(metric["waveHeight"], nan=0),
+        "windSpeed": wind,
+        "gust": np.where(np.isnan(metric["gust"]) | (metric["gust"] == 0), wind * 1.3, metric["gust"]),
+        "precipitation": np.nan_to_num(metric["precipitation"], nan=0),
+        "visibility": np.where(
+            np.isnan(metric["visibility"]) | (metric["visibility"] == 0), 10, metric["visibility"]
+        ),
+    }
+
+    codes = np.full(values.shape[:-1], STATUS_CODES["GREEN"], dtype=np.uint8)
+    for status in ("YELLOW", "RED"):
+        alert = np.zeros(values.shape[:-1], dtype=bool)
+        for name, limit in STATUS_THRESHOLDS[status].items():
+            alert |= filled[name] < limit if name in LOWER_IS_WORSE else filled[name] > limit
+        codes[alert] = STATUS_CODES[status]
+
+    if present is not None:
+        codes[~present] = UNKNOWN
+    return codes
+
+
+def find_runs(ok: np.ndarray, min_length: int = 1) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Sequências contíguas de True em cada linha de uma matriz booleana.
+    Devolve (linha, início, fim exclusivo) das sequências com `min_length` ou mais.
+    """
+    padded = np.zeros((ok.shape[0], ok.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = ok
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _rows, ends = np.nonzero(edges == -1)
+    keep = (ends - starts) >= min_length
+    return rows[keep], starts[keep], ends[keep]
+
+
+def find_dive_windows(forecasts: Dict[str, HourlyForecast], min_hours: int = 2,
+                      level: str = "GREEN", start: Optional[datetime] = None,
+                      end: Optional[datetime] = None) -> Dict[str, List[Dict]]:
+    """
+    Janelas de pelo menos `min_hours` horas seguidas com status igual ou
+    melhor que `level` (GREEN, ou YELLOW para mergulhadores avançados),
+    por local, dentro de [start, end).
+    """
+    if level not in ("GREEN", "YELLOW"):
+        raise ValueError("level deve ser GREEN ou YELLOW")
+
+    grid = ForecastGrid.from_forecasts(forecasts)
+    windows: Dict[str, List[Dict]] = {site: [] for site in forecasts}
+    if not grid.sites:
+        return windows
+
+    first = 0 if start is None else int(np.searchsorted(grid.times, to_timestamp(start)))
+    last = len(grid.times) if end is None else int(np.searchsorted(grid.times, to_timestamp(end)))
+    codes = grid.classify()[:, first:last]
+    times = grid.times[first:last]
+
+    rows, starts, ends = find_runs(codes <= STATUS_CODES[level], max(min_hours, 1))
+    for row, run_start, run_end in zip(rows.tolist(), starts.tolist(), ends.tolist()):
+        worst = int(codes[row, run_start:run_end].max())
+        windows[grid.sites[row]].append({
+            "start": datetime.utcfromtimestamp(int(times[run_start])).isoformat(),
+            "end": datetime.utcfromtimestamp(int(times[run_end - 1]) + HOUR).isoformat(),
+            "hours": run_end - run_start,
+            "worst_status": STATUS_NAMES[worst],
+        })
+    return windows
@@ -0,0 +1,273 @@
+"""
+Recriptografia e indexação em segundo plano dos estudantes com a chave atual
+"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from src.services.supabase_service import supabase_service
+from src.utils.encryption import SENSITIVE_FIELDS, crypto_manager
+
+# Localização por omissão dos ficheiros de progresso
+DEFAULT_CHECKPOINT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'database', 'key_rotation.json'
+)
+DEFAULT_BLIND_INDEX_CHECKPOINT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'database', 'blind_index_backfill.json'
+)
+
+
+class KeyRotationJob:
+    """
+    Percorre a tabela `students` por páginas (keyset por id), recriptografa
+    em paralelo os campos que ainda usam uma chave antiga e grava-os com
+    PATCH, com no máximo `concurrency` pedidos em simultâneo.
+
+    Cada PATCH só é aplicado se `updated_at` não tiver mudado entretanto.
+    Uma escrita concorrente só recriptografa os campos que altera, por isso
+    as linhas em conflito são lidas de novo e reprocessadas no fim da tabela
+    (até `conflict_retries` vezes); enquanto restarem conflitos o trabalho
+    não é dado como terminado. O progresso é gravado em `checkpoint_path`
+    após cada página, para que o trabalho possa ser retomado após uma
+    paragem. A pausa entre páginas (`pause_ms`) limita o impacto no tráfego
+    normal.
+    """
+
+    name = 'key-rotation'
+    # Contador de linhas gravadas com sucesso no progresso
+    done_key = 'rotated'
+
+    def __init__(self, service=None, checkpoint_path: str = DEFAULT_CHECKPOINT_PATH,
+                 page_size: int = 500, concurrency: int = 4, pause_ms: int = 0,
+                 conflict_retries: int = 3):
+        self.service = service or supabase_service
+        self.checkpoint_path = checkpoint_path
+        self.page_size = page_size
+        self.concurrency = concurrency
+        self.pause = pause_ms / 1000.0
+        self.conflict_retries = conflict_retries
+
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.progress = self._load_checkpoint()
+
+    # === PROGRESSO ===
+
+    def _new_progress(self) -> Dict:
+        return {
+            'key_id': crypto_manager.key_id,
+            'last_id': None,
+            'scanned': 0,
+            'rotated': 0,
+            'conflicts': 0,
+            'conflict_ids': [],
+            'failed': 0,
+            'started_at': None,
+            'finished_at': None,
+            'last_error': None,
+        }
+
+    def _load_checkpoint(self) -> Dict:
+        progress = self._new_progress()
+        try:
+            with open(self.checkpoint_path, encoding='utf-8') as checkpoint:
+                saved = json.load(checkpoint)
+        except (OSError, ValueError):
+            return progress
+
+        # Um progresso guardado para outra chave não é reaproveitado
+        if saved.get('key_id') == crypto_manager.key_id:
+            progress.update(saved)
+        return progress
+
+    def _save_checkpoint(self) -> None:
+        os.makedirs(os.path.dirname(self.checkpoint_path) or '.', exist_ok=True)
+        temp_path = f"{self.checkpoint_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as checkpoint:
+            json.dump(self.progress, checkpoint)
+        os.replace(temp_path, self.checkpoint_path)
+
+    # === EXECUÇÃO ===
+
+    def _page_updates(self, rows: List[Dict]) -> List[Tuple[Dict, Dict]]:
+        candidates = [
+            row for row in rows
+            if any(crypto_manager.needs_rotation(row.get(field)) for field in SENSITIVE_FIELDS)
+        ]
+        changes = crypto_manager.rotate_many(candidates, SENSITIVE_FIELDS)
+
+        updates = []
+        for row, row_changes in zip(candidates, changes):
+            pending = [
+                field for field in SENSITIVE_FIELDS
+                if crypto_manager.needs_rotation(row.get(field)) and field not in row_changes
+            ]
+            if pending:
+                self.progress['failed'] += 1
+            if row_changes:
+                updates.append((row, row_changes))
+        return updates
+
+    def _rotate_page(self, rows: List[Dict], executor: ThreadPoolExecutor) -> None:
+        updates = self._page_updates(rows)
+        results = executor.map(
+            lambda update: self.service.update_encrypted_student(
+                update[0]['id'], update[1], update[0].get('updated_at')
+            ),
+            updates
+        )
+        for (row, _), result in zip(updates, results):
+            if result.get('conflict'):
+                self.progress['conflict_ids'].append(row['id'])
+            elif 'error' in result:
+                self.progress['failed'] += 1
+                self.progress['last_error'] = result['error']
+            else:
+                self.progress[self.done_key] += 1
+        self.progress['conflicts'] = len(self.progress['conflict_ids'])
+
+    def _retry_conflicts(self, executor: ThreadPoolExecutor) -> None:
+        """Volta a ler e a processar as linhas alteradas durante o PATCH."""
+        for _ in range(self.conflict_retries):
+            student_ids = self.progress['conflict_ids']
+            if not student_ids:
+                return
+            rows = []
+            for start in range(0, len(student_ids), self.page_size):
+                rows.extend(self.service.get_encrypted_students_by_ids(
+                    student_ids[start:start + self.page_size]
+                ))
+            # Linhas apagadas entretanto já não precisam de ser processadas
+            self.progress['conflict_ids'] = []
+            self._rotate_page(rows, executor)
+        self.progress['conflicts'] = len(self.progress['conflict_ids'])
+
+    def run(self) -> Dict:
+        """Executa (ou retoma) a recriptografia até ao fim da tabela."""
+        with self._lock:
+            if self.progress['finished_at']:
+                self.progress = self._new_progress()
+            if not self.progress['started_at']:
+                self.progress['started_at'] = datetime.utcnow().isoformat()
+            self.progress['last_error'] = None
+
+            with ThreadPoolExecutor(max_workers=self.concurrency,
+                                    thread_name_prefix=self.name) as executor:
+                while not self._stop.is_set():
+                    try:
+                        rows = self.service.get_encrypted_student_rows(
+                            self.progress['last_id'], self.page_size
+                        )
+                    except Exception as e:
+                        print(f"Erro na recriptografia de estudantes: {e}")
+                        self.progress['last_error'] = str(e)
+                        break
+
+                    if rows:
+                        self._rotate_page(rows, executor)
+                        self.progress['scanned'] += len(rows)
+                        self.progress['last_id'] = rows[-1]['id']
+                    if len(rows) < self.page_size:
+                        self._finish(executor)
+                        self._save_checkpoint()
+                        break
+                    self._save_checkpoint()
+                    self._stop.wait(self.pause)
+
+            return dict(self.progress)
+
+    def _finish(self, executor: ThreadPoolExecutor) -> None:
+        """Reprocessa os conflitos e só marca o fim se não restar nenhum."""
+        try:
+            self._retry_conflicts(executor)
+        except Exception as e:
+            print(f"Erro ao reprocessar conflitos da recriptografia: {e}")
+            self.progress['last_error'] = str(e)
+            return
+
+        if self.progress['conflict_ids']:
+            self.progress['last_error'] = (
+                f"{self.progress['conflicts']} estudantes continuam em conflito; "
+                "execute novamente para os reprocessar"
+            )
+            return
+        self.progress['finished_at'] = datetime.utcnow().isoformat()
+
+    def start(self) -> bool:
+        """Inicia a recriptografia numa thread. Devolve False se já estiver a correr."""
+        if self.is_running():
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        """Pede a paragem no fim da página atual (o progresso fica gravado)."""
+        self._stop.set()
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def status(self) -> Dict:
+        return {**self.progress, 'running': self.is_running()}
+
+
+class BlindIndexBackfillJob(KeyRotationJob):
+    """
+    Preenche `<campo>_bidx` nas linhas gravadas antes de o índice cego
+    existir (ou com uma chave antiga), com a mesma paginação, concorrência e
+    ficheiro de progresso da recriptografia.
+
+    Só corre com BLIND_INDEX_ENABLED, depois de aplicada a migração. Uma
+    escrita concorrente só indexa os campos que altera, por isso as linhas em
+    conflito são reprocessadas como na recriptografia.
+    """
+
+    name = 'blind-index-backfill'
+    done_key = 'indexed'
+
+    def _new_progress(self) -> Dict:
+        progress = super()._new_progress()
+        progress['indexed'] = progress.pop('rotated')
+        return progress
+
+    def is_complete(self) -> bool:
+        """Indica se todas as linhas existentes já têm índice com a chave atual."""
+        return (
+            bool(self.progress['finished_at'])
+            and not self.progress['failed']
+            and not self.progress['conflicts']
+        )
+
+    def _page_updates(self, rows: List[Dict]) -> List[Tuple[Dict, Dict]]:
+        changes = crypto_manager.index_many(rows, SENSITIVE_FIELDS)
+        return [(row, row_changes) for row, row_changes in zip(rows, changes) if row_changes]
+
+    def run(self) -> Dict:
+        """Executa (ou retoma) o preenchimento até ao fim da tabela."""
+        if not crypto_manager.blind_index_enabled:
+            self.progress['last_error'] = 'Índice cego desativado (BLIND_INDEX_ENABLED)'
+            return dict(self.progress)
+        return super().run()
+
+
+# Instância global do trabalho de recriptografia
+key_rotation_job = KeyRotationJob(
+    checkpoint_path=os.getenv('KEY_ROTATION_CHECKPOINT', DEFAULT_CHECKPOINT_PATH),
+    page_size=int(os.getenv('KEY_ROTATION_PAGE_SIZE', 500)),
+    concurrency=int(os.getenv('KEY_ROTATION_CONCURRENCY', 4)),
+    pause_ms=int(os.getenv('KEY_ROTATION_PAUSE_MS', 100))
+)
+
+# Instância global do preenchimento do índice cego
+blind_index_backfill_job = BlindIndexBackfillJob(
+    checkpoint_path=os.getenv('BLIND_INDEX_CHECKPOINT', DEFAULT_BLIND_INDEX_CHECKPOINT_PATH),
+    page_size=int(os.getenv('KEY_ROTATION_PAGE_SIZE', 500)),
+    concurrency=int(os.getenv('KEY_ROTATION_CONCURRENCY', 4)),
+    pause_ms=int(os.getenv('KEY_ROTATION_PAUSE_MS', 100))
+)
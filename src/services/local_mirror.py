@@ -0,0 +1,268 @@
+"""
+Réplica local (SQLite) de tabelas do Supabase com sincronização incremental
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Tabelas replicadas localmente
+MIRRORED_TABLES = ('students', 'reservations', 'settings')
+
+# Operadores de filtro suportados nas consultas locais
+FILTER_OPERATORS = {'eq': '=', 'gte': '>=', 'lte': '<=', 'gt': '>', 'lt': '<'}
+
+# fetch_changes(tabela, marca d'água, limite) -> linhas ordenadas por (updated_at, id)
+FetchChanges = Callable[[str, Optional[Dict], int], List[Dict]]
+
+
+def _json_path(column: str) -> str:
+    if not column.replace('_', '').isalnum():
+        raise ValueError(f"Coluna inválida: {column}")
+    return f"json_extract(data, '$.{column}')"
+
+
+class LocalMirror:
+    """
+    Mantém uma cópia das linhas (tal como estão no Supabase, com os campos
+    sensíveis ainda criptografados) numa base SQLite local.
+
+    A sincronização lê apenas as linhas com `updated_at` posterior à marca
+    d'água de cada tabela. As escritas feitas por esta aplicação são
+    aplicadas de imediato através de `apply`. Remoções no Supabase não
+    são replicadas.
+    """
+
+    def __init__(self, db_path: str, fetch_changes: FetchChanges,
+                 sync_interval: int = 60, page_size: int = 1000,
+                 tables: Tuple[str, ...] = MIRRORED_TABLES):
+        self.db_path = db_path
+        self.fetch_changes = fetch_changes
+        self.sync_interval = sync_interval
+        self.page_size = page_size
+        self.tables = tables
+
+        self._local = threading.local()
+        self._sync_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._create_schema()
+
+    # === LIGAÇÃO ===
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _create_schema(self) -> None:
+        conn = self._connection()
+        with conn:
+            for table in self.tables:
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS mirror_{table} ("
+                    "id INTEGER PRIMARY KEY, updated_at TEXT, data TEXT NOT NULL)"
+                )
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS mirror_{table}_updated_at "
+                    f"ON mirror_{table} (updated_at, id)"
+                )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS mirror_sync_state ("
+                "table_name TEXT PRIMARY KEY, watermark_at TEXT, watermark_id INTEGER, "
+                "synced_at REAL, last_error TEXT)"
+            )
+
+    def _table(self, table: str) -> str:
+        if table not in self.tables:
+            raise ValueError(f"Tabela não replicada: {table}")
+        return f"mirror_{table}"
+
+    # === SINCRONIZAÇÃO ===
+
+    def _state(self, table: str) -> Optional[tuple]:
+        cursor = self._connection().execute(
+            "SELECT watermark_at, watermark_id, synced_at, last_error "
+            "FROM mirror_sync_state WHERE table_name = ?",
+            (table,)
+        )
+        return cursor.fetchone()
+
+    def _save_rows(self, conn: sqlite3.Connection, table: str, rows: List[Dict]) -> None:
+        conn.executemany(
+            f"INSERT OR REPLACE INTO {self._table(table)} (id, updated_at, data) VALUES (?, ?, ?)",
+            [(row['id'], row.get('updated_at'), json.dumps(row, default=str)) for row in rows]
+        )
+
+    def sync_table(self, table: str) -> int:
+        """Importa as alterações de uma tabela desde a última marca d'água."""
+        state = self._state(table)
+        watermark = None
+        if state and state[0] is not None:
+            watermark = {'updated_at': state[0], 'id': state[1]}
+
+        synced = 0
+        conn = self._connection()
+        try:
+            while True:
+                rows = self.fetch_changes(table, watermark, self.page_size)
+                rows = [row for row in rows if row.get('id') is not None]
+                if rows:
+                    last = rows[-1]
+                    watermark = {'updated_at': last.get('updated_at'), 'id': last['id']}
+                with conn:
+                    self._save_rows(conn, table, rows)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO mirror_sync_state "
+                        "(table_name, watermark_at, watermark_id, synced_at, last_error) "
+                        "VALUES (?, ?, ?, ?, NULL)",
+                        (table, watermark and watermark['updated_at'],
+                         watermark and watermark['id'], time.time())
+                    )
+                synced += len(rows)
+                if len(rows) < self.page_size:
+                    return synced
+        except Exception as e:
+            print(f"Erro ao sincronizar réplica local de {table}: {e}")
+            with conn:
+                conn.execute(
+                    "INSERT INTO mirror_sync_state (table_name, last_error) VALUES (?, ?) "
+                    "ON CONFLICT(table_name) DO UPDATE SET last_error = excluded.last_error",
+                    (table, str(e))
+                )
+            return synced
+
+    def sync_all(self) -> Dict[str, int]:
+        with self._sync_lock:
+            return {table: self.sync_table(table) for table in self.tables}
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.sync_all()
+            self._stop.wait(self.sync_interval)
+
+    def start(self) -> None:
+        """Inicia a sincronização periódica em segundo plano."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='local-mirror-sync', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def apply(self, table: str, row: Dict) -> None:
+        """Aplica à réplica uma linha escrita por esta aplicação."""
+        if not row or row.get('id') is None or table not in self.tables:
+            return
+        try:
+            conn = self._connection()
+            with conn:
+                self._save_rows(conn, table, [row])
+        except sqlite3.Error as e:
+            print(f"Erro ao atualizar réplica local de {table}: {e}")
+
+    # === LEITURA ===
+
+    def is_ready(self, table: str) -> bool:
+        """Indica se a tabela já foi sincronizada pelo menos uma vez."""
+        state = self._state(table)
+        return bool(state and state[2] is not None)
+
+    def freshness(self, table: str) -> Dict:
+        state = self._state(table)
+        synced_at = state[2] if state else None
+        return {
+            'source': 'local_mirror',
+            'synced_at': datetime.utcfromtimestamp(synced_at).isoformat() if synced_at else None,
+            'age_seconds': round(time.time() - synced_at, 1) if synced_at else None,
+            'last_error': state[3] if state else None,
+        }
+
+    def get(self, table: str, row_id) -> Optional[Dict]:
+        row = self._connection().execute(
+            f"SELECT data FROM {self._table(table)} WHERE id = ?", (row_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, table: str, ids: List) -> List[Dict]:
+        if not ids:
+            return []
+        placeholders = ','.join('?' for _ in ids)
+        rows = self._connection().execute(
+            f"SELECT data FROM {self._table(table)} WHERE id IN ({placeholders})", list(ids)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def _where(self, filters: List[Tuple[str, str, object]] = None,
+               search: Tuple[List[str], str] = None) -> Tuple[List[str], List]:
+        clauses, args = [], []
+        for column, operator, value in filters or []:
+            clauses.append(f"{_json_path(column)} {FILTER_OPERATORS[operator]} ?")
+            args.append(value)
+        if search:
+            columns, term = search
+            escaped = term.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            clauses.append('(' + ' OR '.join(
+                f"lower({_json_path(column)}) LIKE ? ESCAPE '\\'" for column in columns
+            ) + ')')
+            args.extend([f'%{escaped}%'] * len(columns))
+        return clauses, args
+
+    def query(self, table: str, filters: List[Tuple[str, str, object]] = None,
+              search: Tuple[List[str], str] = None, order_by: str = 'id',
+              after: Optional[Dict] = None, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Consulta linhas com filtros de igualdade/intervalo, pesquisa de texto
+        e paginação por keyset sobre `id` ou `updated_at`.
+        """
+        clauses, args = self._where(filters, search)
+
+        if order_by == 'id':
+            order = 'id'
+            if after:
+                clauses.append('id > ?')
+                args.append(after['id'])
+        elif order_by == 'updated_at':
+            order = 'updated_at, id'
+            if after:
+                clauses.append('(updated_at > ? OR (updated_at = ? AND id > ?))')
+                args.extend([after['v'], after['v'], after['id']])
+        else:
+            raise ValueError(f"Ordenação inválida: {order_by}")
+
+        sql = f"SELECT data FROM {self._table(table)}"
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += f' ORDER BY {order}'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            args.append(limit)
+
+        return [json.loads(row[0]) for row in self._connection().execute(sql, args)]
+
+    def count(self, table: str, filters: List[Tuple[str, str, object]] = None,
+              search: Tuple[List[str], str] = None) -> int:
+        clauses, args = self._where(filters, search)
+        sql = f"SELECT COUNT(*) FROM {self._table(table)}"
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        return self._connection().execute(sql, args).fetchone()[0]
+
+    def iter_rows(self, table: str, filters: List[Tuple[str, str, object]] = None,
+                  batch_size: int = 1000) -> Iterator[Dict]:
+        """Percorre todas as linhas por ordem de id, em blocos."""
+        after = None
+        while True:
+            rows = self.query(table, filters=filters, after=after, limit=batch_size)
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            after = {'id': rows[-1]['id']}
@@ -1,7 +1,18 @@
 """Service for handling Expo push notification tokens and sending messages."""
 
-from typing import List
-import requests
+import gzip
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from src.utils.http_transport import http_transport
+
+EXPO_PUSH_URL = "https://exp.host/--/api/v2/push/send"
+
+# Expo accepts at most 100 messages per push request
+EXPO_BATCH_SIZE = 100
 
 
 class NotificationService:
@@ -9,37 +20,104 @@ class NotificationService:
     A simple in-memory service to store Expo push tokens and send
     notifications to them.  In a production system you would likely
     persist tokens in a database.
+
+    Messages are sent in gzip-compressed batches of up to 100, with at most
+    `concurrency` batches in flight over the shared keep-alive connections.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, concurrency: int = 4) -> None:
         self.tokens: List[str] = []
+        self.http = http_transport.client("expo")
+        self.concurrency = concurrency
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        # Guards self.tokens against registrations during a send
+        self._tokens_lock = threading.Lock()
 
     def register_token(self, token: str) -> None:
         """Store the Expo push token if it hasn't been registered yet."""
-        if token and token not in self.tokens:
-            self.tokens.append(token)
+        with self._tokens_lock:
+            if token and token not in self.tokens:
+                self.tokens.append(token)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.concurrency, thread_name_prefix="expo-push"
+                    )
+        return self._executor
+
+    def _send_batch(self, tokens: List[str], title: str, message: str) -> List[Dict]:
+        """Send one batch and return one ticket per token, in order."""
+        messages = [{"to": token, "title": title, "body": message} for token in tokens]
+        try:
+            response = self.http.post(
+                EXPO_PUSH_URL,
+                data=gzip.compress(json.dumps(messages).encode()),
+                headers={
+                    "Content-Type": "application/json",
+                    "Content-Encoding": "gzip",
+                    "Accept": "application/json",
+                    "Accept-Encoding": "gzip, deflate",
+                },
+            )
+            payload = response.json()
+        except Exception as e:
+            print(f"Erro ao enviar notificações ({len(tokens)} tokens): {e}")
+            return [{"token": token, "status": "error", "message": str(e)} for token in tokens]
+
+        tickets = payload.get("data") if isinstance(payload, dict) else None
+        if response.status_code != 200 or not isinstance(tickets, list) or len(tickets) != len(tokens):
+            error = (payload.get("errors") if isinstance(payload, dict) else None) or response.status_code
+            print(f"Erro ao enviar notificações ({len(tokens)} tokens): {error}")
+            return [{"token": token, "status": "error", "message": str(error)} for token in tokens]
 
-    def send_notification(self, title: str, message: str) -> None:
+        return [dict(ticket, token=token) for token, ticket in zip(tokens, tickets)]
+
+    def send_notification(self, title: str, message: str) -> Dict:
         """
         Send a notification to all registered tokens.
 
-        Uses Expo's push API. If sending fails for a token, the error
-        is logged but other tokens will continue to receive the message.
+        Uses Expo's push API. If a batch fails, its tokens get error tickets
+        but the other batches are still delivered. Tokens that Expo reports as
+        DeviceNotRegistered are removed. Returns the per-token tickets and
+        the number of successes and errors.
         """
-        expo_url = "https://exp.host/--/api/v2/push/send"
-        for token in self.tokens:
-            try:
-                requests.post(
-                    expo_url,
-                    json={
-                        "to": token,
-                        "title": title,
-                        "body": message,
-                    },
-                    timeout=10,
-                )
-            except Exception as e:
-                print(f"Erro ao enviar notificação para {token}: {e}")
-
-
-notification_service = NotificationService()
+        with self._tokens_lock:
+            tokens = list(self.tokens)
+        batches = [tokens[i:i + EXPO_BATCH_SIZE] for i in range(0, len(tokens), EXPO_BATCH_SIZE)]
+
+        tickets: List[Dict] = []
+        if len(batches) == 1:
+            tickets = self._send_batch(batches[0], title, message)
+        elif batches:
+            results = self._get_executor().map(
+                lambda batch: self._send_batch(batch, title, message), batches
+            )
+            for batch_tickets in results:
+                tickets.extend(batch_tickets)
+
+        unregistered = {
+            ticket["token"] for ticket in tickets
+            if (ticket.get("details") or {}).get("error") == "DeviceNotRegistered"
+        }
+        if unregistered:
+            # In place, so tokens registered while sending are kept
+            with self._tokens_lock:
+                self.tokens[:] = [token for token in self.tokens if token not in unregistered]
+
+        ok = sum(1 for ticket in tickets if ticket.get("status") == "ok")
+        return {
+            "sent": len(tokens),
+            "ok": ok,
+            "errors": len(tickets) - ok,
+            "removed": len(unregistered),
+            "tickets": tickets,
+        }
+
+
+notification_service = NotificationService(
+    concurrency=int(os.getenv("EXPO_PUSH_CONCURRENCY", 4))
+)
@@ -0,0 +1,250 @@
+"""
+Orçamento diário de pedidos à Stormglass e intervalos de atualização por local
+"""
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+from src.services.weather_forecast import STATUS_THRESHOLDS
+
+# Respostas da Stormglass quando a quota diária foi ultrapassada
+QUOTA_EXCEEDED_STATUS = (402, 429)
+
+# Prefixo dos contadores diários na cache partilhada (SharedWeatherStore)
+COUNTER_PREFIX = 'stormglass:'
+
+
+class StormglassQuota:
+    """
+    Contabiliza os pedidos à Stormglass por dia (UTC) e reparte o que resta
+    da quota pelos locais até ao fim do dia.
+
+    O consumo é contado localmente e corrigido com `meta.requestCount` /
+    `meta.dailyQuota` das respostas da API, quando presentes. Com `store`
+    (SharedWeatherStore) o consumo do dia e o estado de quota esgotada são
+    partilhados entre workers e sobrevivem a reinícios; a cópia local é
+    sincronizada no máximo a cada `sync_interval` segundos. Uma fração
+    `reserve` da quota fica guardada para pedidos sem nenhum dado em cache.
+
+    Cada local recebe uma parte proporcional ao seu peso: 1 + tráfego
+    recente (pedidos com decaimento exponencial, normalizado pela média) +
+    volatilidade (variação recente das condições face aos limites do
+    semáforo). O intervalo resultante fica entre `min_interval` e
+    `max_interval`; `can_spend` impede sempre que a quota seja ultrapassada.
+    """
+
+    def __init__(self, daily_quota: int = 500, reserve: float = 0.1,
+                 min_interval: float = 900, max_interval: float = 21600,
+                 traffic_half_life: float = 3600, volatility_weight: float = 2.0,
+                 plan_ttl: float = 30, store=None, sync_interval: float = 5, clock=time.time):
+        self.daily_quota = daily_quota
+        self.reserve = reserve
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.traffic_half_life = traffic_half_life
+        self.volatility_weight = volatility_weight
+        self.plan_ttl = plan_ttl
+        self.store = store
+        self.sync_interval = sync_interval
+        self._clock = clock
+        self._synced_at: Optional[float] = None
+
+        self._lock = threading.Lock()
+        self.day = self._today()
+        self.used = 0
+        self.api_quota: Optional[int] = None
+        self.exhausted = False
+        self.denied = 0
+        self._sites: Dict[str, Dict] = {}
+        self._plan: Optional[tuple] = None
+
+    # === CONTABILIZAÇÃO ===
+
+    def _today(self) -> str:
+        return datetime.utcfromtimestamp(self._clock()).strftime('%Y-%m-%d')
+
+    def _roll_day(self) -> None:
+        # Chamado com o lock adquirido
+        today = self._today()
+        if today != self.day:
+            self.day = today
+            self.used = 0
+            self.api_quota = None
+            self.exhausted = False
+            self._plan = None
+            self._synced_at = None
+            if self.store is not None:
+                self.store.delete_counters(COUNTER_PREFIX, self._counter(''))
+        self._sync()
+
+    def _counter(self, name: str) -> str:
+        return f"{COUNTER_PREFIX}{self.day}:{name}"
+
+    def _sync(self) -> None:
+        # Chamado com o lock adquirido: importa o consumo dos outros workers
+        now = self._clock()
+        if self.store is None or (self._synced_at is not None and now - self._synced_at < self.sync_interval):
+            return
+        self._synced_at = now
+        counters = self.store.counters(self._counter(''))
+        if not counters:
+            return
+        used = max(self.used, counters.get(self._counter('used'), 0))
+        exhausted = self.exhausted or bool(counters.get(self._counter('exhausted')))
+        api_quota = counters.get(self._counter('quota')) or self.api_quota
+        if (used, exhausted, api_quota) != (self.used, self.exhausted, self.api_quota):
+            self.used, self.exhausted, self.api_quota = used, exhausted, api_quota
+            self._plan = None
+
+    @property
+    def quota(self) -> int:
+        return self.api_quota or self.daily_quota
+
+    def remaining(self) -> int:
+        with self._lock:
+            self._roll_day()
+            return 0 if self.exhausted else max(self.quota - self.used, 0)
+
+    def can_spend(self, priority: bool = False) -> bool:
+        """
+        Indica se ainda há orçamento para um pedido. Sem `priority` (atualizações
+        de dados já em cache) a reserva não pode ser usada.
+        """
+        with self._lock:
+            self._roll_day()
+            remaining = 0 if self.exhausted else self.quota - self.used
+            floor = 0 if priority else int(self.quota * self.reserve)
+            if remaining > floor:
+                return True
+            self.denied += 1
+            return False
+
+    def record_call(self, status_code: int, meta: Optional[Dict] = None) -> None:
+        """Regista um pedido feito à API com o estado HTTP e o `meta` da resposta."""
+        with self._lock:
+            self._roll_day()
+            self.used += 1
+            if status_code in QUOTA_EXCEEDED_STATUS:
+                self.exhausted = True
+            meta = meta or {}
+            if meta.get('dailyQuota'):
+                self.api_quota = int(meta['dailyQuota'])
+            request_count = int(meta['requestCount']) if meta.get('requestCount') is not None else 0
+            # Contagem da API inclui os pedidos de outros processos
+            self.used = max(self.used, request_count)
+
+            if self.store is not None:
+                used = self.store.increment(self._counter('used'), 1, at_least=request_count)
+                if used is not None:
+                    self.used = max(self.used, used)
+                if self.exhausted:
+                    self.store.increment(self._counter('exhausted'), 0, at_least=1)
+                if self.api_quota:
+                    self.store.increment(self._counter('quota'), 0, at_least=self.api_quota)
+            self._plan = None
+
+    def _site(self, location: str) -> Dict:
+        return self._sites.setdefault(location, {
+            'traffic': 0.0, 'traffic_at': self._clock(), 'volatility': 0.0, 'last': None,
+        })
+
+    def _decayed_traffic(self, site: Dict, now: float) -> float:
+        return site['traffic'] * 0.5 ** ((now - site['traffic_at']) / self.traffic_half_life)
+
+    def record_request(self, location: str) -> None:
+        """Regista um pedido de um cliente aos dados de um local."""
+        with self._lock:
+            now = self._clock()
+            site = self._site(location)
+            site['traffic'] = self._decayed_traffic(site, now) + 1
+            site['traffic_at'] = now
+
+    def record_reading(self, location: str, payload: Dict) -> None:
+        """Atualiza a volatilidade de um local com uma nova leitura da API."""
+        limits = STATUS_THRESHOLDS['YELLOW']
+        with self._lock:
+            site = self._site(location)
+            last, site['last'] = site['last'], payload
+            if last is None:
+                return
+            change = max(
+                abs((payload.get('waveHeight') or 0) - (last.get('waveHeight') or 0)) / limits['waveHeight'],
+                abs((payload.get('windSpeed') or 0) - (last.get('windSpeed') or 0)) / limits['windSpeed'],
+                1.0 if payload.get('status') != last.get('status') else 0.0,
+            )
+            # Média móvel exponencial da variação entre leituras
+            site['volatility'] = 0.7 * site['volatility'] + 0.3 * min(change, 2.0)
+            self._plan = None
+
+    # === PLANEAMENTO ===
+
+    def _weights(self, locations: Iterable[str], now: float) -> Dict[str, float]:
+        traffic = {
+            location: self._decayed_traffic(self._sites[location], now) if location in self._sites else 0.0
+            for location in locations
+        }
+        mean_traffic = sum(traffic.values()) / len(traffic) if traffic else 0.0
+        return {
+            location: 1.0
+            + traffic[location] / (mean_traffic + 1.0)
+            + self.volatility_weight * self._sites.get(location, {}).get('volatility', 0.0)
+            for location in traffic
+        }
+
+    def plan(self, locations: Iterable[str]) -> Dict[str, float]:
+        """Intervalo de atualização (segundos) de cada local, para o orçamento restante."""
+        locations = tuple(locations)
+        with self._lock:
+            self._roll_day()
+            now = self._clock()
+            if self._plan is not None and self._plan[0] == locations and now - self._plan[1] < self.plan_ttl:
+                return self._plan[2]
+
+            budget = 0 if self.exhausted else self.quota - self.used - int(self.quota * self.reserve)
+            midnight = datetime.strptime(self.day, '%Y-%m-%d') + timedelta(days=1)
+            seconds_left = max((midnight - datetime.utcfromtimestamp(now)).total_seconds(), 60)
+            weights = self._weights(locations, now)
+            total_weight = sum(weights.values())
+
+            intervals = {}
+            for location, weight in weights.items():
+                if budget <= 0:
+                    interval = self.max_interval
+                else:
+                    # Pedidos atribuídos ao local até ao fim do dia
+                    share = budget * weight / total_weight
+                    interval = seconds_left / share
+                # Arredondado por excesso para nunca exceder o orçamento
+                intervals[location] = math.ceil(min(max(interval, self.min_interval), self.max_interval) * 10) / 10
+
+            self._plan = (locations, now, intervals)
+            return intervals
+
+    def interval_for(self, location: str, locations: Iterable[str]) -> float:
+        return self.plan(locations).get(location, self.max_interval)
+
+    def status(self, locations: Iterable[str]) -> Dict:
+        intervals = self.plan(locations)
+        now = self._clock()
+        with self._lock:
+            return {
+                'day': self.day,
+                'daily_quota': self.quota,
+                'quota_source': 'api' if self.api_quota else 'config',
+                'used': self.used,
+                'remaining': 0 if self.exhausted else max(self.quota - self.used, 0),
+                'reserve': int(self.quota * self.reserve),
+                'exhausted': self.exhausted,
+                'denied': self.denied,
+                'sites': {
+                    location: {
+                        'interval': interval,
+                        'traffic': round(self._decayed_traffic(self._sites[location], now), 2)
+                        if location in self._sites else 0.0,
+                        'volatility': round(self._sites.get(location, {}).get('volatility', 0.0), 3),
+                    }
+                    for location, interval in intervals.items()
+                },
+            }
@@ -0,0 +1,72 @@
+"""
+Carregamento de estudantes em lote por pedido (padrão DataLoader)
+"""
+from typing import Dict, Iterable, List, Optional
+
+from flask import g, has_request_context
+
+from src.services.supabase_service import supabase_service
+
+
+class StudentLoader:
+    """
+    Junta os ids pedidos durante um pedido HTTP e obtém-nos com uma só
+    chamada a `get_students`, sem repetir ids já carregados.
+
+    Uso típico: anunciar todos os ids com `prime` e depois ler cada um com
+    `load`; o primeiro `load` despacha o lote inteiro.
+    """
+
+    def __init__(self, service=None):
+        self.service = service or supabase_service
+        self._pending: Dict[int, None] = {}
+        self._loaded: Dict[int, Optional[Dict]] = {}
+
+    def prime(self, student_ids: Iterable[int]) -> 'StudentLoader':
+        """Regista ids a carregar no próximo lote."""
+        for student_id in student_ids:
+            if student_id is not None and student_id not in self._loaded:
+                self._pending[student_id] = None
+        return self
+
+    def dispatch(self) -> None:
+        """Carrega todos os ids pendentes num único lote."""
+        if not self._pending:
+            return
+        ids = list(self._pending)
+        self._pending.clear()
+
+        students = self.service.get_students(ids)
+        for student_id in ids:
+            self._loaded[student_id] = students.get(student_id)
+
+    def load(self, student_id: int) -> Optional[Dict]:
+        if student_id is None:
+            return None
+        if student_id not in self._loaded:
+            self.prime([student_id])
+            self.dispatch()
+        return self._loaded.get(student_id)
+
+    def load_many(self, student_ids: Iterable[int]) -> List[Optional[Dict]]:
+        student_ids = list(student_ids)
+        self.prime(student_ids)
+        self.dispatch()
+        return [self._loaded.get(student_id) for student_id in student_ids]
+
+
+def get_student_loader() -> StudentLoader:
+    """Devolve o loader do pedido atual (ou um novo fora de um pedido)."""
+    if not has_request_context():
+        return StudentLoader()
+    if 'student_loader' not in g:
+        g.student_loader = StudentLoader()
+    return g.student_loader
+
+
+def attach_students(rows: List[Dict], key: str = 'student_id', target: str = 'student') -> List[Dict]:
+    """Acrescenta a cada linha o estudante referido em `key`, com um só lote."""
+    loader = get_student_loader().prime(row.get(key) for row in rows)
+    for row in rows:
+        row[target] = loader.load(row.get(key))
+    return rows
@@ -0,0 +1,173 @@
+"""
+Estatísticas agregadas de estudantes mantidas incrementalmente em memória
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+# Colunas necessárias para calcular as estatísticas (nenhuma é sensível)
+STAT_COLUMNS = ['id', 'status', 'medical_form', 'waiver', 'total_dives', 'certification_level']
+
+# Contribuição de um estudante: (status, documentos pendentes, mergulhos, certificação)
+Contribution = Tuple[Optional[str], bool, int, str]
+
+
+def _contribution(student: Dict) -> Contribution:
+    try:
+        total_dives = int(student.get('total_dives') or 0)
+    except (TypeError, ValueError):
+        total_dives = 0
+
+    return (
+        student.get('status'),
+        student.get('medical_form') == 'pending' or student.get('waiver') == 'pending',
+        total_dives,
+        student.get('certification_level') or 'Unknown',
+    )
+
+
+class StudentStats:
+    """
+    Mantém os contadores de /api/students/stats atualizados a cada escrita
+    e reconcilia-os periodicamente com a base de dados.
+
+    Guarda apenas a contribuição de cada estudante (alguns bytes por id),
+    o que permite aplicar atualizações como diferenças em O(1). Escritas
+    feitas por outros processos só são refletidas na reconciliação seguinte.
+    """
+
+    def __init__(self, loader: Callable[[], Iterable[Dict]], reconcile_interval: int = 300):
+        self._loader = loader
+        self.reconcile_interval = reconcile_interval
+
+        self._lock = threading.Lock()
+        # Sinalizada no fim de cada reconciliação (sucesso ou falha)
+        self._reconciled = threading.Condition(self._lock)
+        self._contributions: Dict = {}
+        self._counters = self._empty_counters()
+        self._reconciled_at: Optional[float] = None
+        self._reconciling = False
+        self._pending: list = []
+        self.last_error: Optional[str] = None
+
+    @staticmethod
+    def _empty_counters() -> Dict:
+        return {
+            'total': 0,
+            'active': 0,
+            'inactive': 0,
+            'pending_docs': 0,
+            'total_dives': 0,
+            'certifications': {},
+        }
+
+    @staticmethod
+    def _apply(counters: Dict, contribution: Contribution, sign: int) -> None:
+        status, pending_docs, total_dives, certification = contribution
+
+        counters['total'] += sign
+        if status in ('active', 'inactive'):
+            counters[status] += sign
+        if pending_docs:
+            counters['pending_docs'] += sign
+        counters['total_dives'] += sign * total_dives
+
+        certifications = counters['certifications']
+        certifications[certification] = certifications.get(certification, 0) + sign
+        if certifications[certification] <= 0:
+            del certifications[certification]
+
+    def record(self, student: Dict) -> None:
+        """
+        Aplica a criação ou atualização de um estudante aos contadores.
+        Espera a linha completa, tal como devolvida pelo PostgREST.
+        """
+        if not student or student.get('id') is None:
+            return
+
+        with self._lock:
+            if self._reconciling:
+                self._pending.append(student)
+            if self._reconciled_at is None:
+                return
+            self._record_locked(student)
+
+    def _record_locked(self, student: Dict) -> None:
+        student_id = student['id']
+        previous = self._contributions.get(student_id)
+        if previous is not None:
+            self._apply(self._counters, previous, -1)
+
+        current = _contribution(student)
+        self._contributions[student_id] = current
+        self._apply(self._counters, current, 1)
+
+    def reconcile(self, wait: bool = False) -> None:
+        """
+        Recalcula todos os contadores a partir da base de dados. Se já houver
+        uma reconciliação em curso, com `wait` espera que termine.
+        """
+        with self._lock:
+            if self._reconciling:
+                while wait and self._reconciling:
+                    self._reconciled.wait()
+                return
+            self._reconciling = True
+            self._pending = []
+
+        try:
+            contributions = {}
+            counters = self._empty_counters()
+            for student in self._loader():
+                contribution = _contribution(student)
+                contributions[student.get('id')] = contribution
+                self._apply(counters, contribution, 1)
+
+            with self._lock:
+                self._contributions = contributions
+                self._counters = counters
+                self._reconciled_at = time.time()
+                # Reaplicar escritas feitas durante a leitura
+                for student in self._pending:
+                    self._record_locked(student)
+                self.last_error = None
+        except Exception as e:
+            print(f"Erro ao reconciliar estatísticas de estudantes: {e}")
+            self.last_error = str(e)
+        finally:
+            with self._lock:
+                self._reconciling = False
+                self._pending = []
+                self._reconciled.notify_all()
+
+    def _reconcile_in_background(self) -> None:
+        thread = threading.Thread(target=self.reconcile, name='student-stats-reconcile', daemon=True)
+        thread.start()
+
+    def snapshot(self) -> Optional[Dict]:
+        """
+        Devolve os contadores atuais. Na primeira chamada calcula-os de
+        forma síncrona (chamadas simultâneas esperam pelo mesmo cálculo);
+        depois, se estiverem desatualizados, agenda uma
+        reconciliação em segundo plano e devolve os valores em memória.
+
+        Devolve None enquanto nenhuma reconciliação tiver sido concluída
+        (ex.: base indisponível no arranque), em vez de contadores a zero.
+        """
+        if self._reconciled_at is None:
+            self.reconcile(wait=True)
+            if self._reconciled_at is None:
+                return None
+        elif time.time() - self._reconciled_at > self.reconcile_interval and not self._reconciling:
+            self._reconcile_in_background()
+
+        with self._lock:
+            stats = dict(self._counters)
+            stats['certifications'] = dict(self._counters['certifications'])
+            reconciled_at = self._reconciled_at
+
+        stats['reconciled_at'] = (
+            datetime.utcfromtimestamp(reconciled_at).isoformat() if reconciled_at else None
+        )
+        return stats
@@ -1,12 +1,51 @@
 """
 Serviço de integração com Supabase para persistência de dados
 """
+import glob
 import os
-import requests
-from typing import Dict, List, Optional, Any
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Any
 import json
-from datetime import datetime
-from src.utils.encryption import encrypt_sensitive_data, decrypt_sensitive_data
+from datetime import datetime, timedelta
+from src.utils.encryption import (
+    BLIND_INDEX_SUFFIX,
+    SENSITIVE_FIELDS,
+    crypto_manager,
+    decrypt_sensitive_data,
+    decrypt_sensitive_data_many,
+    encrypt_sensitive_data,
+    encrypt_sensitive_data_many,
+)
+from src.utils.cache import TTLCache
+from src.utils.http_transport import http_transport
+from src.services.student_stats import StudentStats, STAT_COLUMNS
+from src.services.local_mirror import LocalMirror
+from src.services.write_behind import WriteBehindBuffer, register_shutdown_flush
+from src.utils.pagination import (
+    KEYSET_COLUMNS,
+    decode_cursor,
+    encode_cursor,
+    keyset_params,
+    parse_content_range_total,
+)
+from src.utils.phone import normalize_phone
+from src.utils.postgrest import combine_or_filters, quote_value, search_filter
+
+# Colunas (não criptografadas) pesquisadas pelo filtro de texto
+STUDENT_SEARCH_COLUMNS = ['name', 'email', 'certification_level']
+
+# Número máximo de ids por pedido `id=in.(...)`
+STUDENT_BATCH_SIZE = 100
+
+# Colunas do estudante incluídas nas reservas com embedding
+RESERVATION_STUDENT_COLUMNS = ['id', 'name', 'email', 'phone', 'certification_level']
+
+# Localização por omissão da réplica local
+DEFAULT_MIRROR_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'app.db')
+
+# Tabelas só de inserção escritas através da fila diferida
+WRITE_BEHIND_TABLES = ('message_history', 'weather_history')
 
 class SupabaseService:
     def __init__(self):
@@ -21,6 +60,49 @@ class SupabaseService:
         }
         
         self.base_url = f"{self.url}/rest/v1"
+        self.http = http_transport.client('supabase')
+        
+        # Cache de estudantes descriptografados (apenas em memória do processo)
+        self.student_cache = None
+        if os.getenv('STUDENT_CACHE_ENABLED', 'true').lower() == 'true':
+            self.student_cache = TTLCache(
+                maxsize=int(os.getenv('STUDENT_CACHE_SIZE', 1024)),
+                ttl=float(os.getenv('STUDENT_CACHE_TTL', 60))
+            )
+        # Geração da cache: uma leitura iniciada antes de uma invalidação do
+        # mesmo estudante não volta a guardar a versão antiga. Só são
+        # lembradas as últimas invalidações (tantas quantas cabem na cache);
+        # leituras anteriores à mais antiga esquecida não são guardadas.
+        self._student_generation = 0
+        self._student_invalidated: 'OrderedDict[int, int]' = OrderedDict()
+        self._student_pruned_generation = 0
+        self._student_cache_lock = threading.Lock()
+        
+        # Escrita diferida do histórico (meteorologia e mensagens)
+        self.write_behind_enabled = os.getenv('SUPABASE_WRITE_BEHIND', 'true').lower() == 'true'
+        self._write_buffers: Dict[str, WriteBehindBuffer] = {}
+        self._write_buffers_lock = threading.Lock()
+        # Retoma filas gravadas em disco por um processo anterior
+        spill_dir = os.getenv('WRITE_BEHIND_SPILL_DIR')
+        if self.write_behind_enabled and spill_dir:
+            for table in WRITE_BEHIND_TABLES:
+                if glob.glob(os.path.join(glob.escape(spill_dir), f'{table}.ndjson*')):
+                    self._write_buffer(table)
+        
+        # Réplica local opcional (SQLite) para leituras sem rede
+        self.mirror = None
+        if os.getenv('LOCAL_MIRROR_ENABLED', 'false').lower() == 'true':
+            self.mirror = LocalMirror(
+                os.getenv('LOCAL_MIRROR_PATH', DEFAULT_MIRROR_PATH),
+                self._fetch_changed_rows,
+                sync_interval=int(os.getenv('LOCAL_MIRROR_SYNC_SECONDS', 60))
+            )
+        
+        # Estatísticas de estudantes mantidas incrementalmente
+        self.student_stats = StudentStats(
+            self._load_student_stat_rows,
+            reconcile_interval=int(os.getenv('STUDENT_STATS_RECONCILE_SECONDS', 300))
+        )
     
     # === ESTUDANTES ===
     
@@ -34,18 +116,19 @@ class SupabaseService:
         encrypted_data['updated_at'] = datetime.utcnow().isoformat()
         
         try:
-            response = requests.post(
+            response = self.http.post(
                 f"{self.base_url}/students",
                 headers=self.headers,
-                json=encrypted_data,
-                timeout=10
+                json=encrypted_data
             )
             
             if response.status_code in [200, 201]:
                 result = response.json()
                 if isinstance(result, list) and result:
-                    return decrypt_sensitive_data(result[0])
-                return decrypt_sensitive_data(result)
+                    result = result[0]
+                self.student_stats.record(result)
+                self._mirror_apply('students', result)
+                return self._remember_student(decrypt_sensitive_data(result))
             else:
                 return {
                     'error': f'Erro ao criar estudante: {response.status_code}',
@@ -56,21 +139,113 @@ class SupabaseService:
             print(f"Erro Supabase create_student: {e}")
             return {'error': str(e), 'mock_created': True}
     
+    def bulk_upsert_students(self, students: List[Dict], on_conflict: Optional[str] = 'email',
+                             merge: bool = False) -> Dict:
+        """
+        Insere vários estudantes num único pedido PostgREST
+        
+        Com `on_conflict`, as linhas que já existem são ignoradas
+        (resolution=ignore-duplicates) ou, com `merge`, atualizadas apenas
+        nas colunas presentes em cada linha; `created_at` nunca é enviado
+        para linhas atualizadas. Sem `on_conflict` é uma inserção simples.
+        
+        A criptografia dos campos sensíveis é feita em paralelo. Devolve as
+        linhas gravadas (descriptografadas) ou o erro do primeiro lote que
+        falhou.
+        """
+        now = datetime.utcnow().isoformat()
+        encrypted_rows = encrypt_sensitive_data_many(students)
+        for row in encrypted_rows:
+            if not merge:
+                row['created_at'] = now
+            row['updated_at'] = now
+        
+        headers = self.headers
+        params = []
+        if on_conflict:
+            resolution = 'merge-duplicates' if merge else 'ignore-duplicates'
+            headers = {**self.headers, 'Prefer': f'return=representation,resolution={resolution}'}
+            params.append(('on_conflict', on_conflict))
+        
+        # O PostgREST exige as mesmas colunas em todas as linhas de um pedido
+        groups: Dict[tuple, List[Dict]] = {}
+        for row in encrypted_rows:
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+        
+        saved = []
+        for rows in groups.values():
+            try:
+                response = self.http.post(
+                    f"{self.base_url}/students",
+                    headers=headers,
+                    params=params,
+                    json=rows
+                )
+                
+                if response.status_code not in [200, 201]:
+                    return {
+                        'data': saved,
+                        'error': f'Erro ao importar estudantes: {response.status_code}',
+                        'details': response.text
+                    }
+            except Exception as e:
+                print(f"Erro Supabase bulk_upsert_students: {e}")
+                return {'data': saved, 'error': str(e)}
+            
+            written = response.json()
+            for row in written:
+                self.student_stats.record(row)
+                self._mirror_apply('students', row)
+            decrypted = decrypt_sensitive_data_many(written)
+            for student in decrypted:
+                self._remember_student(student)
+            saved.extend(decrypted)
+        
+        return {'data': saved}
+    
+    def get_existing_student_emails(self, emails: List[str]) -> set:
+        """
+        Devolve os emails (da lista) que já pertencem a estudantes
+        """
+        if not emails:
+            return set()
+        
+        response = self.http.get(
+            f"{self.base_url}/students",
+            headers=self.headers,
+            params=[
+                ('select', 'email'),
+                ('email', f"in.({','.join(quote_value(email) for email in emails)})")
+            ]
+        )
+        if response.status_code != 200:
+            raise Exception(f"Erro ao consultar emails: {response.status_code} - {response.text}")
+        return {row.get('email') for row in response.json()}
+    
     def get_student(self, student_id: int) -> Optional[Dict]:
         """
         Obtém dados de um estudante específico
         """
+        if self.student_cache is not None:
+            cached = self.student_cache.get(student_id)
+            if cached is not None:
+                return dict(cached)
+        generation = self._student_cache_generation()
+        
+        if self._mirror_ready('students'):
+            row = self.mirror.get('students', student_id)
+            return self._remember_student(decrypt_sensitive_data(row), generation) if row else None
+        
         try:
-            response = requests.get(
+            response = self.http.get(
                 f"{self.base_url}/students?id=eq.{student_id}",
-                headers=self.headers,
-                timeout=10
+                headers=self.headers
             )
             
             if response.status_code == 200:
                 data = response.json()
                 if data:
-                    return decrypt_sensitive_data(data[0])
+                    return self._remember_student(decrypt_sensitive_data(data[0]), generation)
                 return None
             else:
                 print(f"Erro ao obter estudante: {response.status_code}")
@@ -80,28 +255,167 @@ class SupabaseService:
             print(f"Erro Supabase get_student: {e}")
             return None
     
+    def get_students(self, student_ids: List[int]) -> Dict[int, Dict]:
+        """
+        Obtém vários estudantes de uma vez, indexados por id
+        
+        Usa a cache e a réplica local quando possível e pede os restantes
+        ao Supabase com `id=in.(...)`, em blocos de STUDENT_BATCH_SIZE ids.
+        """
+        ids = list(dict.fromkeys(i for i in student_ids if i is not None))
+        students: Dict[int, Dict] = {}
+        
+        if self.student_cache is not None:
+            for student_id in ids:
+                cached = self.student_cache.get(student_id)
+                if cached is not None:
+                    students[student_id] = dict(cached)
+        missing = [i for i in ids if i not in students]
+        generation = self._student_cache_generation()
+        
+        if missing and self._mirror_ready('students'):
+            for row in decrypt_sensitive_data_many(self.mirror.get_many('students', missing)):
+                students[row['id']] = self._remember_student(row, generation)
+            return students
+        
+        for start in range(0, len(missing), STUDENT_BATCH_SIZE):
+            chunk = missing[start:start + STUDENT_BATCH_SIZE]
+            try:
+                response = self.http.get(
+                    f"{self.base_url}/students",
+                    headers=self.headers,
+                    params=[('id', f"in.({','.join(str(i) for i in chunk)})")]
+                )
+                
+                if response.status_code == 200:
+                    for row in decrypt_sensitive_data_many(response.json()):
+                        students[row['id']] = self._remember_student(row, generation)
+                else:
+                    print(f"Erro ao obter estudantes: {response.status_code}")
+                    
+            except Exception as e:
+                print(f"Erro Supabase get_students: {e}")
+        
+        return students
+    
+    def find_students_by_phone(self, phone: str, use_index: Optional[bool] = None) -> List[Dict]:
+        """
+        Obtém os estudantes com um dado telefone através do índice cego
+        
+        O número é normalizado como no WhatsApp, pelo que "912 345 678" e
+        "+351912345678" são equivalentes. Usa uma igualdade indexada sobre
+        `phone_bidx` em vez de descriptografar todos os estudantes. Sem
+        `use_index` (por omissão, BLIND_INDEX_ENABLED) ou enquanto as linhas
+        existentes não estão indexadas, percorre e descriptografa a tabela.
+        """
+        if use_index is None:
+            use_index = crypto_manager.blind_index_enabled
+        if not use_index:
+            return self._scan_students_by_phone(phone)
+        
+        # Um índice por chave configurada, para incluir linhas ainda não recriptografadas
+        indexes = crypto_manager.blind_indexes('phone', phone)
+        if not indexes:
+            return []
+        column = 'phone' + BLIND_INDEX_SUFFIX
+        generation = self._student_cache_generation()
+        
+        if self._mirror_ready('students'):
+            rows = []
+            for phone_bidx in indexes:
+                rows.extend(self.mirror.query('students', filters=[(column, 'eq', phone_bidx)]))
+            rows.sort(key=lambda row: row['id'])
+            return [self._remember_student(row, generation) for row in decrypt_sensitive_data_many(rows)]
+        
+        try:
+            response = self.http.get(
+                f"{self.base_url}/students",
+                headers=self.headers,
+                params=[(column, f"in.({','.join(indexes)})"), ('order', 'id')]
+            )
+            
+            if response.status_code == 200:
+                return [self._remember_student(row, generation)
+                        for row in decrypt_sensitive_data_many(response.json())]
+            else:
+                print(f"Erro ao pesquisar estudante por telefone: {response.status_code}")
+                return []
+                
+        except Exception as e:
+            print(f"Erro Supabase find_students_by_phone: {e}")
+            return []
+    
+    def _scan_students_by_phone(self, phone: str) -> List[Dict]:
+        """
+        Obtém os estudantes com um dado telefone descriptografando a tabela
+        """
+        normalized = normalize_phone(phone)
+        if not normalized:
+            return []
+        generation = self._student_cache_generation()
+        
+        try:
+            return [
+                self._remember_student(student, generation) for student in self.iter_students()
+                if normalize_phone(student.get('phone')) == normalized
+            ]
+        except Exception as e:
+            print(f"Erro Supabase find_students_by_phone: {e}")
+            return []
+    
+    def find_student_by_phone(self, phone: str, use_index: Optional[bool] = None) -> Optional[Dict]:
+        """
+        Obtém o primeiro estudante com um dado telefone (ou None)
+        """
+        students = self.find_students_by_phone(phone, use_index)
+        return students[0] if students else None
+    
+    def _student_filter_params(self, filters: Dict = None) -> List[tuple]:
+        """
+        Converte os filtros de estudantes em parâmetros PostgREST
+        """
+        params = []
+        if filters:
+            if filters.get('status'):
+                params.append(('status', f"eq.{filters['status']}"))
+            if filters.get('certification_level'):
+                params.append(('certification_level', f"eq.{filters['certification_level']}"))
+            if filters.get('search'):
+                params.append(search_filter(STUDENT_SEARCH_COLUMNS, filters['search']))
+        return params
+    
+    def _student_mirror_filters(self, filters: Dict = None) -> Dict:
+        """
+        Converte os filtros de estudantes em argumentos de consulta da réplica local
+        """
+        query = {'filters': [], 'search': None}
+        if filters:
+            if filters.get('status'):
+                query['filters'].append(('status', 'eq', filters['status']))
+            if filters.get('certification_level'):
+                query['filters'].append(('certification_level', 'eq', filters['certification_level']))
+            if filters.get('search'):
+                query['search'] = (STUDENT_SEARCH_COLUMNS, filters['search'])
+        return query
+    
     def get_all_students(self, filters: Dict = None) -> List[Dict]:
         """
         Obtém lista de todos os estudantes com filtros opcionais
         """
+        if self._mirror_ready('students'):
+            rows = self.mirror.query('students', **self._student_mirror_filters(filters))
+            return decrypt_sensitive_data_many(rows)
+        
         try:
-            url = f"{self.base_url}/students"
-            params = []
-            
-            if filters:
-                if filters.get('status'):
-                    params.append(f"status=eq.{filters['status']}")
-                if filters.get('certification_level'):
-                    params.append(f"certification_level=eq.{filters['certification_level']}")
-            
-            if params:
-                url += "?" + "&".join(params)
-            
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = self.http.get(
+                f"{self.base_url}/students",
+                headers=self.headers,
+                params=self._student_filter_params(filters)
+            )
             
             if response.status_code == 200:
                 data = response.json()
-                return [decrypt_sensitive_data(student) for student in data]
+                return decrypt_sensitive_data_many(data)
             else:
                 print(f"Erro ao obter estudantes: {response.status_code}")
                 return []
@@ -110,25 +424,146 @@ class SupabaseService:
             print(f"Erro Supabase get_all_students: {e}")
             return []
     
+    def get_students_page(self, filters: Dict = None, limit: int = 50, cursor: str = None,
+                          order_by: str = 'id', with_count: bool = False) -> Dict:
+        """
+        Obtém uma página de estudantes com paginação por cursor (keyset)
+        
+        Levanta ValueError se o cursor ou a ordenação forem inválidos.
+        """
+        if self._mirror_ready('students'):
+            return self._get_students_page_from_mirror(filters, limit, cursor, order_by, with_count)
+        
+        params = self._student_filter_params(filters)
+        params.extend(keyset_params(order_by, cursor))
+        params = combine_or_filters(params)
+        # Pedir uma linha extra para saber se existe página seguinte
+        params.append(('limit', str(limit + 1)))
+        
+        headers = self.headers
+        if with_count:
+            headers = {**self.headers, 'Prefer': 'count=exact'}
+        
+        page = {'data': [], 'next_cursor': None, 'has_more': False, 'total': None}
+        
+        try:
+            response = self.http.get(
+                f"{self.base_url}/students",
+                headers=headers,
+                params=params
+            )
+            
+            if response.status_code in [200, 206]:
+                rows = response.json()
+                has_more = len(rows) > limit
+                rows = rows[:limit]
+                
+                page['data'] = decrypt_sensitive_data_many(rows)
+                page['has_more'] = has_more
+                if has_more:
+                    page['next_cursor'] = encode_cursor(order_by, rows[-1])
+                if with_count:
+                    page['total'] = parse_content_range_total(response.headers.get('Content-Range'))
+            else:
+                print(f"Erro ao obter página de estudantes: {response.status_code}")
+                
+        except Exception as e:
+            print(f"Erro Supabase get_students_page: {e}")
+        
+        return page
+    
+    def _get_students_page_from_mirror(self, filters: Dict, limit: int, cursor: Optional[str],
+                                       order_by: str, with_count: bool) -> Dict:
+        """
+        Obtém uma página de estudantes a partir da réplica local
+        """
+        if order_by not in KEYSET_COLUMNS:
+            raise ValueError(f"Ordenação inválida: {order_by}")
+        after = decode_cursor(cursor, order_by) if cursor else None
+        query = self._student_mirror_filters(filters)
+        
+        rows = self.mirror.query('students', order_by=order_by, after=after, limit=limit + 1, **query)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        return {
+            'data': decrypt_sensitive_data_many(rows),
+            'next_cursor': encode_cursor(order_by, rows[-1]) if has_more else None,
+            'has_more': has_more,
+            'total': self.mirror.count('students', **query) if with_count else None
+        }
+    
+    def iter_students(self, filters: Dict = None, columns: List[str] = None,
+                      page_size: int = 500) -> Iterator[Dict]:
+        """
+        Percorre os estudantes página a página (keyset por id), devolvendo
+        as linhas à medida que chegam
+        
+        Só são descriptografados os campos sensíveis incluídos em `columns`.
+        Levanta RuntimeError se uma página não puder ser obtida, para que o
+        consumidor não receba um resultado truncado como se estivesse completo.
+        """
+        select = ','.join(columns) if columns else '*'
+        needs_decrypt = columns is None or any(col in SENSITIVE_FIELDS for col in columns)
+        cursor = None
+        
+        if self._mirror_ready('students'):
+            query = self._student_mirror_filters(filters)
+            after = None
+            while True:
+                rows = self.mirror.query('students', after=after, limit=page_size, **query)
+                page = rows
+                if columns:
+                    page = [{column: row.get(column) for column in columns} for row in rows]
+                yield from decrypt_sensitive_data_many(page) if needs_decrypt else page
+                if len(rows) < page_size:
+                    return
+                after = {'id': rows[-1]['id']}
+        
+        while True:
+            params = self._student_filter_params(filters)
+            params.extend(keyset_params('id', cursor))
+            params = combine_or_filters(params)
+            params.append(('select', select))
+            params.append(('limit', str(page_size)))
+            
+            response = self.http.get(
+                f"{self.base_url}/students",
+                headers=self.headers,
+                params=params
+            )
+            if response.status_code != 200:
+                raise RuntimeError(f'Erro ao obter estudantes: {response.status_code}')
+            
+            rows = response.json()
+            yield from decrypt_sensitive_data_many(rows) if needs_decrypt else rows
+            
+            if len(rows) < page_size:
+                return
+            cursor = encode_cursor('id', rows[-1])
+    
     def update_student(self, student_id: int, update_data: Dict) -> Dict:
         """
         Atualiza dados de um estudante
         """
         encrypted_data = encrypt_sensitive_data(update_data)
         encrypted_data['updated_at'] = datetime.utcnow().isoformat()
+        self._forget_student(student_id)
+        generation = self._student_cache_generation()
         
         try:
-            response = requests.patch(
+            response = self.http.patch(
                 f"{self.base_url}/students?id=eq.{student_id}",
                 headers=self.headers,
-                json=encrypted_data,
-                timeout=10
+                json=encrypted_data
             )
             
             if response.status_code == 200:
                 data = response.json()
                 if data:
-                    return decrypt_sensitive_data(data[0])
+                    self.student_stats.record(data[0])
+                    self._mirror_apply('students', data[0])
+                    return self._remember_student(decrypt_sensitive_data(data[0]), generation)
                 return {'success': True}
             else:
                 return {
@@ -140,6 +575,178 @@ class SupabaseService:
             print(f"Erro Supabase update_student: {e}")
             return {'error': str(e)}
     
+    def get_encrypted_student_rows(self, after_id: Optional[int] = None, limit: int = 500) -> List[Dict]:
+        """
+        Obtém uma página de estudantes tal como estão gravados (sem descriptografar),
+        por ordem de id e sempre a partir do Supabase
+        
+        Levanta RuntimeError se a página não puder ser obtida.
+        """
+        params = [('order', 'id'), ('limit', str(limit))]
+        if after_id is not None:
+            params.append(('id', f"gt.{after_id}"))
+        
+        response = self.http.get(f"{self.base_url}/students", headers=self.headers, params=params)
+        if response.status_code != 200:
+            raise RuntimeError(f'Erro ao obter estudantes: {response.status_code}')
+        return response.json()
+    
+    def get_encrypted_students_by_ids(self, student_ids: List[int]) -> List[Dict]:
+        """
+        Obtém os estudantes indicados tal como estão gravados (sem descriptografar),
+        por ordem de id e sempre a partir do Supabase
+        
+        Levanta RuntimeError se as linhas não puderem ser obtidas.
+        """
+        if not student_ids:
+            return []
+        ids = ','.join(str(student_id) for student_id in student_ids)
+        params = [('id', f"in.({ids})"), ('order', 'id')]
+        
+        response = self.http.get(f"{self.base_url}/students", headers=self.headers, params=params)
+        if response.status_code != 200:
+            raise RuntimeError(f'Erro ao obter estudantes: {response.status_code}')
+        return response.json()
+    
+    def update_encrypted_student(self, student_id: int, encrypted_changes: Dict,
+                                 expected_updated_at: Optional[str]) -> Dict:
+        """
+        Grava campos já criptografados só se o estudante não tiver sido alterado
+        desde `expected_updated_at` (controlo de concorrência otimista)
+        
+        Devolve {'data': linha}, {'conflict': True} ou {'error': ...}.
+        """
+        changes = dict(encrypted_changes)
+        changes['updated_at'] = datetime.utcnow().isoformat()
+        params = [('id', f"eq.{student_id}")]
+        if expected_updated_at is not None:
+            params.append(('updated_at', f"eq.{expected_updated_at}"))
+        else:
+            params.append(('updated_at', 'is.null'))
+        
+        try:
+            response = self.http.patch(
+                f"{self.base_url}/students",
+                headers=self.headers,
+                params=params,
+                json=changes
+            )
+            
+            if response.status_code == 200:
+                data = response.json()
+                if not data:
+                    return {'conflict': True}
+                self._forget_student(student_id)
+                self._mirror_apply('students', data[0])
+                return {'data': data[0]}
+            else:
+                return {
+                    'error': f'Erro ao atualizar estudante: {response.status_code}',
+                    'details': response.text
+                }
+        
+        except Exception as e:
+            print(f"Erro Supabase update_encrypted_student: {e}")
+            return {'error': str(e)}
+    
+    # === RÉPLICA LOCAL ===
+    
+    def _fetch_changed_rows(self, table: str, watermark: Optional[Dict], limit: int) -> List[Dict]:
+        """
+        Obtém as linhas alteradas depois da marca d'água (updated_at, id)
+        """
+        cursor = encode_cursor('updated_at', watermark) if watermark else None
+        params = keyset_params('updated_at', cursor)
+        params.append(('limit', str(limit)))
+        
+        response = self.http.get(
+            f"{self.base_url}/{table}",
+            headers=self.headers,
+            params=params
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f'Erro ao sincronizar {table}: {response.status_code}')
+        return response.json()
+    
+    def _mirror_ready(self, table: str) -> bool:
+        return self.mirror is not None and self.mirror.is_ready(table)
+    
+    def _mirror_apply(self, table: str, row: Dict) -> None:
+        if self.mirror is not None and isinstance(row, dict):
+            self.mirror.apply(table, row)
+    
+    def start_background_sync(self) -> None:
+        """
+        Inicia a sincronização periódica da réplica local (se ativa)
+        """
+        if self.mirror is not None:
+            self.mirror.start()
+    
+    def freshness(self, table: str) -> Dict:
+        """
+        Indica a origem dos dados lidos de uma tabela e a sua atualidade
+        """
+        if self._mirror_ready(table):
+            return self.mirror.freshness(table)
+        return {'source': 'supabase'}
+    
+    def _student_cache_generation(self) -> int:
+        """
+        Geração atual da cache, a obter antes de ler um estudante da base
+        """
+        return self._student_generation
+    
+    def _remember_student(self, student: Dict, generation: Optional[int] = None) -> Dict:
+        """
+        Guarda uma cópia do estudante descriptografado na cache
+        
+        Com `generation` (obtida antes da leitura) a cópia não é guardada se
+        o estudante tiver sido invalidado entretanto.
+        """
+        student_id = student.get('id')
+        if self.student_cache is not None and student_id is not None:
+            with self._student_cache_lock:
+                if generation is None or (
+                    generation >= self._student_pruned_generation
+                    and self._student_invalidated.get(student_id, -1) <= generation
+                ):
+                    self.student_cache.set(student_id, dict(student))
+        return student
+    
+    def _forget_student(self, student_id: int) -> None:
+        """
+        Remove um estudante da cache e invalida as leituras em curso
+        """
+        if self.student_cache is not None:
+            with self._student_cache_lock:
+                self._student_generation += 1
+                self._student_invalidated.pop(student_id, None)
+                self._student_invalidated[student_id] = self._student_generation
+                while len(self._student_invalidated) > self.student_cache.maxsize:
+                    _oldest, self._student_pruned_generation = self._student_invalidated.popitem(last=False)
+                self.student_cache.pop(student_id)
+    
+    def get_student_cache_stats(self) -> Dict:
+        """
+        Contadores de utilização da cache de estudantes
+        """
+        if self.student_cache is None:
+            return {'enabled': False}
+        return {'enabled': True, **self.student_cache.stats()}
+    
+    def _load_student_stat_rows(self) -> Iterator[Dict]:
+        """
+        Lê apenas as colunas usadas nas estatísticas (sem descriptografia)
+        """
+        return self.iter_students(columns=STAT_COLUMNS, page_size=1000)
+    
+    def get_student_stats(self) -> Optional[Dict]:
+        """
+        Obtém estatísticas agregadas dos estudantes (None se ainda não foi
+        possível calculá-las)
+        """
+        return self.student_stats.snapshot()
+    
     # === RESERVAS ===
     
     def create_reservation(self, reservation_data: Dict) -> Dict:
@@ -150,17 +757,17 @@ class SupabaseService:
         reservation_data['updated_at'] = datetime.utcnow().isoformat()
         
         try:
-            response = requests.post(
+            response = self.http.post(
                 f"{self.base_url}/reservations",
                 headers=self.headers,
-                json=reservation_data,
-                timeout=10
+                json=reservation_data
             )
             
             if response.status_code in [200, 201]:
                 result = response.json()
                 if isinstance(result, list) and result:
-                    return result[0]
+                    result = result[0]
+                self._mirror_apply('reservations', result)
                 return result
             else:
                 return {
@@ -172,10 +779,36 @@ class SupabaseService:
             print(f"Erro Supabase create_reservation: {e}")
             return {'error': str(e), 'mock_created': True}
     
-    def get_reservations(self, filters: Dict = None) -> List[Dict]:
+    def get_reservations(self, filters: Dict = None, embed_students: bool = False) -> List[Dict]:
         """
         Obtém reservas com filtros opcionais
+        
+        Com `embed_students` cada reserva traz o estudante em `students`,
+        obtido no mesmo pedido (resource embedding do PostgREST) ou, na
+        réplica local, com uma única consulta em lote.
         """
+        if self._mirror_ready('reservations'):
+            mirror_filters = []
+            if filters:
+                if filters.get('status'):
+                    mirror_filters.append(('status', 'eq', filters['status']))
+                if filters.get('date_from'):
+                    mirror_filters.append(('date', 'gte', filters['date_from']))
+                if filters.get('date_to'):
+                    mirror_filters.append(('date', 'lte', filters['date_to']))
+                if filters.get('student_id'):
+                    mirror_filters.append(('student_id', 'eq', int(filters['student_id'])))
+            reservations = self.mirror.query('reservations', filters=mirror_filters)
+            if embed_students:
+                students = self.get_students([r.get('student_id') for r in reservations])
+                for reservation in reservations:
+                    student = students.get(reservation.get('student_id'))
+                    reservation['students'] = (
+                        {column: student.get(column) for column in RESERVATION_STUDENT_COLUMNS}
+                        if student else None
+                    )
+            return reservations
+        
         try:
             url = f"{self.base_url}/reservations"
             params = []
@@ -190,13 +823,21 @@ class SupabaseService:
                 if filters.get('student_id'):
                     params.append(f"student_id=eq.{filters['student_id']}")
             
+            if embed_students:
+                params.append(f"select=*,students({','.join(RESERVATION_STUDENT_COLUMNS)})")
+            
             if params:
                 url += "?" + "&".join(params)
             
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = self.http.get(url, headers=self.headers)
             
             if response.status_code == 200:
-                return response.json()
+                reservations = response.json()
+                if embed_students:
+                    for reservation in reservations:
+                        if reservation.get('students'):
+                            reservation['students'] = decrypt_sensitive_data(reservation['students'])
+                return reservations
             else:
                 print(f"Erro ao obter reservas: {response.status_code}")
                 return []
@@ -218,16 +859,16 @@ class SupabaseService:
             update_data['notes'] = notes
         
         try:
-            response = requests.patch(
+            response = self.http.patch(
                 f"{self.base_url}/reservations?id=eq.{reservation_id}",
                 headers=self.headers,
-                json=update_data,
-                timeout=10
+                json=update_data
             )
             
             if response.status_code == 200:
                 data = response.json()
                 if data:
+                    self._mirror_apply('reservations', data[0])
                     return data[0]
                 return {'success': True}
             else:
@@ -240,20 +881,88 @@ class SupabaseService:
             print(f"Erro Supabase update_reservation_status: {e}")
             return {'error': str(e)}
     
+    # === ESCRITA EM LOTE ===
+    
+    def insert_rows(self, table: str, rows: List[Dict]) -> List[Dict]:
+        """
+        Insere várias linhas numa tabela com um pedido por conjunto de colunas
+        
+        O PostgREST exige que todas as linhas de um array tenham as mesmas
+        chaves, por isso as linhas são agrupadas pelas suas colunas. Devolve
+        as linhas dos grupos que falharam (lista vazia se todas foram gravadas),
+        para que apenas essas sejam reenviadas.
+        """
+        groups: Dict[tuple, List[Dict]] = {}
+        for row in rows:
+            groups.setdefault(tuple(sorted(row.keys())), []).append(row)
+        
+        headers = {**self.headers, 'Prefer': 'return=minimal'}
+        failed = []
+        for group in groups.values():
+            try:
+                response = self.http.post(
+                    f"{self.base_url}/{table}",
+                    headers=headers,
+                    json=group
+                )
+            except Exception as e:
+                print(f"Erro ao inserir lote em {table}: {e}")
+                failed.extend(group)
+                continue
+            if response.status_code not in [200, 201, 204]:
+                print(f"Erro ao inserir lote em {table}: {response.status_code} - {response.text}")
+                failed.extend(group)
+        return failed
+    
+    def _write_buffer(self, table: str) -> Optional[WriteBehindBuffer]:
+        """
+        Obtém o buffer de escrita diferida de uma tabela (None se desativado)
+        """
+        if not self.write_behind_enabled:
+            return None
+        
+        buffer = self._write_buffers.get(table)
+        if buffer is None:
+            with self._write_buffers_lock:
+                buffer = self._write_buffers.get(table)
+                if buffer is None:
+                    spill_dir = os.getenv('WRITE_BEHIND_SPILL_DIR')
+                    buffer = register_shutdown_flush(WriteBehindBuffer(
+                        table,
+                        lambda rows: self.insert_rows(table, rows),
+                        batch_size=int(os.getenv('WRITE_BEHIND_BATCH_SIZE', 100)),
+                        flush_interval_ms=int(os.getenv('WRITE_BEHIND_FLUSH_MS', 2000)),
+                        max_queue=int(os.getenv('WRITE_BEHIND_MAX_QUEUE', 10000)),
+                        spill_path=os.path.join(spill_dir, f'{table}.ndjson') if spill_dir else None
+                    ))
+                    self._write_buffers[table] = buffer
+        return buffer
+    
+    def get_write_behind_stats(self) -> Dict:
+        """
+        Contadores dos buffers de escrita diferida
+        """
+        return {table: buffer.stats() for table, buffer in self._write_buffers.items()}
+    
     # === HISTÓRICO DE MENSAGENS ===
     
     def log_message(self, message_data: Dict) -> Dict:
         """
         Registra mensagem enviada no histórico
         """
-        message_data['timestamp'] = datetime.utcnow().isoformat()
+        message_data = dict(message_data, timestamp=datetime.utcnow().isoformat())
+        
+        buffer = self._write_buffer('message_history')
+        if buffer is not None:
+            if buffer.append(message_data):
+                return {'queued': True, **message_data}
+            return {'error': 'Fila do histórico de mensagens cheia'}
         
         try:
-            response = requests.post(
+            response = self.http.post(
                 f"{self.base_url}/message_history",
                 headers=self.headers,
-                json=message_data,
-                timeout=10
+                json=message_data
             )
             
             if response.status_code in [200, 201]:
@@ -289,7 +998,7 @@ class SupabaseService:
             
             url += "?" + "&".join(params)
             
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = self.http.get(url, headers=self.headers)
             
             if response.status_code == 200:
                 return response.json()
@@ -307,14 +1016,19 @@ class SupabaseService:
         """
         Salva dados meteorológicos para histórico
         """
-        weather_data['timestamp'] = datetime.utcnow().isoformat()
+        weather_data = dict(weather_data, timestamp=datetime.utcnow().isoformat())
+        
+        buffer = self._write_buffer('weather_history')
+        if buffer is not None:
+            if buffer.append(weather_data):
+                return {'queued': True, **weather_data}
+            return {'error': 'Fila do histórico meteorológico cheia'}
         
         try:
-            response = requests.post(
+            response = self.http.post(
                 f"{self.base_url}/weather_history",
                 headers=self.headers,
-                json=weather_data,
-                timeout=10
+                json=weather_data
             )
             
             if response.status_code in [200, 201]:
@@ -332,9 +1046,13 @@ class SupabaseService:
             print(f"Erro Supabase save_weather_data: {e}")
             return {'error': str(e)}
     
-    def get_weather_history(self, location: str = None, hours: int = 24) -> List[Dict]:
+    def get_weather_history(self, location: str = None, hours: int = 24,
+                            raise_errors: bool = False) -> List[Dict]:
         """
         Obtém histórico meteorológico
+        
+        Com `raise_errors` uma falha levanta RuntimeError em vez de devolver
+        uma lista vazia, para que não seja confundida com "sem registos".
         """
         try:
             url = f"{self.base_url}/weather_history"
@@ -349,16 +1067,20 @@ class SupabaseService:
             
             url += "?" + "&".join(params)
             
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = self.http.get(url, headers=self.headers)
             
             if response.status_code == 200:
                 return response.json()
             else:
+                if raise_errors:
+                    raise RuntimeError(f'Erro ao obter histórico meteorológico: {response.status_code}')
                 print(f"Erro ao obter histórico meteorológico: {response.status_code}")
                 return []
                 
         except Exception as e:
             print(f"Erro Supabase get_weather_history: {e}")
+            if raise_errors:
+                raise
             return []
     
     # === CONFIGURAÇÕES ===
@@ -367,11 +1089,14 @@ class SupabaseService:
         """
         Obtém configurações do sistema
         """
+        if self._mirror_ready('settings'):
+            rows = self.mirror.query('settings', limit=1)
+            return rows[0] if rows else {}
+        
         try:
-            response = requests.get(
+            response = self.http.get(
                 f"{self.base_url}/settings",
-                headers=self.headers,
-                timeout=10
+                headers=self.headers
             )
             
             if response.status_code == 200:
@@ -394,16 +1119,16 @@ class SupabaseService:
         settings_data['updated_at'] = datetime.utcnow().isoformat()
         
         try:
-            response = requests.patch(
+            response = self.http.patch(
                 f"{self.base_url}/settings?id=eq.1",
                 headers=self.headers,
-                json=settings_data,
-                timeout=10
+                json=settings_data
             )
             
             if response.status_code == 200:
                 data = response.json()
                 if data:
+                    self._mirror_apply('settings', data[0])
                     return data[0]
                 return {'success': True}
             else:
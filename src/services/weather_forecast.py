@@ -0,0 +1,151 @@
+"""
+Série horária compacta da previsão meteorológica de um local
+"""
+import calendar
+import json
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Métricas pedidas à Stormglass e guardadas na previsão
+FORECAST_METRICS = (
+    "waveHeight",
+    "wavePeriod",
+    "windSpeed",
+    "gust",
+    "precipitation",
+    "visibility",
+    "waterTemperature",
+    "airTemperature",
+)
+
+# Limites do semáforo (partilhados pelo cálculo hora a hora e pelo vetorizado).
+# Visibilidade: alerta abaixo do limite; restantes métricas: acima do limite.
+STATUS_THRESHOLDS = {
+    "RED": {"waveHeight": 2.0, "windSpeed": 25, "gust": 35, "precipitation": 50, "visibility": 2},
+    "YELLOW": {"waveHeight": 1.2, "windSpeed": 15, "gust": 25, "precipitation": 20, "visibility": 5},
+}
+LOWER_IS_WORSE = ("visibility",)
+
+# Ordem de gravidade do semáforo
+STATUS_SEVERITY = {"GREEN": 0, "YELLOW": 1, "RED": 2}
+
+
+def traffic_light_status(values: Dict[str, float], thresholds: Optional[Dict] = None) -> str:
+    """Status do semáforo para valores já preenchidos (métricas de STATUS_THRESHOLDS)."""
+    thresholds = thresholds or STATUS_THRESHOLDS
+    for status in ("RED", "YELLOW"):
+        for metric, limit in thresholds[status].items():
+            if metric in LOWER_IS_WORSE:
+                if values[metric] < limit:
+                    return status
+            elif values[metric] > limit:
+                return status
+    return "GREEN"
+
+
+def metric_value(hour_data: Dict, metric: str) -> Optional[float]:
+    """Extrai o valor de uma métrica usando a primeira fonte disponível."""
+    if metric in hour_data and hour_data[metric]:
+        for _source, value in hour_data[metric].items():
+            if value is not None:
+                return float(value)
+    return None
+
+
+def to_timestamp(value) -> int:
+    """Converte um datetime (naive = UTC) ou uma data ISO em segundos desde a época."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return calendar.timegm(value.utctimetuple())
+
+
+class HourlyForecast:
+    """
+    Previsão horária guardada em arrays de float32 (um por métrica), com os
+    valores em falta como NaN, e os instantes em segundos desde a época.
+
+    72 horas x 8 métricas ocupam cerca de 2,8 KB, em vez dos dicionários
+    aninhados (uma entrada por fonte) devolvidos pela API.
+    """
+
+    def __init__(self, times: array, metrics: Dict[str, array], fetched_at: Optional[datetime] = None):
+        self.times = times
+        self.metrics = metrics
+        self.fetched_at = fetched_at or datetime.utcnow()
+
+    @classmethod
+    def from_stormglass(cls, raw_data: Dict) -> "HourlyForecast":
+        hours = sorted(
+            (hour for hour in raw_data.get("hours") or [] if hour.get("time")),
+            key=lambda hour: hour["time"],
+        )
+        times = array("q", (to_timestamp(hour["time"]) for hour in hours))
+        metrics = {}
+        for metric in FORECAST_METRICS:
+            values = (metric_value(hour, metric) for hour in hours)
+            metrics[metric] = array("f", (math.nan if value is None else value for value in values))
+        return cls(times, metrics)
+
+    def to_bytes(self) -> bytes:
+        """Serializa a previsão: cabeçalho JSON numa linha seguido dos arrays."""
+        header = {
+            "fetched_at": self.fetched_at.isoformat(),
+            "hours": len(self.times),
+            "metrics": list(self.metrics),
+        }
+        parts = [json.dumps(header).encode() + b"\n", self.times.tobytes()]
+        parts.extend(values.tobytes() for values in self.metrics.values())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HourlyForecast":
+        header_line, _, body = data.partition(b"\n")
+        header = json.loads(header_line)
+        hours = header["hours"]
+
+        times = array("q")
+        times.frombytes(body[: hours * times.itemsize])
+        offset = hours * times.itemsize
+        metrics = {}
+        for metric in header["metrics"]:
+            values = array("f")
+            values.frombytes(body[offset: offset + hours * values.itemsize])
+            offset += hours * values.itemsize
+            metrics[metric] = values
+        return cls(times, metrics, datetime.fromisoformat(header["fetched_at"]))
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @property
+    def nbytes(self) -> int:
+        return self.times.itemsize * len(self.times) + sum(
+            values.itemsize * len(values) for values in self.metrics.values()
+        )
+
+    def index_at(self, when: datetime) -> int:
+        """Índice da hora que contém `when` (limitado ao intervalo da série)."""
+        index = bisect_right(self.times, to_timestamp(when)) - 1
+        return min(max(index, 0), len(self.times) - 1)
+
+    def values_at(self, index: int) -> Dict[str, Optional[float]]:
+        values = {}
+        for metric, series in self.metrics.items():
+            value = series[index]
+            values[metric] = None if math.isnan(value) else round(value, 2)
+        return values
+
+    def hours(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[Dict]:
+        """Horas no intervalo [start, end), cada uma com o instante e as métricas."""
+        first = 0 if start is None else bisect_left(self.times, to_timestamp(start))
+        last = len(self.times) if end is None else bisect_left(self.times, to_timestamp(end))
+
+        result = []
+        for index in range(first, last):
+            hour = {"time": datetime.utcfromtimestamp(self.times[index]).isoformat()}
+            hour.update(self.values_at(index))
+            result.append(hour)
+        return result
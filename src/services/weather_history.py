@@ -0,0 +1,265 @@
+"""
+Histórico meteorológico em memória (buffers circulares) com agregação por intervalo
+"""
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from src.services.weather_forecast import STATUS_SEVERITY, to_timestamp
+
+# Métricas do payload processado guardadas no histórico (colunas do buffer)
+HISTORY_METRICS = (
+    "waveHeight",
+    "wavePeriod",
+    "windSpeed",
+    "gust",
+    "precipitation",
+    "visibility",
+    "waterTemperature",
+    "temperature",
+)
+
+STATUS_NAMES = {code: name for name, code in STATUS_SEVERITY.items()}
+
+# Intervalos de agregação aceites (segundos)
+ROLLUPS = {"15m": 900, "1h": 3600, "1d": 86400}
+
+
+class RingSeries:
+    """
+    Série temporal de tamanho fixo: `capacity` leituras de float32 (uma
+    coluna por métrica) mais o status e o instante de cada leitura. Quando
+    cheia, cada nova leitura substitui a mais antiga.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.int64)
+        self.values = np.full((capacity, len(HISTORY_METRICS)), np.nan, dtype=np.float32)
+        self.status = np.zeros(capacity, dtype=np.uint8)
+        self.size = 0
+        self._next = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def nbytes(self) -> int:
+        return self.times.nbytes + self.values.nbytes + self.status.nbytes
+
+    @property
+    def first_time(self) -> Optional[int]:
+        if not self.size:
+            return None
+        return int(self.times[(self._next - self.size) % self.capacity])
+
+    @property
+    def last_time(self) -> Optional[int]:
+        if not self.size:
+            return None
+        return int(self.times[(self._next - 1) % self.capacity])
+
+    def append(self, timestamp: int, values: List[float], status: int) -> bool:
+        """
+        Acrescenta uma leitura. Uma leitura com o mesmo instante da última
+        substitui-a; leituras mais antigas do que a última são ignoradas.
+        """
+        last = self.last_time
+        if last is not None and timestamp < last:
+            return False
+        if last is not None and timestamp == last:
+            slot = (self._next - 1) % self.capacity
+        else:
+            slot = self._next
+            self._next = (self._next + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+        self.times[slot] = timestamp
+        self.values[slot] = values
+        self.status[slot] = status
+        return True
+
+    def ordered(self, start: Optional[int] = None, end: Optional[int] = None):
+        """(instantes, valores, status) por ordem cronológica, dentro de [start, end)."""
+        first = (self._next - self.size) % self.capacity
+        order = (np.arange(self.size) + first) % self.capacity
+        times = self.times[order]
+        lo = 0 if start is None else int(np.searchsorted(times, start))
+        hi = self.size if end is None else int(np.searchsorted(times, end))
+        order = order[lo:hi]
+        return times[lo:hi], self.values[order], self.status[order]
+
+
+def rollup(times: np.ndarray, values: np.ndarray, status: np.ndarray, bucket_seconds: int) -> Dict:
+    """
+    Agrega leituras ordenadas (pelo menos uma) em intervalos de
+    `bucket_seconds`: mínimo, máximo e média por métrica (ignorando valores
+    em falta), número de leituras e pior status de cada intervalo.
+    """
+    buckets = times // bucket_seconds * bucket_seconds
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    present = ~np.isnan(values)
+    counts = np.add.reduceat(present, starts, axis=0)
+    sums = np.add.reduceat(np.where(present, values, 0), starts, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        averages = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+    return {
+        "times": buckets[starts],
+        "count": np.diff(np.r_[starts, len(times)]),
+        "min": np.fmin.reduceat(values, starts, axis=0),
+        "max": np.fmax.reduceat(values, starts, axis=0),
+        "avg": averages,
+        "status": np.maximum.reduceat(status, starts),
+    }
+
+
+def _round(value) -> Optional[float]:
+    value = float(value)
+    return None if np.isnan(value) else round(value, 2)
+
+
+class WeatherHistory:
+    """
+    Histórico por local em buffers circulares (RingSeries), alimentado com
+    cada payload meteorológico processado. Responde a consultas de histórico
+    sem pedidos à rede; o Supabase (tabela weather_history) serve apenas para
+    preencher, uma vez por local, o período anterior ao arranque do processo.
+    """
+
+    def __init__(self, capacity: int = 4096):
+        self.capacity = capacity
+        self._series: Dict[str, RingSeries] = {}
+        self._backfilled: Dict[str, int] = {}
+        self._backfilling: set = set()
+        self._lock = threading.Lock()
+
+    def _get_series(self, location: str) -> RingSeries:
+        series = self._series.get(location)
+        if series is None:
+            series = self._series[location] = RingSeries(self.capacity)
+        return series
+
+    @staticmethod
+    def _parse(payload: Dict):
+        """(instante, valores, status) de um payload, ou None se não for uma leitura real."""
+        if not payload or payload.get("source") == "mock_data" or not payload.get("timestamp"):
+            return None
+        try:
+            timestamp = to_timestamp(payload["timestamp"])
+        except (TypeError, ValueError):
+            return None
+        values = [
+            np.nan if payload.get(metric) is None else float(payload[metric])
+            for metric in HISTORY_METRICS
+        ]
+        return timestamp, values, STATUS_SEVERITY.get(payload.get("status"), 0)
+
+    def record(self, location: str, payload: Dict) -> bool:
+        """Guarda uma leitura (payload de WeatherService); ignora dados fictícios."""
+        reading = self._parse(payload)
+        if reading is None:
+            return False
+        with self._lock:
+            return self._get_series(location).append(*reading)
+
+    def backfill(self, location: str, hours: int, fetch: Callable[[str, int], List[Dict]]) -> int:
+        """
+        Completa o histórico de um local com linhas do Supabase (`fetch`) se a
+        memória não cobrir as últimas `hours` horas. Cada período é pedido no
+        máximo uma vez por processo com sucesso: se `fetch` levantar uma
+        exceção, o pedido volta a ser feito na consulta seguinte. Devolve o
+        número de leituras importadas.
+        """
+        start = to_timestamp(datetime.utcnow() - timedelta(hours=hours))
+        with self._lock:
+            series = self._series.get(location)
+            if series is not None and series.first_time is not None and series.first_time <= start:
+                return 0
+            if self._backfilled.get(location, 0) >= hours or location in self._backfilling:
+                return 0
+            self._backfilling.add(location)
+
+        try:
+            rows = fetch(location, hours) or []
+        except Exception as e:
+            print(f"Erro ao importar histórico meteorológico de {location}: {e}")
+            with self._lock:
+                self._backfilling.discard(location)
+            return 0
+
+        readings = sorted(
+            (reading for reading in map(self._parse, rows) if reading),
+            key=lambda reading: reading[0]
+        )
+        loaded = RingSeries(self.capacity)
+        imported = sum(1 for reading in readings if loaded.append(*reading))
+
+        with self._lock:
+            # As leituras já em memória (mais recentes) são repostas por cima
+            current = self._series.get(location)
+            if current is not None:
+                times, values, status = current.ordered()
+                for timestamp, row, code in zip(times.tolist(), values, status.tolist()):
+                    loaded.append(timestamp, row, code)
+            self._series[location] = loaded
+            self._backfilled[location] = max(self._backfilled.get(location, 0), hours)
+            self._backfilling.discard(location)
+        return imported
+
+    def drop(self, location: str) -> None:
+        """Esquece o histórico de um local (ex.: coordenadas alteradas)."""
+        with self._lock:
+            self._series.pop(location, None)
+            self._backfilled.pop(location, None)
+
+    def query(self, location: str, hours: int = 24, bucket: Optional[str] = None) -> List[Dict]:
+        """
+        Leituras das últimas `hours` horas, por ordem cronológica, ou agregadas
+        por `bucket` (15m, 1h ou 1d) com min/max/avg por métrica.
+        """
+        if bucket is not None and bucket not in ROLLUPS:
+            raise ValueError(f"bucket deve ser um de: {', '.join(ROLLUPS)}")
+
+        start = to_timestamp(datetime.utcnow() - timedelta(hours=hours))
+        with self._lock:
+            series = self._series.get(location)
+            if series is None:
+                return []
+            times, values, status = series.ordered(start=start)
+        if not len(times):
+            return []
+
+        if bucket is None:
+            points = []
+            for timestamp, row, code in zip(times.tolist(), values, status.tolist()):
+                point = {"timestamp": datetime.utcfromtimestamp(timestamp).isoformat(),
+                         "status": STATUS_NAMES[code]}
+                point.update({metric: _round(value) for metric, value in zip(HISTORY_METRICS, row)})
+                points.append(point)
+            return points
+
+        result = rollup(times, values, status, ROLLUPS[bucket])
+        points = []
+        for index, timestamp in enumerate(result["times"].tolist()):
+            point = {
+                "timestamp": datetime.utcfromtimestamp(timestamp).isoformat(),
+                "count": int(result["count"][index]),
+                "worst_status": STATUS_NAMES[int(result["status"][index])],
+            }
+            for column, metric in enumerate(HISTORY_METRICS):
+                point[metric] = {
+                    "min": _round(result["min"][index, column]),
+                    "max": _round(result["max"][index, column]),
+                    "avg": _round(result["avg"][index, column]),
+                }
+            points.append(point)
+        return points
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "locations": {location: len(series) for location, series in self._series.items()},
+                "bytes": sum(series.nbytes for series in self._series.values()),
+            }
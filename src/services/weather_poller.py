@@ -0,0 +1,291 @@
+"""
+Atualização periódica do estado meteorológico com alertas nas transições
+"""
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from src.services.notification_service import notification_service
+from src.services.weather_forecast import (
+    LOWER_IS_WORSE,
+    STATUS_SEVERITY,
+    STATUS_THRESHOLDS,
+    traffic_light_status,
+)
+from src.services.weather_service import weather_service
+from src.services.weather_store import DEFAULT_WEATHER_STORE_PATH, SharedWeatherStore
+from src.services.whatsapp_service import whatsapp_service
+
+# Lease da base partilhada: apenas um worker executa o poller
+POLLER_LEASE_KEY = 'weather-poller'
+
+# Intervalo usado quando não há configuração nem orçamento da API
+DEFAULT_POLL_INTERVAL = 900
+
+
+def parse_intervals(value: Optional[str]) -> Dict[str, float]:
+    """Converte "berlengas=600,peniche=1200" em {local: segundos}."""
+    intervals = {}
+    for item in (value or '').split(','):
+        key, _, seconds = item.partition('=')
+        if key.strip() and seconds.strip():
+            intervals[key.strip().lower()] = float(seconds)
+    return intervals
+
+
+def strict_thresholds(margin: float) -> Dict:
+    """Limites do semáforo apertados em `margin` (fração), usados para melhorias de status."""
+    return {
+        status: {
+            metric: limit * (1 + margin) if metric in LOWER_IS_WORSE else limit * (1 - margin)
+            for metric, limit in limits.items()
+        }
+        for status, limits in STATUS_THRESHOLDS.items()
+    }
+
+
+class WeatherPoller:
+    """
+    Atualiza cada local no seu intervalo e compara o novo status do
+    semáforo com o último conhecido, notificando apenas as transições.
+
+    Para evitar alertas repetidos com leituras junto aos limites:
+    - histerese: uma melhoria (ex.: RED -> YELLOW) só conta se as condições
+      ficarem abaixo dos limites com uma folga de `margin`;
+    - confirmação: o novo status tem de se repetir em `confirmations`
+      leituras seguidas antes de ser aceite.
+
+    A primeira leitura de cada local apenas define o estado de referência.
+    Com vários workers, apenas o que detém o lease na cache partilhada faz
+    as leituras. O lease dura `lease_seconds` e é renovado antes de cada
+    local, pelo que basta cobrir a leitura de um local; se for perdido a
+    meio, a ronda termina sem ler os restantes.
+    """
+
+    def __init__(self, weather=None, notifier=None, whatsapp=None, store=None,
+                 default_interval: Optional[float] = None, intervals: Optional[Dict[str, float]] = None,
+                 margin: float = 0.1, confirmations: int = 2,
+                 alert_phones: Optional[List[str]] = None, tick: float = 5,
+                 lease_seconds: Optional[float] = None):
+        self.weather = weather or weather_service
+        self.notifier = notifier or notification_service
+        self.whatsapp = whatsapp or whatsapp_service
+        self.store = store
+        self.default_interval = default_interval
+        self.intervals = dict(intervals or {})
+        self.margin = margin
+        self.confirmations = max(int(confirmations), 1)
+        self.alert_phones = list(alert_phones or [])
+        self.tick = tick
+        self.lease_seconds = lease_seconds or max(tick * 3, 60)
+
+        self._strict = strict_thresholds(margin)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+        self.sites: Dict[str, Dict] = {}
+        self.polls = 0
+        self.transitions = 0
+        self.suppressed = 0
+        self.notifications = 0
+        self.errors = 0
+
+    # === ESTADO ===
+
+    def _site_state(self, location: str) -> Dict:
+        return self.sites.setdefault(location, {
+            'status': None, 'candidate': None, 'count': 0, 'reading': None,
+            'last_poll': None, 'next_poll': 0.0, 'changed_at': None,
+        })
+
+    def interval_for(self, location: str) -> float:
+        """Intervalo configurado (do local ou geral) ou, sem ele, o do orçamento da API."""
+        if location in self.intervals:
+            return self.intervals[location]
+        if self.default_interval is not None:
+            return self.default_interval
+        refresh_interval = getattr(self.weather, 'refresh_interval', None)
+        return refresh_interval(location) if refresh_interval else DEFAULT_POLL_INTERVAL
+
+    def _effective_status(self, data: Dict, previous: Optional[str]) -> str:
+        values = {
+            'waveHeight': data.get('waveHeight') or 0,
+            'windSpeed': data.get('windSpeed') or 0,
+            'gust': data.get('gust') or 0,
+            'precipitation': data.get('precipitation') or 0,
+            'visibility': data.get('visibility') or 10,
+        }
+        status = traffic_light_status(values)
+        if previous is None or STATUS_SEVERITY[status] >= STATUS_SEVERITY[previous]:
+            return status
+
+        # Melhoria: só até onde as condições passam os limites com folga
+        strict = traffic_light_status(values, self._strict)
+        return strict if STATUS_SEVERITY[strict] < STATUS_SEVERITY[previous] else previous
+
+    def observe(self, location: str, data: Dict, immediate: bool = False) -> Optional[Dict]:
+        """
+        Regista uma leitura de um local e devolve a transição aceite (ou None).
+
+        Com `immediate` (ex.: status forçado) o status do payload é aceite sem
+        histerese nem confirmação e notificado mesmo sem estado anterior.
+        Um payload com o mesmo `timestamp` da leitura anterior (a mesma
+        entrada da cache lida de novo) não conta como confirmação.
+        """
+        with self._lock:
+            state = self._site_state(location)
+            previous = state['status']
+            status = data['status'] if immediate else self._effective_status(data, previous)
+            timestamp = data.get('timestamp')
+            repeated = timestamp is not None and timestamp == state['reading']
+            state['reading'] = timestamp
+
+            if status == previous:
+                state['candidate'], state['count'] = None, 0
+                return None
+
+            if not immediate and previous is not None:
+                if state['candidate'] == status:
+                    if not repeated:
+                        state['count'] += 1
+                else:
+                    state['candidate'], state['count'] = status, 1
+                if state['count'] < self.confirmations:
+                    self.suppressed += 1
+                    return None
+
+            state['status'] = status
+            state['candidate'], state['count'] = None, 0
+            state['changed_at'] = datetime.utcnow().isoformat()
+            if previous is None and not immediate:
+                return None
+            self.transitions += 1
+
+        transition = {'location': location, 'from': previous, 'to': status}
+        self._notify(location, data, status)
+        return transition
+
+    def _notify(self, location: str, data: Dict, status: str) -> None:
+        name = data.get('location') or location.title()
+        try:
+            self.notifier.send_notification('Atualização meteorológica', f"{name} agora {status}")
+            self.notifications += 1
+        except Exception as e:
+            print(f"Erro ao notificar transição meteorológica: {e}")
+
+        if self.alert_phones:
+            try:
+                self.whatsapp.send_weather_alert(self.alert_phones, name, status, {
+                    'wave_height': data.get('waveHeight'),
+                    'wind_speed': data.get('windSpeed'),
+                    'precipitation': data.get('precipitation'),
+                })
+            except Exception as e:
+                print(f"Erro ao enviar alerta WhatsApp: {e}")
+
+    # === EXECUÇÃO ===
+
+    def _renew_lease(self) -> bool:
+        return self.store is None or self.store.acquire_lease(POLLER_LEASE_KEY, self.lease_seconds)
+
+    def poll_once(self, now: Optional[float] = None, renew: Optional[Callable[[], bool]] = None) -> List[Dict]:
+        """
+        Lê os locais cujo intervalo expirou e devolve as transições aceites.
+        `renew` é chamado antes de cada leitura; se devolver False a ronda termina.
+        """
+        now = time.monotonic() if now is None else now
+        locations = list(self.weather.locations)
+
+        # Locais removidos do registo deixam de ser acompanhados
+        for location in list(self.sites):
+            if location not in locations:
+                self.sites.pop(location, None)
+
+        transitions = []
+        for location in locations:
+            state = self.sites.get(location)
+            if state is not None and state['next_poll'] > now:
+                continue
+            if renew is not None and not renew():
+                print("Lease do poller meteorológico perdido: ronda interrompida")
+                break
+            try:
+                data = self.weather.get_weather_data(location, track=False)
+            except Exception as e:
+                print(f"Erro ao atualizar meteorologia de {location}: {e}")
+                self.errors += 1
+                data = None
+
+            self.polls += 1
+            # Dados fictícios (API indisponível) não alteram o estado conhecido
+            if data and data.get('source') != 'mock_data':
+                transition = self.observe(location, data)
+                if transition:
+                    transitions.append(transition)
+
+            state = self._site_state(location)
+            state['last_poll'] = datetime.utcnow().isoformat()
+            state['next_poll'] = now + self.interval_for(location)
+        return transitions
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if self._renew_lease():
+                try:
+                    self.poll_once(renew=self._renew_lease)
+                except Exception as e:
+                    print(f"Erro no poller meteorológico: {e}")
+                    self.errors += 1
+            self._stop.wait(self.tick)
+        if self.store is not None:
+            self.store.release_lease(POLLER_LEASE_KEY)
+
+    def start(self) -> None:
+        """Inicia as leituras periódicas em segundo plano."""
+        if not self.is_running():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='weather-poller', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def status(self) -> Dict:
+        now = time.monotonic()
+        return {
+            'running': self.is_running(),
+            'polls': self.polls,
+            'transitions': self.transitions,
+            'suppressed': self.suppressed,
+            'notifications': self.notifications,
+            'errors': self.errors,
+            'sites': {
+                location: {
+                    'status': state['status'],
+                    'pending': state['candidate'],
+                    'changed_at': state['changed_at'],
+                    'last_poll': state['last_poll'],
+                    'interval': self.interval_for(location),
+                    'next_poll_in': max(round(state['next_poll'] - now, 1), 0),
+                }
+                for location, state in list(self.sites.items())
+            },
+        }
+
+
+# Instância global do poller (iniciado em main.py se WEATHER_POLLER_ENABLED)
+weather_poller = WeatherPoller(
+    store=SharedWeatherStore(os.getenv('WEATHER_SHARED_CACHE_PATH', DEFAULT_WEATHER_STORE_PATH)),
+    default_interval=float(os.getenv('WEATHER_POLL_INTERVAL')) if os.getenv('WEATHER_POLL_INTERVAL') else None,
+    intervals=parse_intervals(os.getenv('WEATHER_POLL_INTERVALS')),
+    margin=float(os.getenv('WEATHER_STATUS_MARGIN', 0.1)),
+    confirmations=int(os.getenv('WEATHER_STATUS_CONFIRMATIONS', 2)),
+    alert_phones=[phone.strip() for phone in os.getenv('WEATHER_ALERT_PHONES', '').split(',') if phone.strip()],
+    lease_seconds=float(os.getenv('WEATHER_POLL_LEASE_SECONDS', 60)),
+)
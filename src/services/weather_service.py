@@ -2,11 +2,28 @@
 Serviço de integração com a API Stormglass para dados meteorológicos reais
 """
 
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-
-import requests
+from typing import Dict, List, Optional, Tuple
+
+from src.services.dive_site_registry import dive_site_registry
+from src.services.dive_windows import find_dive_windows
+from src.services.stormglass_quota import StormglassQuota
+from src.services.weather_forecast import (
+    FORECAST_METRICS,
+    HourlyForecast,
+    metric_value,
+    traffic_light_status,
+)
+from src.services.weather_history import WeatherHistory
+from src.services.weather_store import DEFAULT_WEATHER_STORE_PATH, SharedWeatherStore
+from src.utils.cache import TTLCache
+from src.utils.http_transport import http_transport
+from src.utils.singleflight import SingleFlight
 
 
 class WeatherService:
@@ -14,20 +31,99 @@ class WeatherService:
         self.api_url = os.getenv("STORMGLASS_API_URL", "https://api.stormglass.io/v2")
         self.api_key = os.getenv("STORMGLASS_API_KEY")
         self.headers = {"Authorization": self.api_key}
+        self.http = http_transport.client("stormglass")
+
+        # Locais de mergulho (registo persistido na base local)
+        self.registry = dive_site_registry
+        self.registry.subscribe(self._on_sites_changed)
+
+        # Cache persistente partilhada por todos os workers (SQLite em src/database)
+        self._store = None
+        if os.getenv("WEATHER_SHARED_CACHE", "true").lower() == "true":
+            self._store = SharedWeatherStore(
+                os.getenv("WEATHER_SHARED_CACHE_PATH", DEFAULT_WEATHER_STORE_PATH)
+            )
+        self.shared_loads = 0
+
+        # Orçamento diário de pedidos à Stormglass, repartido pelos locais:
+        # cada local é atualizado no seu intervalo (no mínimo WEATHER_CACHE_TTL).
+        # O consumo do dia fica na cache partilhada, comum a todos os workers.
+        self._cache_duration = int(os.getenv("WEATHER_CACHE_TTL", 900))
+        self.quota = StormglassQuota(
+            daily_quota=int(os.getenv("STORMGLASS_DAILY_QUOTA", 500)),
+            reserve=float(os.getenv("STORMGLASS_QUOTA_RESERVE", 0.1)),
+            min_interval=self._cache_duration,
+            max_interval=max(int(os.getenv("STORMGLASS_MAX_INTERVAL", 21600)), self._cache_duration),
+            store=self._store,
+        )
 
-        # Coordenadas dos locais de mergulho em Portugal
-        self.locations = {
-            "berlengas": {"lat": 39.4161, "lng": -9.5056},
-            "peniche": {"lat": 39.3558, "lng": -9.3811},
-            "sesimbra": {"lat": 38.4444, "lng": -9.1014},
-        }
+        # Cache por local para evitar muitas chamadas à API. Perto do fim do
+        # intervalo do local (e até max_stale depois) o valor em cache
+        # continua a ser servido enquanto é atualizado em segundo plano.
+        self._refresh_ahead = int(os.getenv("WEATHER_CACHE_REFRESH_AHEAD", 120))
+        self._max_stale = int(os.getenv("WEATHER_CACHE_MAX_STALE", 900))
+        self._cache = TTLCache(
+            maxsize=int(os.getenv("WEATHER_CACHE_SIZE", 256)),
+            ttl=self._cache_duration,
+            max_stale=self.quota.max_interval - self._cache_duration + self._max_stale,
+        )
+        # Previsão horária obtida no mesmo pedido, com a mesma validade
+        self._forecast_hours = int(os.getenv("WEATHER_FORECAST_HOURS", 72))
+        self._forecasts = TTLCache(
+            maxsize=self._cache.maxsize, ttl=self._cache.ttl, max_stale=self._cache.max_stale
+        )
+
+        # Histórico em memória alimentado com cada leitura processada
+        self.history = WeatherHistory(capacity=int(os.getenv("WEATHER_HISTORY_SIZE", 4096)))
 
-        # Cache simples para evitar muitas chamadas à API (15 minutos)
-        self._cache: Dict[str, tuple[datetime, Dict]] = {}
-        self._cache_duration = 900
+        self._refreshing: set = set()
+        self._refresh_lock = threading.Lock()
+        self.refreshes = 0
+        self.refresh_failures = 0
 
-    def get_weather_data(self, location: str) -> Optional[Dict]:
-        """Obtém dados meteorológicos atuais para um local específico (payload achatado)."""
+        # Um único pedido à Stormglass em curso por local; os restantes esperam por ele
+        self._flight = SingleFlight()
+        self._flight_timeout = float(os.getenv("WEATHER_FETCH_WAIT_TIMEOUT", 15))
+        # Sem dados, um worker espera pelo pedido de outro em vez de o repetir
+        self._lease_poll = float(os.getenv("WEATHER_LEASE_POLL_INTERVAL", 0.2))
+
+        # Consulta de todos os locais em paralelo, com um prazo global
+        self._fanout_workers = int(os.getenv("WEATHER_FANOUT_WORKERS", 8))
+        self._fanout_deadline = float(os.getenv("WEATHER_ALL_DEADLINE", 8))
+        self._fanout_executor: Optional[ThreadPoolExecutor] = None
+        self._fanout_lock = threading.Lock()
+
+    @property
+    def locations(self) -> Dict[str, Dict]:
+        """Coordenadas dos locais de mergulho registados, por chave."""
+        return self.registry.locations
+
+    def invalidate(self, location: str) -> None:
+        """
+        Esquece os dados de um local (ex.: coordenadas alteradas ou local
+        removido): caches do processo, cache partilhada e histórico.
+        """
+        self._cache.pop(location)
+        self._forecasts.pop(location)
+        if self._store is not None:
+            self._store.delete(f"current:{location}")
+            self._store.delete(f"forecast:{location}")
+        self.history.drop(location)
+
+    def _on_sites_changed(self, changed: List[str]) -> None:
+        # Locais alterados noutro processo: os dados deste deixam de servir
+        for location in changed:
+            self._cache.pop(location)
+            self._forecasts.pop(location)
+            self.history.drop(location)
+
+    def get_weather_data(self, location: str, track: bool = True) -> Optional[Dict]:
+        """
+        Obtém dados meteorológicos atuais para um local específico (payload achatado).
+
+        Com `track` o pedido conta como tráfego do local no orçamento da API
+        (leituras internas, como as do poller, usam track=False).
+        """
         if not location:
             return None
 
@@ -35,26 +131,236 @@ class WeatherService:
         if location_key not in self.locations:
             return None
 
-        # cache por minuto
-        cache_key = f"{location_key}_{datetime.utcnow().strftime('%Y%m%d%H%M')}"
-        if cache_key in self._cache:
-            cached_time, cached_data = self._cache[cache_key]
-            if (datetime.utcnow() - cached_time).seconds < self._cache_duration:
-                return cached_data
+        if track:
+            self.quota.record_request(location_key)
+        return self._get_weather_with_source(location_key)[0]
+
+    def refresh_interval(self, location: str) -> float:
+        """Intervalo de atualização de um local segundo o orçamento da Stormglass."""
+        return self.quota.interval_for(location, self.locations)
+
+    def get_quota_status(self) -> Dict:
+        """Quota da Stormglass restante e intervalos de atualização por local."""
+        return self.quota.status(self.locations)
+
+    def get_forecast(
+        self, location: str, start: Optional[datetime] = None, end: Optional[datetime] = None
+    ) -> Optional[Dict]:
+        """
+        Previsão horária de um local no intervalo [start, end), com o status do
+        semáforo de cada hora. Usa a mesma cache (e o mesmo pedido à API) das
+        condições atuais; por omissão começa na hora atual.
+        """
+        if not location:
+            return None
 
+        location_key = location.lower()
+        if location_key not in self.locations:
+            return None
+
+        self.quota.record_request(location_key)
+        _current, source = self._get_weather_with_source(location_key)
+        entry = self._forecasts.get_entry(location_key)
+        if entry is None:
+            return {"location": location_key.title(), "data_source": "unavailable", "hours": []}
+
+        forecast, _age = entry
+        if start is None:
+            start = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+
+        hours = forecast.hours(start, end)
+        for hour in hours:
+            hour["status"] = self._calculate_hour_status(hour)
+
+        return {
+            "location": location_key.title(),
+            "data_source": source,
+            "fetched_at": forecast.fetched_at.isoformat(),
+            "hours": hours,
+        }
+
+    def _get_weather_with_source(self, location: str) -> Tuple[Dict, str]:
+        """
+        Obtém os dados de um local e a sua origem: 'live' (pedido à API),
+        'cached', 'stale' (expirado, em atualização) ou 'mock'.
+        """
+        entry = self._cache.get_entry(location)
+        if entry is None and self._load_from_store(location):
+            entry = self._cache.get_entry(location)
+        if entry is not None:
+            cached_data, age = entry
+            interval = self.refresh_interval(location)
+            if age <= interval + self._max_stale:
+                if age >= interval - self._refresh_ahead:
+                    self._refresh_in_background(location)
+                return cached_data, "stale" if age > interval else "cached"
+
+        fetched = self._fetch_cold(location)
+        if fetched is not None:
+            return fetched
+
+        # Sem orçamento ou com a API em falha, dados antigos são preferíveis a mock
+        if entry is not None:
+            return entry[0], "stale"
+
+        # Fallback para dados mock realistas
+        return self._get_mock_data(location), "mock"
+
+    def _fetch_cold(self, location: str) -> Optional[Tuple[Dict, str]]:
+        """
+        Obtém um local sem dados utilizáveis em cache. Com a cache partilhada,
+        apenas o worker que detém o lease do local faz o pedido; os restantes
+        aguardam o resultado gravado na cache até o lease expirar.
+        """
+        if self._store is None:
+            return self._live(self._fetch_and_cache(location, priority=True))
+
+        deadline = time.monotonic() + self._flight_timeout
+        while True:
+            if self._store.acquire_lease(location, self._flight_timeout):
+                try:
+                    # Outro worker pode ter terminado entre a falha na cache e o lease
+                    if self._load_from_store(location):
+                        return self._cache.get_entry(location)[0], "cached"
+                    return self._live(self._fetch_and_cache(location, priority=True))
+                finally:
+                    self._store.release_lease(location)
+
+            if self._load_from_store(location):
+                return self._cache.get_entry(location)[0], "cached"
+            if time.monotonic() >= deadline:
+                # O lease de outro worker devia ter expirado: pedido próprio
+                return self._live(self._fetch_and_cache(location, priority=True))
+            time.sleep(self._lease_poll)
+
+    @staticmethod
+    def _live(processed: Optional[Dict]) -> Optional[Tuple[Dict, str]]:
+        if not processed:
+            return None
+        return processed, "mock" if processed.get("source") == "mock_data" else "live"
+
+    def _fetch_and_cache(self, location: str, priority: bool = False) -> Optional[Dict]:
+        """
+        Obtém dados da Stormglass e guarda-os na cache (None em caso de falha
+        ou sem orçamento; só pedidos com `priority` podem usar a reserva).
+        """
+        if not self.quota.can_spend(priority):
+            print(f"Quota da Stormglass esgotada: {location} não foi atualizado")
+            return None
         try:
-            raw_data = self._fetch_stormglass_data(location_key)
+            raw_data = self._fetch_stormglass_data(location)
             if raw_data:
-                processed = self._process_weather_data(raw_data, location_key)
-                self._cache[cache_key] = (datetime.utcnow(), processed)
+                forecast = HourlyForecast.from_stormglass(raw_data)
+                processed = self._process_weather_data(raw_data, location, forecast)
+                if len(forecast):
+                    self._forecasts.set(location, forecast)
+                self._cache.set(location, processed)
+                self.history.record(location, processed)
+                self.quota.record_reading(location, processed)
+                self._save_to_store(location, processed, forecast)
                 return processed
         except Exception as e:  # pragma: no cover
             print(f"Erro ao obter dados da Stormglass: {e}")
+        return None
 
-        # Fallback para dados mock realistas
-        return self._get_mock_data(location_key)
+    def _save_to_store(self, location: str, processed: Dict, forecast: HourlyForecast) -> None:
+        if self._store is None:
+            return
+        self._store.set(f"current:{location}", json.dumps(processed).encode(), self._cache_duration)
+        if len(forecast):
+            self._store.set(f"forecast:{location}", forecast.to_bytes(), self._cache_duration)
+
+    def _load_from_store(self, location: str, max_age: Optional[float] = None) -> bool:
+        """
+        Importa para a cache do processo os dados gravados por outro worker
+        (ou antes de um reinício), mantendo a idade original.
+        """
+        if self._store is None:
+            return False
+        if max_age is None:
+            max_age = self.refresh_interval(location) + self._max_stale
+
+        current = self._store.get(f"current:{location}")
+        if current is None or current[1] > max_age:
+            return False
+        try:
+            processed = json.loads(current[0])
+            self._cache.set(location, processed, age=current[1])
+            self.history.record(location, processed)
+            forecast = self._store.get(f"forecast:{location}")
+            if forecast is not None:
+                self._forecasts.set(location, HourlyForecast.from_bytes(forecast[0]), age=forecast[1])
+        except ValueError as e:
+            print(f"Erro ao ler cache meteorológica partilhada: {e}")
+            return False
+
+        self.shared_loads += 1
+        return True
+
+    def _refresh_in_background(self, location: str) -> None:
+        """Atualiza a entrada de um local numa thread (no máximo uma por local)."""
+        with self._refresh_lock:
+            if location in self._refreshing:
+                return
+            self._refreshing.add(location)
+
+        threading.Thread(
+            target=self._refresh, args=(location,), name=f"weather-refresh-{location}", daemon=True
+        ).start()
+
+    def _refresh(self, location: str) -> None:
+        leased = False
+        try:
+            if self._store is not None:
+                # Outro worker pode já ter atualizado o local
+                if self._load_from_store(location, max_age=self.refresh_interval(location) - self._refresh_ahead):
+                    return
+                leased = self._store.acquire_lease(location, self._flight_timeout)
+                if not leased:
+                    return
+
+            # Em caso de falha mantém-se o valor antigo até sair da janela de max_stale
+            if self._fetch_and_cache(location) is not None:
+                self.refreshes += 1
+            else:
+                self.refresh_failures += 1
+        finally:
+            if leased:
+                self._store.release_lease(location)
+            with self._refresh_lock:
+                self._refreshing.discard(location)
+
+    def get_cache_stats(self) -> Dict:
+        """Contadores da cache meteorológica e das atualizações em segundo plano."""
+        stats = self._cache.stats()
+        stats.update(
+            {
+                "refresh_ahead": self._refresh_ahead,
+                "quota_remaining": self.quota.remaining(),
+                "refreshes": self.refreshes,
+                "refresh_failures": self.refresh_failures,
+                "refreshing": len(self._refreshing),
+                "forecasts": len(self._forecasts),
+                "shared_loads": self.shared_loads,
+                "shared": self._store.stats() if self._store is not None else None,
+                "upstream": self._flight.stats(),
+                "history": self.history.stats(),
+            }
+        )
+        return stats
 
     def _fetch_stormglass_data(self, location: str) -> Optional[Dict]:
+        """
+        Obtém os dados da Stormglass para um local, partilhando o pedido com
+        outras threads que peçam o mesmo local ao mesmo tempo.
+        """
+        return self._flight.do(
+            ("point", location),
+            lambda: self._request_stormglass_data(location),
+            timeout=self._flight_timeout,
+        )
+
+    def _request_stormglass_data(self, location: str) -> Optional[Dict]:
         """Faz a chamada real à API Stormglass."""
         if not self.api_key:
             raise Exception("API Key da Stormglass não configurada")
@@ -62,22 +368,12 @@ class WeatherService:
         coords = self.locations[location]
 
         # Parâmetros meteorológicos relevantes para mergulho
-        params = ",".join(
-            [
-                "waveHeight",
-                "wavePeriod",
-                "windSpeed",
-                "gust",
-                "precipitation",
-                "visibility",
-                "waterTemperature",
-                "airTemperature",
-            ]
-        )
+        params = ",".join(FORECAST_METRICS)
 
-        # Próximas 3 horas
-        start_time = datetime.utcnow().isoformat()
-        end_time = (datetime.utcnow() + timedelta(hours=3)).isoformat()
+        # Próximas horas (72 por omissão) num único pedido, a partir da hora atual
+        start = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        start_time = start.isoformat()
+        end_time = (start + timedelta(hours=self._forecast_hours)).isoformat()
 
         url = f"{self.api_url}/weather/point"
         request_params = {
@@ -88,30 +384,42 @@ class WeatherService:
             "end": end_time,
         }
 
-        response = requests.get(url, headers=self.headers, params=request_params, timeout=10)
+        try:
+            response = self.http.get(url, headers=self.headers, params=request_params)
+        except Exception:
+            # O pedido pode ter chegado à API (ex.: timeout de leitura) e contar para a quota
+            self.quota.record_call(0)
+            raise
         if response.status_code == 200:
-            return response.json()
+            data = response.json()
+            self.quota.record_call(response.status_code, data.get("meta"))
+            return data
+
+        self.quota.record_call(response.status_code)
 
         print(f"Erro na API Stormglass: {response.status_code} - {response.text}")
         return None
 
-    def _process_weather_data(self, raw_data: Dict, location: str) -> Dict:
+    def _process_weather_data(
+        self, raw_data: Dict, location: str, forecast: Optional[HourlyForecast] = None
+    ) -> Dict:
         """Processa os dados brutos da API Stormglass e calcula o status do semáforo."""
-        hours = raw_data.get("hours") or []
-        if not hours:
+        if forecast is None:
+            forecast = HourlyForecast.from_stormglass(raw_data)
+        if not len(forecast):
             return self._get_mock_data(location)
 
-        # Pegar o primeiro bloco horário (mais recente)
-        current_hour = hours[0]
+        # Condições atuais: a hora da previsão que contém o instante atual
+        current_hour = forecast.values_at(forecast.index_at(datetime.utcnow()))
 
-        wave_height = self._get_metric_value(current_hour, "waveHeight") or 0.0
-        wave_period = self._get_metric_value(current_hour, "wavePeriod") or 0.0
-        wind_speed = self._get_metric_value(current_hour, "windSpeed") or 0.0
-        gust = self._get_metric_value(current_hour, "gust") or wind_speed * 1.3
-        precipitation = self._get_metric_value(current_hour, "precipitation") or 0.0
-        visibility = self._get_metric_value(current_hour, "visibility") or 10.0
-        water_temp = self._get_metric_value(current_hour, "waterTemperature") or 18.0
-        air_temp = self._get_metric_value(current_hour, "airTemperature") or 20.0
+        wave_height = current_hour["waveHeight"] or 0.0
+        wave_period = current_hour["wavePeriod"] or 0.0
+        wind_speed = current_hour["windSpeed"] or 0.0
+        gust = current_hour["gust"] or wind_speed * 1.3
+        precipitation = current_hour["precipitation"] or 0.0
+        visibility = current_hour["visibility"] or 10.0
+        water_temp = current_hour["waterTemperature"] or 18.0
+        air_temp = current_hour["airTemperature"] or 20.0
 
         status = self._calculate_traffic_light_status(
             wave_height, wind_speed, gust, precipitation, visibility
@@ -130,17 +438,67 @@ class WeatherService:
             "precipitation": round(precipitation, 1),
             "visibility": round(visibility, 1),
             "timestamp": datetime.utcnow().isoformat(),
-            "next_update": (datetime.utcnow() + timedelta(minutes=15)).isoformat(),
+            # Próxima atualização segundo o intervalo do local no orçamento da API
+            "next_update": (
+                datetime.utcnow() + timedelta(seconds=self.refresh_interval(location))
+            ).isoformat(),
             "source": "stormglass_api",
         }
 
+    def get_dive_windows(
+        self,
+        locations: Optional[List[str]] = None,
+        min_hours: int = 2,
+        level: str = "GREEN",
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Dict:
+        """
+        Janelas de mergulho (horas seguidas com status `level` ou melhor) em
+        vários locais, calculadas de uma vez sobre as previsões em cache.
+        """
+        keys = [location.lower() for location in locations] if locations else list(self.locations)
+        unknown = [key for key in keys if key not in self.locations]
+        if unknown:
+            raise ValueError(f"Locais desconhecidos: {', '.join(unknown)}")
+
+        # Garante previsões em cache (em paralelo, com o mesmo prazo de /all)
+        executor = self._get_fanout_executor()
+        wait(
+            [executor.submit(self._get_weather_with_source, key) for key in keys],
+            timeout=self._fanout_deadline,
+        )
+
+        forecasts = {}
+        for key in keys:
+            entry = self._forecasts.get_entry(key)
+            if entry is not None:
+                forecasts[key] = entry[0]
+
+        windows = find_dive_windows(forecasts, min_hours=min_hours, level=level, start=start, end=end)
+        return {
+            "level": level,
+            "min_hours": min_hours,
+            "locations": [
+                {"location": key.title(), "key": key, "windows": windows[key]} for key in forecasts
+            ],
+            "unavailable": [key for key in keys if key not in forecasts],
+        }
+
+    def _calculate_hour_status(self, values: Dict) -> str:
+        """Status do semáforo de uma hora da previsão (mesmos valores por omissão das condições atuais)."""
+        wind_speed = values.get("windSpeed") or 0.0
+        return self._calculate_traffic_light_status(
+            values.get("waveHeight") or 0.0,
+            wind_speed,
+            values.get("gust") or wind_speed * 1.3,
+            values.get("precipitation") or 0.0,
+            values.get("visibility") or 10.0,
+        )
+
     def _get_metric_value(self, hour_data: Dict, metric: str) -> Optional[float]:
         """Extrai o valor de uma métrica usando a primeira fonte disponível."""
-        if metric in hour_data and hour_data[metric]:
-            for _source, value in hour_data[metric].items():
-                if value is not None:
-                    return float(value)
-        return None
+        return metric_value(hour_data, metric)
 
     def _calculate_traffic_light_status(
         self,
@@ -157,34 +515,15 @@ class WeatherService:
         YELLOW: atenção
         RED: perigoso
         """
-        wave_height = wave_height or 0
-        wind_speed = wind_speed or 0
-        gust = gust or 0
-        precipitation = precipitation or 0
-        visibility = visibility or 10
-
-        # Vermelho (perigoso)
-        if (
-            wave_height > 2.0
-            or wind_speed > 25
-            or gust > 35
-            or precipitation > 50
-            or visibility < 2
-        ):
-            return "RED"
-
-        # Amarelo (atenção)
-        if (
-            wave_height > 1.2
-            or wind_speed > 15
-            or gust > 25
-            or precipitation > 20
-            or visibility < 5
-        ):
-            return "YELLOW"
-
-        # Verde (ideal)
-        return "GREEN"
+        values = {
+            "waveHeight": wave_height or 0,
+            "windSpeed": wind_speed or 0,
+            "gust": gust or 0,
+            "precipitation": precipitation or 0,
+            "visibility": visibility or 10,
+        }
+
+        return traffic_light_status(values)
 
     def _get_mock_data(self, location: str) -> Dict:
         """Retorna dados fictícios quando a API não está disponível."""
@@ -242,15 +581,61 @@ class WeatherService:
             "source": "mock_data",
         }
 
-    def get_all_locations_weather(self) -> List[Dict]:
-        """Obtém dados meteorológicos para todos os locais."""
-        results = []
-        for location in self.locations.keys():
-            weather_data = self.get_weather_data(location)
-            if weather_data:
-                results.append(weather_data)
+    def _get_fanout_executor(self) -> ThreadPoolExecutor:
+        if self._fanout_executor is None:
+            with self._fanout_lock:
+                if self._fanout_executor is None:
+                    self._fanout_executor = ThreadPoolExecutor(
+                        max_workers=self._fanout_workers, thread_name_prefix="weather-fanout"
+                    )
+        return self._fanout_executor
+
+    def _get_fallback_weather(self, location: str) -> Tuple[Dict, str]:
+        """Dados de um local que não respondeu a tempo: cache (mesmo expirada) ou mock."""
+        entry = self._cache.get_entry(location)
+        if entry is not None:
+            cached_data, age = entry
+            return cached_data, "stale" if age > self.refresh_interval(location) else "cached"
+        return self._get_mock_data(location), "mock"
+
+    def get_weather_many(
+        self, locations: List[str], deadline: Optional[float] = None
+    ) -> Dict[str, Tuple[Dict, str]]:
+        """
+        Obtém dados meteorológicos de vários locais em paralelo: {local: (dados, origem)}.
+
+        Os locais que não respondam dentro de `deadline` segundos (por omissão
+        WEATHER_ALL_DEADLINE) recebem o último valor em cache ou dados mock; o
+        pedido continua em segundo plano e atualiza a cache.
+        """
+        deadline = self._fanout_deadline if deadline is None else deadline
+        executor = self._get_fanout_executor()
+        futures = {
+            location: executor.submit(self._get_weather_with_source, location)
+            for location in locations
+        }
+        done, _pending = wait(futures.values(), timeout=deadline)
+
+        results = {}
+        for location, future in futures.items():
+            if future in done and future.exception() is None:
+                results[location] = future.result()
+            else:
+                results[location] = self._get_fallback_weather(location)
         return results
 
+    def get_all_locations_weather(self, deadline: Optional[float] = None) -> List[Dict]:
+        """
+        Obtém dados meteorológicos para todos os locais em paralelo (ver
+        `get_weather_many`). Cada resultado indica a origem em `data_source`.
+        """
+        results = self.get_weather_many(list(self.locations.keys()), deadline)
+        return [
+            {**weather_data, "data_source": source}
+            for weather_data, source in results.values()
+            if weather_data
+        ]
+
     def force_status(self, location: str, status: str, note: str = None) -> Dict:
         """Força um status específico para um local (para demonstrações)."""
         if status not in ["GREEN", "YELLOW", "RED"]:
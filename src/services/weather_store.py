@@ -0,0 +1,166 @@
+"""
+Cache meteorológica persistente (SQLite) partilhada entre processos
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# Localização por omissão da cache partilhada
+DEFAULT_WEATHER_STORE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'database', 'weather_cache.db'
+)
+
+
+class SharedWeatherStore:
+    """
+    Guarda payloads (bytes) por chave, com o instante de gravação e a
+    validade, numa base SQLite em modo WAL lida e escrita por todos os
+    workers. Cada gravação substitui a anterior de forma atómica.
+
+    Inclui também "leases" por chave, para que apenas um processo de cada
+    vez atualize um local junto da API, e contadores inteiros partilhados
+    (ex.: pedidos do dia à Stormglass). Erros do SQLite são registados e
+    tratados como ausência de dados: a cache partilhada é opcional.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_WEATHER_STORE_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    @property
+    def owner(self) -> str:
+        # Calculado a cada uso: processos criados por fork têm identidades diferentes
+        return f"{os.getpid()}-{id(self)}"
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS weather_cache ("
+                    "key TEXT PRIMARY KEY, payload BLOB NOT NULL, stored_at REAL NOT NULL, ttl REAL NOT NULL)"
+                )
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS weather_leases ("
+                    "key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS weather_counters ("
+                    "key TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+                )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        """Devolve (payload, idade em segundos) ou None."""
+        try:
+            row = self._connection().execute(
+                "SELECT payload, stored_at FROM weather_cache WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Erro ao ler cache meteorológica partilhada: {e}")
+            return None
+        if row is None:
+            return None
+        return bytes(row[0]), max(time.time() - row[1], 0.0)
+
+    def set(self, key: str, payload: bytes, ttl: float) -> None:
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO weather_cache (key, payload, stored_at, ttl) VALUES (?, ?, ?, ?)",
+                    (key, sqlite3.Binary(payload), time.time(), ttl)
+                )
+        except sqlite3.Error as e:
+            print(f"Erro ao gravar cache meteorológica partilhada: {e}")
+
+    def delete(self, key: str) -> None:
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM weather_cache WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            print(f"Erro ao apagar cache meteorológica partilhada: {e}")
+
+    def increment(self, key: str, amount: int = 1, at_least: int = 0) -> Optional[int]:
+        """
+        Soma `amount` a um contador (elevando-o a `at_least`, se for maior) de
+        forma atómica entre processos e devolve o novo valor (None em erro).
+        """
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT INTO weather_counters (key, value) VALUES (?, MAX(?, ?)) "
+                    "ON CONFLICT(key) DO UPDATE SET value = MAX(weather_counters.value + ?, ?)",
+                    (key, amount, at_least, amount, at_least)
+                )
+                row = conn.execute("SELECT value FROM weather_counters WHERE key = ?", (key,)).fetchone()
+            return row[0]
+        except sqlite3.Error as e:
+            print(f"Erro ao atualizar contador meteorológico partilhado: {e}")
+            return None
+
+    def counters(self, prefix: str) -> Optional[Dict[str, int]]:
+        """Contadores cujas chaves começam por `prefix` (None em erro)."""
+        try:
+            rows = self._connection().execute(
+                "SELECT key, value FROM weather_counters WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Erro ao ler contadores meteorológicos partilhados: {e}")
+            return None
+        return {key: value for key, value in rows}
+
+    def delete_counters(self, prefix: str, keep: str) -> None:
+        """Apaga os contadores de `prefix` exceto os que começam por `keep`."""
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "DELETE FROM weather_counters WHERE substr(key, 1, ?) = ? AND substr(key, 1, ?) != ?",
+                    (len(prefix), prefix, len(keep), keep)
+                )
+        except sqlite3.Error as e:
+            print(f"Erro ao apagar contadores meteorológicos partilhados: {e}")
+
+    def acquire_lease(self, key: str, seconds: float) -> bool:
+        """Reserva a atualização de uma chave durante `seconds` (False se outro processo a tiver)."""
+        now = time.time()
+        try:
+            conn = self._connection()
+            with conn:
+                cursor = conn.execute(
+                    "INSERT INTO weather_leases (key, owner, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                    "WHERE weather_leases.expires_at < ? OR weather_leases.owner = excluded.owner",
+                    (key, self.owner, now + seconds, now)
+                )
+            return cursor.rowcount == 1
+        except sqlite3.Error as e:
+            print(f"Erro ao reservar atualização meteorológica: {e}")
+            # Sem coordenação possível, o processo atualiza por conta própria
+            return True
+
+    def release_lease(self, key: str) -> None:
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM weather_leases WHERE key = ? AND owner = ?", (key, self.owner))
+        except sqlite3.Error as e:
+            print(f"Erro ao libertar atualização meteorológica: {e}")
+
+    def stats(self) -> Dict:
+        try:
+            entries = self._connection().execute("SELECT COUNT(*) FROM weather_cache").fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        return {'path': self.db_path, 'entries': entries}
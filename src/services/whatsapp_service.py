@@ -2,10 +2,11 @@
 Serviço de integração com STEVO para envio de mensagens WhatsApp
 """
 import os
-import requests
 from typing import Dict, List, Optional
 import json
 from datetime import datetime
+from src.utils.http_transport import http_transport
+from src.utils.phone import normalize_phone
 
 class WhatsAppService:
     def __init__(self):
@@ -17,6 +18,7 @@ class WhatsAppService:
             'Content-Type': 'application/json',
             'apikey': self.api_key
         }
+        self.http = http_transport.client('stevo')
     
     def send_message(self, phone: str, message: str, message_type: str = 'text') -> Dict:
         """
@@ -40,7 +42,7 @@ class WhatsAppService:
         }
         
         try:
-            response = requests.post(url, headers=self.headers, json=payload, timeout=10)
+            response = self.http.post(url, headers=self.headers, json=payload)
             
             if response.status_code == 200:
                 result = response.json()
@@ -195,7 +197,7 @@ JUSTDIVE Academy"""
         url = f"{self.base_url}/instance/connectionState/{self.instance}"
         
         try:
-            response = requests.get(url, headers=self.headers, timeout=5)
+            response = self.http.get(url, headers=self.headers, timeout=5)
             
             if response.status_code == 200:
                 data = response.json()
@@ -225,21 +227,7 @@ JUSTDIVE Academy"""
         """
         Limpa e formata número de telefone para formato internacional
         """
-        if not phone:
-            return None
-        
-        # Remover caracteres não numéricos
-        clean = ''.join(filter(str.isdigit, phone))
-        
-        # Adicionar código do país se necessário (Portugal: +351)
-        if len(clean) == 9 and clean.startswith('9'):
-            clean = '351' + clean
-        elif len(clean) == 12 and clean.startswith('351'):
-            pass  # Já tem código do país
-        else:
-            return None  # Formato inválido
-        
-        return clean
+        return normalize_phone(phone)
     
     def create_qr_code(self) -> Dict:
         """
@@ -248,7 +236,7 @@ JUSTDIVE Academy"""
         url = f"{self.base_url}/instance/connect/{self.instance}"
         
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = self.http.get(url, headers=self.headers)
             
             if response.status_code == 200:
                 data = response.json()
@@ -0,0 +1,316 @@
+"""
+Buffer de escrita diferida (write-behind) para linhas só de inserção
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Union
+
+
+class WriteBehindBuffer:
+    """
+    Acumula linhas em memória e envia-as em lote através de `flush_fn`
+    a cada `batch_size` linhas ou `flush_interval_ms` milissegundos.
+
+    A fila é limitada a `max_queue` linhas. Quando está cheia, as linhas
+    são gravadas em disco (NDJSON), se `spill_path` estiver configurado, e
+    reenviadas na descarga seguinte; caso contrário são descartadas e
+    contabilizadas. Cada processo usa o seu ficheiro (`spill_path.<pid>`);
+    os ficheiros de processos que já terminaram são retomados pelo
+    primeiro buffer que os encontrar.
+
+    `flush_fn` recebe a lista de linhas e devolve True se foram gravadas,
+    False se nenhuma foi, ou a lista das linhas que não foram gravadas
+    (apenas essas voltam à fila). Depois de uma falha, a descarga seguinte
+    espera `flush_interval_ms`, com o dobro a cada nova falha até
+    `max_backoff_ms`.
+    """
+
+    def __init__(self, name: str, flush_fn: Callable[[List[Dict]], Union[bool, List[Dict]]],
+                 batch_size: int = 100, flush_interval_ms: int = 2000,
+                 max_queue: int = 10000, spill_path: Optional[str] = None,
+                 max_backoff_ms: int = 60000):
+        self.name = name
+        self.flush_fn = flush_fn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_queue = max_queue
+        self.spill_base = spill_path
+        self.max_backoff = max(max_backoff_ms / 1000.0, self.flush_interval)
+
+        self._queue: deque = deque()
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        # Protege os ficheiros em disco: nenhuma escrita decorre durante a troca
+        self._spill_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self._backoff = 0.0
+
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.spilled = 0
+        self.dropped = 0
+
+        if self._has_spill():
+            self._ensure_started()
+
+    @property
+    def spill_path(self) -> Optional[str]:
+        # Calculado a cada uso: processos criados por fork têm ficheiros diferentes
+        if not self.spill_base:
+            return None
+        return f"{self.spill_base}.{os.getpid()}"
+
+    @property
+    def _draining_path(self) -> str:
+        return f"{self.spill_path}.flushing"
+
+    def _orphans(self) -> List[str]:
+        """Ficheiros em disco de processos que já terminaram (ou sem pid)."""
+        orphans = []
+        for path in glob.glob(f"{glob.escape(self.spill_base)}*"):
+            suffix = path[len(self.spill_base):]
+            if suffix.endswith('.tmp'):
+                # Cópia incompleta: o ficheiro original continua em disco
+                continue
+            if suffix in ('', '.flushing'):
+                orphans.append(path)
+                continue
+            pid = suffix[1:].split('.')[0]
+            if suffix.startswith('.') and pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid)):
+                orphans.append(path)
+        return sorted(orphans)
+
+    def _has_spill(self) -> bool:
+        return bool(self.spill_base) and (
+            os.path.exists(self.spill_path) or os.path.exists(self._draining_path)
+            or bool(self._orphans())
+        )
+
+    def _adopt_orphans(self) -> None:
+        # Chamado com _spill_lock: junta ao ficheiro deste processo os que ficaram órfãos
+        for path in self._orphans():
+            claimed = f"{self.spill_path}.adopt"
+            try:
+                # Só um processo consegue mudar o nome de cada órfão
+                os.rename(path, claimed)
+            except OSError:
+                continue
+            try:
+                with open(claimed, encoding='utf-8') as orphan, \
+                        open(self.spill_path, 'a', encoding='utf-8') as spill:
+                    for line in orphan:
+                        if line.strip():
+                            spill.write(line if line.endswith('\n') else line + '\n')
+                os.remove(claimed)
+            except OSError as e:
+                print(f"Erro ao retomar fila {self.name} do disco: {e}")
+
+    def append(self, row: Dict) -> bool:
+        """Coloca uma linha na fila. Devolve False se tiver sido descartada."""
+        with self._condition:
+            if len(self._queue) >= self.max_queue:
+                return self._overflow([row])
+
+            self._queue.append(row)
+            self.enqueued += 1
+            if len(self._queue) >= self.batch_size:
+                self._condition.notify()
+
+        self._ensure_started()
+        return True
+
+    def _overflow(self, rows: List[Dict]) -> bool:
+        if self.spill_base:
+            try:
+                os.makedirs(os.path.dirname(self.spill_base) or '.', exist_ok=True)
+                with self._spill_lock:
+                    with open(self.spill_path, 'a', encoding='utf-8') as spill:
+                        for row in rows:
+                            spill.write(json.dumps(row, default=str) + '\n')
+                self.spilled += len(rows)
+                return True
+            except OSError as e:
+                print(f"Erro ao gravar fila {self.name} em disco: {e}")
+
+        self.dropped += len(rows)
+        return False
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._condition:
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(
+                    target=self._run, name=f'write-behind-{self.name}', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if self._stopped:
+                    return
+                if self._backoff:
+                    # Depois de uma falha, a fila cheia não antecipa a descarga
+                    deadline = time.monotonic() + self._backoff
+                    while not self._stopped and time.monotonic() < deadline:
+                        self._condition.wait(deadline - time.monotonic())
+                elif len(self._queue) < self.batch_size:
+                    self._condition.wait(self.flush_interval)
+                if self._stopped:
+                    return
+            self.flush()
+
+    def _take_batch(self) -> List[Dict]:
+        with self._condition:
+            count = min(self.batch_size, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _send(self, rows: List[Dict]) -> List[Dict]:
+        """Envia um lote e devolve as linhas que não foram gravadas."""
+        try:
+            result = self.flush_fn(rows)
+        except Exception as e:
+            print(f"Erro ao descarregar fila {self.name}: {e}")
+            result = False
+
+        if result is True:
+            failed = []
+        elif result is False or result is None:
+            failed = rows
+        else:
+            failed = list(result)
+
+        self.written += len(rows) - len(failed)
+        if failed:
+            self.failures += 1
+        else:
+            self.batches += 1
+        return failed
+
+    def _requeue(self, rows: List[Dict]) -> None:
+        """Devolve à frente da fila um lote que falhou, respeitando o limite."""
+        with self._condition:
+            room = self.max_queue - len(self._queue)
+            keep, overflow = rows[:room], rows[room:]
+            self._queue.extendleft(reversed(keep))
+        if overflow:
+            self._overflow(overflow)
+
+    def _write_draining(self, rows: List[Dict]) -> None:
+        # Substituição atómica: o ficheiro fica sempre completo em disco
+        temp_path = f"{self._draining_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as spill:
+            for row in rows:
+                spill.write(json.dumps(row, default=str) + '\n')
+        os.replace(temp_path, self._draining_path)
+
+    def _drain_spill(self) -> bool:
+        """
+        Reenvia as linhas gravadas em disco. O ficheiro `.flushing` só é
+        apagado depois de todos os lotes serem gravados; numa falha fica com
+        as linhas em falta. Devolve False se alguma linha ficou por enviar.
+        """
+        if not self.spill_base:
+            return True
+
+        while True:
+            with self._spill_lock:
+                self._adopt_orphans()
+                try:
+                    # Um `.flushing` deixado por uma descarga anterior vem primeiro
+                    if not os.path.exists(self._draining_path):
+                        if not os.path.exists(self.spill_path):
+                            return True
+                        os.replace(self.spill_path, self._draining_path)
+                    with open(self._draining_path, encoding='utf-8') as spill:
+                        rows = [json.loads(line) for line in spill if line.strip()]
+                except (OSError, ValueError) as e:
+                    print(f"Erro ao ler fila {self.name} do disco: {e}")
+                    return False
+
+            for start in range(0, len(rows), self.batch_size):
+                failed = self._send(rows[start:start + self.batch_size])
+                if failed:
+                    try:
+                        with self._spill_lock:
+                            self._write_draining(failed + rows[start + self.batch_size:])
+                    except OSError as e:
+                        print(f"Erro ao gravar fila {self.name} em disco: {e}")
+                    return False
+
+            try:
+                with self._spill_lock:
+                    os.remove(self._draining_path)
+            except OSError as e:
+                print(f"Erro ao apagar fila {self.name} do disco: {e}")
+                return False
+
+    def flush(self) -> int:
+        """Envia todas as linhas pendentes. Devolve o número de linhas gravadas."""
+        with self._flush_lock:
+            written_before = self.written
+            ok = True
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    break
+                failed = self._send(batch)
+                if failed:
+                    self._requeue(failed)
+                    ok = False
+                    break
+            if ok and not self._drain_spill():
+                ok = False
+
+            if ok:
+                self._backoff = 0.0
+            else:
+                self._backoff = min(self._backoff * 2 or self.flush_interval, self.max_backoff)
+            return self.written - written_before
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Para a thread de descarga e envia o que estiver pendente."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> Dict:
+        return {
+            'queued': len(self._queue),
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'batches': self.batches,
+            'failures': self.failures,
+            'spilled': self.spilled,
+            'dropped': self.dropped,
+            'backoff': self._backoff,
+        }
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Sem permissão para sinalizar: o processo existe
+        return True
+    return True
+
+
+def register_shutdown_flush(buffer: WriteBehindBuffer) -> WriteBehindBuffer:
+    """Garante que a fila é descarregada quando o processo termina."""
+    atexit.register(buffer.stop)
+    return buffer
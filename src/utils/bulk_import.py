@@ -0,0 +1,53 @@
+"""
+Leitura em streaming de ficheiros de importação (CSV / NDJSON)
+"""
+import csv
+import io
+import json
+from typing import IO, Dict, Iterator, Optional, Tuple
+
+# (número da linha, registo ou None, erro ou None)
+ParsedRow = Tuple[int, Optional[Dict], Optional[str]]
+
+
+def _clean_csv_record(record: Dict) -> Dict:
+    """Remove espaços e colunas vazias para que os valores por omissão se apliquem."""
+    cleaned = {}
+    for key, value in record.items():
+        if key is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+        if value not in (None, ''):
+            cleaned[key.strip()] = value
+    return cleaned
+
+
+def iter_csv_records(stream: IO[bytes]) -> Iterator[ParsedRow]:
+    """Lê um CSV com cabeçalho linha a linha."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    for record in reader:
+        row_number = reader.line_num
+        if None in record:
+            yield row_number, None, 'Número de colunas superior ao cabeçalho'
+            continue
+        yield row_number, _clean_csv_record(record), None
+
+
+def iter_ndjson_records(stream: IO[bytes]) -> Iterator[ParsedRow]:
+    """Lê NDJSON (um objeto JSON por linha), ignorando linhas vazias."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig')
+    for row_number, line in enumerate(text, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield row_number, None, f'JSON inválido: {e}'
+            continue
+        if not isinstance(record, dict):
+            yield row_number, None, 'Cada linha deve conter um objeto JSON'
+            continue
+        yield row_number, record, None
@@ -0,0 +1,116 @@
+"""
+Cache em memória com limite de tamanho (LRU) e expiração (TTL)
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    Cache thread-safe com remoção do elemento menos usado quando atinge
+    `maxsize` e expiração de cada entrada após `ttl` segundos.
+
+    Com `max_stale` as entradas expiradas são mantidas durante mais esse
+    número de segundos e continuam disponíveis em `get_entry`, para quem
+    queira servir um valor antigo enquanto o atualiza (stale-while-revalidate).
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300, max_stale: float = 0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._data: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            stored_at, value = entry
+            age = time.monotonic() - stored_at
+            if age > self.ttl:
+                self._expire(key, age)
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def _expire(self, key: Hashable, age: float) -> None:
+        # Chamado com o lock adquirido: só remove depois da janela de max_stale
+        if age > self.ttl + self.max_stale:
+            del self._data[key]
+            self.expirations += 1
+
+    def get_entry(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """
+        Devolve (valor, idade em segundos), incluindo entradas expiradas há
+        menos de `max_stale` segundos, ou None se não existir.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stored_at, value = entry
+            age = time.monotonic() - stored_at
+            if age > self.ttl + self.max_stale:
+                self._expire(key, age)
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            if age > self.ttl:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+            return value, age
+
+    def set(self, key: Hashable, value: Any, age: float = 0) -> None:
+        """Guarda um valor; `age` permite importar um valor já com alguns segundos."""
+        with self._lock:
+            self._data[key] = (time.monotonic() - age, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[1] if entry else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict:
+        """Contadores de utilização da cache."""
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'max_stale': self.max_stale,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
@@ -3,53 +3,244 @@ Utilitário de criptografia para proteger dados sensíveis
 """
 import os
 import base64
-from cryptography.fernet import Fernet
+import math
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, MultiFernet
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+import hashlib
+import hmac
 import json
+from typing import Dict, List, Optional
+from src.utils.phone import normalize_phone
 
-class CryptoManager:
-    def __init__(self):
-        self.encryption_key = os.getenv('ENCRYPTION_KEY', 'justdive-encryption-key-32-chars-long')
+# Formato v2: prefixo + identificador da chave + base64url(nonce | ciphertext | tag)
+# com AES-256-GCM. Tokens "v2:<b64>" sem identificador e o v1 (Fernet em base64
+# duplo) continuam a ser lidos, experimentando todas as chaves configuradas.
+V2_PREFIX = 'v2:'
+V2_NONCE_SIZE = 12
+
+# Identificador da chave atual quando ENCRYPTION_KEY_ID não está definido
+DEFAULT_KEY_ID = 'k1'
+
+# Sufixo da coluna com o índice cego (HMAC) de um campo criptografado
+BLIND_INDEX_SUFFIX = '_bidx'
+
+# Abaixo deste número de registos o processamento em lote é feito em série
+BATCH_MIN_RECORDS = 64
+# Tamanho mínimo de cada bloco enviado para um worker
+BATCH_MIN_CHUNK = 16
+
+def _b64decode(payload: str) -> bytes:
+    return base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4))
+
+def parse_key_list(value: str) -> Dict[str, str]:
+    """Lê chaves no formato "kid:segredo,kid2:segredo2" """
+    keys = {}
+    for item in (value or '').split(','):
+        key_id, _, secret = item.strip().partition(':')
+        if key_id and secret:
+            keys[key_id] = secret
+        elif item.strip():
+            print(f"Chave de criptografia ignorada (formato inválido): {key_id}")
+    return keys
+
+class EncryptionKey:
+    """Material derivado (de forma preguiçosa) de um segredo de configuração"""
+    
+    def __init__(self, key_id: str, secret: str):
+        self.key_id = key_id
+        self.secret = secret
+        self._master_key = None
         self._fernet = None
+        self._aead = None
+        self._blind_index_key = None
     
-    def _get_fernet(self):
-        """Inicializa o objeto Fernet para criptografia"""
-        if self._fernet is None:
-            # Gerar chave a partir da string de configuração
+    def _derive(self, info: bytes) -> bytes:
+        return HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=None,
+            info=info,
+        ).derive(self.master_key())
+    
+    def master_key(self) -> bytes:
+        """Deriva a chave base a partir da string de configuração"""
+        if self._master_key is None:
             kdf = PBKDF2HMAC(
                 algorithm=hashes.SHA256(),
                 length=32,
                 salt=b'justdive_salt',
                 iterations=100000,
             )
-            key = base64.urlsafe_b64encode(kdf.derive(self.encryption_key.encode()))
-            self._fernet = Fernet(key)
+            self._master_key = kdf.derive(self.secret.encode())
+        return self._master_key
+    
+    def fernet(self) -> Fernet:
+        """Objeto Fernet do formato v1"""
+        if self._fernet is None:
+            self._fernet = Fernet(base64.urlsafe_b64encode(self.master_key()))
         return self._fernet
     
+    def aead(self) -> AESGCM:
+        """Cifra AES-GCM do formato v2 (chave própria via HKDF)"""
+        if self._aead is None:
+            self._aead = AESGCM(self._derive(b'justdive-v2-aes-gcm'))
+        return self._aead
+    
+    def blind_index_key(self) -> bytes:
+        """Chave HMAC dos índices cegos, independente da chave de cifra"""
+        if self._blind_index_key is None:
+            self._blind_index_key = self._derive(b'justdive-blind-index')
+        return self._blind_index_key
+
+class CryptoManager:
+    def __init__(self):
+        self.encryption_key = os.getenv('ENCRYPTION_KEY', 'justdive-encryption-key-32-chars-long')
+        self.key_id = os.getenv('ENCRYPTION_KEY_ID', DEFAULT_KEY_ID)
+        # Formato usado nas novas escritas: 'v2' (omissão) ou 'v1'
+        self.write_format = os.getenv('ENCRYPTION_FORMAT', 'v2').lower()
+        # Colunas <campo>_bidx só são escritas depois de aplicada a migração
+        # (src/database/migrations/001_students_phone_bidx.sql)
+        self.blind_index_enabled = os.getenv('BLIND_INDEX_ENABLED', 'false').lower() == 'true'
+        
+        # Chave atual primeiro; as antigas (ENCRYPTION_OLD_KEYS) só são usadas para ler
+        self.keys: Dict[str, EncryptionKey] = {self.key_id: EncryptionKey(self.key_id, self.encryption_key)}
+        for key_id, secret in parse_key_list(os.getenv('ENCRYPTION_OLD_KEYS', '')).items():
+            self.keys.setdefault(key_id, EncryptionKey(key_id, secret))
+        self._multi_fernet = None
+        
+        # Processamento em lote: 'thread' (omissão) ou 'process'
+        self.batch_executor = os.getenv('CRYPTO_BATCH_EXECUTOR', 'thread').lower()
+        self.batch_workers = int(os.getenv('CRYPTO_WORKERS', os.cpu_count() or 2))
+        self._executor = None
+        self._executor_lock = threading.Lock()
+    
+    @property
+    def current_key(self) -> EncryptionKey:
+        return self.keys[self.key_id]
+    
+    def _get_fernet(self):
+        """Inicializa o objeto Fernet para criptografia"""
+        return self.current_key.fernet()
+    
+    def _get_multi_fernet(self) -> MultiFernet:
+        """Fernet que aceita tokens v1 de qualquer chave configurada"""
+        if self._multi_fernet is None:
+            self._multi_fernet = MultiFernet([key.fernet() for key in self.keys.values()])
+        return self._multi_fernet
+    
+    def _get_aead(self) -> AESGCM:
+        """Inicializa a cifra AES-GCM do formato v2"""
+        return self.current_key.aead()
+    
+    def _warm_keys(self) -> None:
+        """Deriva todas as chaves antes de partilhar o gestor entre threads"""
+        self._get_multi_fernet()
+        for key in self.keys.values():
+            key.aead()
+            key.blind_index_key()
+    
+    def _blind_index_with(self, key: EncryptionKey, field: str, value) -> Optional[str]:
+        normalize = BLIND_INDEX_FIELDS.get(field)
+        if normalize is None or not value:
+            return None
+        normalized = normalize(value)
+        if not normalized:
+            return None
+        message = f"{field}:{normalized}".encode()
+        return hmac.new(key.blind_index_key(), message, hashlib.sha256).hexdigest()
+    
+    def blind_index(self, field: str, value) -> Optional[str]:
+        """
+        Índice cego determinístico de um valor sensível
+        
+        O valor é normalizado segundo as regras do campo (ver BLIND_INDEX_FIELDS)
+        e autenticado com HMAC-SHA256, permitindo pesquisas por igualdade
+        sem descriptografar. Devolve None se o valor não puder ser normalizado.
+        """
+        return self._blind_index_with(self.current_key, field, value)
+    
+    def blind_indexes(self, field: str, value) -> List[str]:
+        """
+        Índices cegos do valor com todas as chaves configuradas (atual primeiro),
+        para encontrar também linhas ainda não recriptografadas
+        """
+        indexes = [self._blind_index_with(key, field, value) for key in self.keys.values()]
+        return list(dict.fromkeys(index for index in indexes if index))
+    
+    def _encrypt_v2(self, plaintext: str) -> str:
+        nonce = os.urandom(V2_NONCE_SIZE)
+        ciphertext = self._get_aead().encrypt(nonce, plaintext.encode(), None)
+        payload = base64.urlsafe_b64encode(nonce + ciphertext).decode().rstrip('=')
+        return f"{V2_PREFIX}{self.key_id}:{payload}"
+    
     def encrypt_string(self, plaintext: str) -> str:
         """Criptografa uma string"""
         if not plaintext:
             return plaintext
         
-        fernet = self._get_fernet()
-        encrypted_bytes = fernet.encrypt(plaintext.encode())
-        return base64.urlsafe_b64encode(encrypted_bytes).decode()
+        if self.write_format == 'v1':
+            fernet = self._get_fernet()
+            encrypted_bytes = fernet.encrypt(plaintext.encode())
+            return base64.urlsafe_b64encode(encrypted_bytes).decode()
+        
+        return self._encrypt_v2(plaintext)
+    
+    @staticmethod
+    def key_id_of(encrypted_text: str) -> Optional[str]:
+        """Identificador da chave de um token v2 (None para tokens sem identificador)"""
+        if not encrypted_text or not encrypted_text.startswith(V2_PREFIX):
+            return None
+        key_id, separator, _ = encrypted_text[len(V2_PREFIX):].partition(':')
+        return key_id if separator else None
+    
+    def _decrypt(self, encrypted_text: str) -> str:
+        """Descriptografa uma string, levantando exceção em caso de falha"""
+        if encrypted_text.startswith(V2_PREFIX):
+            payload = encrypted_text[len(V2_PREFIX):]
+            key_id = self.key_id_of(encrypted_text)
+            if key_id is not None:
+                if key_id not in self.keys:
+                    raise ValueError(f"Chave de criptografia desconhecida: {key_id}")
+                candidates = [self.keys[key_id]]
+                payload = payload[len(key_id) + 1:]
+            else:
+                candidates = list(self.keys.values())
+            
+            raw = _b64decode(payload)
+            nonce, ciphertext = raw[:V2_NONCE_SIZE], raw[V2_NONCE_SIZE:]
+            for key in candidates:
+                try:
+                    return key.aead().decrypt(nonce, ciphertext, None).decode()
+                except InvalidTag:
+                    continue
+            raise InvalidTag()
+        
+        encrypted_bytes = base64.urlsafe_b64decode(encrypted_text.encode())
+        return self._get_multi_fernet().decrypt(encrypted_bytes).decode()
     
     def decrypt_string(self, encrypted_text: str) -> str:
-        """Descriptografa uma string"""
+        """Descriptografa uma string (formatos v2 e v1, com qualquer chave configurada)"""
         if not encrypted_text:
             return encrypted_text
         
         try:
-            fernet = self._get_fernet()
-            encrypted_bytes = base64.urlsafe_b64decode(encrypted_text.encode())
-            decrypted_bytes = fernet.decrypt(encrypted_bytes)
-            return decrypted_bytes.decode()
+            return self._decrypt(encrypted_text)
         except Exception as e:
             print(f"Erro ao descriptografar: {e}")
             return encrypted_text
     
+    def needs_rotation(self, encrypted_text) -> bool:
+        """Indica se o valor não está no formato v2 com a chave atual"""
+        if not encrypted_text or not isinstance(encrypted_text, str):
+            return False
+        return self.key_id_of(encrypted_text) != self.key_id
+    
     def encrypt_dict(self, data: dict, sensitive_fields: list = None) -> dict:
         """Criptografa campos sensíveis de um dicionário"""
         if not data or not sensitive_fields:
@@ -57,6 +248,9 @@ class CryptoManager:
         
         encrypted_data = data.copy()
         for field in sensitive_fields:
+            if self.blind_index_enabled and field in encrypted_data and field in BLIND_INDEX_FIELDS:
+                # Mantido em sincronia com o campo, mesmo quando este é limpo
+                encrypted_data[field + BLIND_INDEX_SUFFIX] = self.blind_index(field, encrypted_data[field])
             if field in encrypted_data and encrypted_data[field]:
                 encrypted_data[field] = self.encrypt_string(str(encrypted_data[field]))
         
@@ -69,11 +263,128 @@ class CryptoManager:
         
         decrypted_data = data.copy()
         for field in sensitive_fields:
+            # O índice cego só serve para pesquisas; não é exposto
+            decrypted_data.pop(field + BLIND_INDEX_SUFFIX, None)
             if field in decrypted_data and decrypted_data[field]:
                 decrypted_data[field] = self.decrypt_string(decrypted_data[field])
         
         return decrypted_data
     
+    def rotate_dict(self, data: dict, sensitive_fields: list = None) -> dict:
+        """
+        Recriptografa com a chave atual os campos que ainda usam outra chave
+        
+        Devolve apenas as alterações (campos e respetivos índices cegos). Um
+        campo que não possa ser descriptografado fica de fora, inalterado.
+        """
+        changes = {}
+        if not data or not sensitive_fields:
+            return changes
+        
+        for field in sensitive_fields:
+            value = data.get(field)
+            if not self.needs_rotation(value):
+                continue
+            try:
+                plaintext = self._decrypt(value)
+            except Exception as e:
+                print(f"Erro ao recriptografar campo {field}: {e}")
+                continue
+            changes[field] = self._encrypt_v2(plaintext)
+            if self.blind_index_enabled and field in BLIND_INDEX_FIELDS:
+                changes[field + BLIND_INDEX_SUFFIX] = self.blind_index(field, plaintext)
+        
+        return changes
+    
+    def index_dict(self, data: dict, sensitive_fields: list = None) -> dict:
+        """
+        Calcula os índices cegos de uma linha já criptografada
+        
+        Devolve apenas as colunas <campo>_bidx em falta ou desatualizadas. Um
+        campo que não possa ser descriptografado fica de fora.
+        """
+        changes = {}
+        if not data or not sensitive_fields:
+            return changes
+        
+        for field in sensitive_fields:
+            if field not in BLIND_INDEX_FIELDS or field not in data:
+                continue
+            value = data.get(field)
+            try:
+                plaintext = self._decrypt(value) if value else value
+            except Exception as e:
+                print(f"Erro ao indexar campo {field}: {e}")
+                continue
+            index = self.blind_index(field, plaintext)
+            if data.get(field + BLIND_INDEX_SUFFIX) != index:
+                changes[field + BLIND_INDEX_SUFFIX] = index
+        
+        return changes
+    
+    def _get_executor(self):
+        """Inicializa o pool de workers usado no processamento em lote"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    if self.batch_executor == 'process':
+                        self._executor = ProcessPoolExecutor(max_workers=self.batch_workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.batch_workers,
+                            thread_name_prefix='crypto'
+                        )
+        return self._executor
+    
+    def _chunk_size(self, total: int) -> int:
+        """Tamanho de bloco adaptativo: cerca de 4 blocos por worker"""
+        return max(BATCH_MIN_CHUNK, math.ceil(total / (self.batch_workers * 4)))
+    
+    def _map_chunks(self, method: str, records: list, sensitive_fields: list) -> list:
+        transform = getattr(self, method)
+        if len(records) < BATCH_MIN_RECORDS or self.batch_workers < 2:
+            return [transform(record, sensitive_fields) for record in records]
+        
+        size = self._chunk_size(len(records))
+        chunks = [records[i:i + size] for i in range(0, len(records), size)]
+        
+        if self.batch_executor == 'process':
+            # Cada processo usa a sua instância global (mesma configuração)
+            function = _CHUNK_FUNCTIONS[method]
+        else:
+            self._warm_keys()
+            function = lambda chunk, fields: [transform(record, fields) for record in chunk]
+        
+        results = []
+        executor = self._get_executor()
+        for chunk in executor.map(function, chunks, [sensitive_fields] * len(chunks)):
+            results.extend(chunk)
+        return results
+    
+    def encrypt_many(self, records: list, sensitive_fields: list = None) -> list:
+        """Criptografa campos sensíveis de vários dicionários em paralelo"""
+        if not records or not sensitive_fields:
+            return list(records or [])
+        return self._map_chunks('encrypt_dict', list(records), sensitive_fields)
+    
+    def decrypt_many(self, records: list, sensitive_fields: list = None) -> list:
+        """Descriptografa campos sensíveis de vários dicionários em paralelo"""
+        if not records or not sensitive_fields:
+            return list(records or [])
+        return self._map_chunks('decrypt_dict', list(records), sensitive_fields)
+    
+    def rotate_many(self, records: list, sensitive_fields: list = None) -> list:
+        """Calcula em paralelo as alterações de `rotate_dict` de vários dicionários"""
+        if not records or not sensitive_fields:
+            return [{} for _ in records or []]
+        return self._map_chunks('rotate_dict', list(records), sensitive_fields)
+    
+    def index_many(self, records: list, sensitive_fields: list = None) -> list:
+        """Calcula em paralelo as alterações de `index_dict` de vários dicionários"""
+        if not records or not sensitive_fields:
+            return [{} for _ in records or []]
+        return self._map_chunks('index_dict', list(records), sensitive_fields)
+    
     def encrypt_api_key(self, api_key: str) -> str:
         """Criptografa uma chave de API"""
         return self.encrypt_string(api_key)
@@ -95,6 +406,31 @@ SENSITIVE_FIELDS = [
     'password_hash'
 ]
 
+# Campos com índice cego e a normalização aplicada antes do HMAC
+BLIND_INDEX_FIELDS = {
+    'phone': normalize_phone,
+}
+
+def _encrypt_chunk(records: list, sensitive_fields: list) -> list:
+    # Funções de módulo para poderem ser usadas por um ProcessPoolExecutor
+    return [crypto_manager.encrypt_dict(record, sensitive_fields) for record in records]
+
+def _decrypt_chunk(records: list, sensitive_fields: list) -> list:
+    return [crypto_manager.decrypt_dict(record, sensitive_fields) for record in records]
+
+def _rotate_chunk(records: list, sensitive_fields: list) -> list:
+    return [crypto_manager.rotate_dict(record, sensitive_fields) for record in records]
+
+def _index_chunk(records: list, sensitive_fields: list) -> list:
+    return [crypto_manager.index_dict(record, sensitive_fields) for record in records]
+
+_CHUNK_FUNCTIONS = {
+    'encrypt_dict': _encrypt_chunk,
+    'decrypt_dict': _decrypt_chunk,
+    'rotate_dict': _rotate_chunk,
+    'index_dict': _index_chunk,
+}
+
 def encrypt_sensitive_data(data: dict) -> dict:
     """Função auxiliar para criptografar dados sensíveis"""
     return crypto_manager.encrypt_dict(data, SENSITIVE_FIELDS)
@@ -103,3 +439,10 @@ def decrypt_sensitive_data(data: dict) -> dict:
     """Função auxiliar para descriptografar dados sensíveis"""
     return crypto_manager.decrypt_dict(data, SENSITIVE_FIELDS)
 
+def encrypt_sensitive_data_many(records: list) -> list:
+    """Função auxiliar para criptografar dados sensíveis de vários registos"""
+    return crypto_manager.encrypt_many(records, SENSITIVE_FIELDS)
+
+def decrypt_sensitive_data_many(records: list) -> list:
+    """Função auxiliar para descriptografar dados sensíveis de vários registos"""
+    return crypto_manager.decrypt_many(records, SENSITIVE_FIELDS)
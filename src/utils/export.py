@@ -0,0 +1,55 @@
+"""
+Utilitários para exportação de dados em streaming (CSV / NDJSON / gzip)
+"""
+import csv
+import io
+import json
+import zlib
+from typing import Dict, Iterable, Iterator, List
+
+# Tamanho aproximado de cada bloco enviado ao cliente
+CHUNK_SIZE = 16 * 1024
+
+
+def iter_csv(rows: Iterable[Dict], fieldnames: List[str]) -> Iterator[str]:
+    """Serializa linhas em CSV, devolvendo blocos de texto à medida que chegam."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction='ignore')
+    writer.writeheader()
+
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_ndjson(rows: Iterable[Dict]) -> Iterator[str]:
+    """Serializa linhas em NDJSON (um objeto JSON por linha)."""
+    parts = []
+    size = 0
+    for row in rows:
+        line = json.dumps(row, ensure_ascii=False, default=str) + '\n'
+        parts.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(parts)
+            parts = []
+            size = 0
+
+    if parts:
+        yield ''.join(parts)
+
+
+def gzip_stream(chunks: Iterable[str], level: int = 6) -> Iterator[bytes]:
+    """Comprime um fluxo de texto em gzip sem o manter todo em memória."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,159 @@
+"""
+Transporte HTTP partilhado com pools de ligações keep-alive por host
+"""
+import os
+import threading
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Timeouts por serviço (segundos), configuráveis via HTTP_TIMEOUT_<SERVIÇO>
+DEFAULT_TIMEOUTS = {
+    'supabase': 10,
+    'stormglass': 10,
+    'stevo': 10,
+    'expo': 10,
+}
+
+# Códigos HTTP considerados transitórios e que justificam nova tentativa
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Serviços com quota por pedido: um pedido que chegou ao servidor não é
+# repetido automaticamente (só falhas de ligação o são)
+NO_RESPONSE_RETRY_SERVICES = ('stormglass',)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class ServiceClient:
+    """Cliente de um serviço externo que aplica o timeout configurado."""
+
+    def __init__(self, transport: 'HTTPTransport', name: str, timeout: float,
+                 retry_responses: bool = True):
+        self.transport = transport
+        self.name = name
+        self.timeout = timeout
+        self.retry_responses = retry_responses
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', self.timeout)
+        session = self.transport.session_for(url, retry_responses=self.retry_responses)
+        return session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> requests.Response:
+        return self.request('PATCH', url, **kwargs)
+
+
+class HTTPTransport:
+    """
+    Mantém uma sessão `requests` por host de destino, com pool de ligações
+    reutilizáveis, limite de ligações por host e novas tentativas com
+    backoff exponencial e jitter.
+    """
+
+    def __init__(self):
+        self.pool_connections = _env_int('HTTP_POOL_CONNECTIONS', 10)
+        self.pool_maxsize = _env_int('HTTP_POOL_MAXSIZE', 10)
+        # Bloquear quando o pool do host está esgotado em vez de abrir ligações extra
+        self.pool_block = os.getenv('HTTP_POOL_BLOCK', 'true').lower() == 'true'
+        self.max_retries = _env_int('HTTP_MAX_RETRIES', 3)
+        self.backoff_factor = _env_float('HTTP_BACKOFF_FACTOR', 0.3)
+        self.backoff_jitter = _env_float('HTTP_BACKOFF_JITTER', 0.2)
+
+        self._sessions: Dict[str, requests.Session] = {}
+        self._clients: Dict[str, ServiceClient] = {}
+        self._lock = threading.Lock()
+
+    def _build_retry(self, retry_responses: bool = True) -> Retry:
+        # Por omissão o urllib3 só repete métodos idempotentes (GET, PUT, ...),
+        # pelo que POST/PATCH não são duplicados em caso de erro de leitura.
+        # Sem `retry_responses` erros de leitura e códigos HTTP não são repetidos.
+        response_retries = self.max_retries if retry_responses else 0
+        return Retry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            read=response_retries,
+            status=response_retries,
+            backoff_factor=self.backoff_factor,
+            backoff_jitter=self.backoff_jitter,
+            status_forcelist=RETRY_STATUS_CODES,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+
+    def _build_session(self, retry_responses: bool = True) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+            max_retries=self._build_retry(retry_responses),
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def session_for(self, url: str, retry_responses: bool = True) -> requests.Session:
+        """Devolve a sessão associada ao host do URL, criando-a se necessário."""
+        parts = urlsplit(url)
+        host_key = f"{parts.scheme}://{parts.netloc}"
+        if not retry_responses:
+            host_key += '#no-response-retry'
+
+        session = self._sessions.get(host_key)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host_key)
+                if session is None:
+                    session = self._build_session(retry_responses)
+                    self._sessions[host_key] = session
+        return session
+
+    def client(self, service: str, timeout: Optional[float] = None) -> ServiceClient:
+        """Obtém o cliente de um serviço com o respetivo timeout."""
+        with self._lock:
+            client = self._clients.get(service)
+            if client is None:
+                if timeout is None:
+                    timeout = _env_float(
+                        f"HTTP_TIMEOUT_{service.upper()}",
+                        DEFAULT_TIMEOUTS.get(service, 10),
+                    )
+                client = ServiceClient(
+                    self, service, timeout,
+                    retry_responses=service not in NO_RESPONSE_RETRY_SERVICES,
+                )
+                self._clients[service] = client
+        return client
+
+    def close(self) -> None:
+        """Fecha todas as sessões e respetivas ligações."""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+# Instância global do transporte HTTP
+http_transport = HTTPTransport()
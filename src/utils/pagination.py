@@ -0,0 +1,69 @@
+"""
+Utilitários de paginação por cursor (keyset) para consultas PostgREST
+"""
+import base64
+import json
+from typing import Dict, List, Optional, Tuple
+
+from src.utils.postgrest import quote_value
+
+# Colunas aceites como chave de ordenação da paginação
+KEYSET_COLUMNS = ('id', 'updated_at')
+
+
+def encode_cursor(order_by: str, last_row: Dict) -> str:
+    """Gera um cursor opaco a partir da última linha da página."""
+    payload = {'o': order_by, 'id': last_row.get('id')}
+    if order_by != 'id':
+        payload['v'] = last_row.get(order_by)
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, order_by: str) -> Dict:
+    """Descodifica um cursor, validando que corresponde à ordenação pedida."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError('Cursor inválido')
+
+    if not isinstance(payload, dict) or payload.get('o') != order_by or payload.get('id') is None:
+        raise ValueError('Cursor inválido para esta ordenação')
+    if order_by != 'id' and payload.get('v') is None:
+        raise ValueError('Cursor inválido para esta ordenação')
+    return payload
+
+
+def keyset_params(order_by: str, cursor: Optional[str]) -> List[Tuple[str, str]]:
+    """
+    Constrói os parâmetros PostgREST de ordenação e de posição para a
+    página seguinte ao cursor. O `id` desempata sempre valores iguais.
+    """
+    if order_by not in KEYSET_COLUMNS:
+        raise ValueError(f"Ordenação inválida: {order_by}")
+
+    if order_by == 'id':
+        params = [('order', 'id.asc')]
+    else:
+        params = [('order', f'{order_by}.asc,id.asc')]
+
+    if cursor:
+        position = decode_cursor(cursor, order_by)
+        if order_by == 'id':
+            params.append(('id', f"gt.{position['id']}"))
+        else:
+            value = quote_value(position['v'])
+            params.append((
+                'or',
+                f"({order_by}.gt.{value},and({order_by}.eq.{value},id.gt.{position['id']}))"
+            ))
+    return params
+
+
+def parse_content_range_total(content_range: Optional[str]) -> Optional[int]:
+    """Extrai o total do cabeçalho Content-Range (ex.: '0-49/1234')."""
+    if not content_range or '/' not in content_range:
+        return None
+    total = content_range.rsplit('/', 1)[1]
+    return int(total) if total.isdigit() else None
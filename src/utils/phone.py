@@ -0,0 +1,28 @@
+"""
+Normalização de números de telefone
+"""
+from typing import Optional
+
+
+def normalize_phone(phone: str) -> Optional[str]:
+    """
+    Limpa e formata número de telefone para formato internacional
+
+    Devolve apenas dígitos com o código do país (Portugal: 351) ou None
+    se o número não tiver um formato válido.
+    """
+    if not phone:
+        return None
+
+    # Remover caracteres não numéricos
+    clean = ''.join(filter(str.isdigit, str(phone)))
+
+    # Adicionar código do país se necessário (Portugal: +351)
+    if len(clean) == 9 and clean.startswith('9'):
+        clean = '351' + clean
+    elif len(clean) == 12 and clean.startswith('351'):
+        pass  # Já tem código do país
+    else:
+        return None  # Formato inválido
+
+    return clean
@@ -0,0 +1,42 @@
+"""
+Utilitários para construção de filtros PostgREST
+"""
+from typing import List, Tuple
+
+
+def quote_value(value) -> str:
+    """Coloca um valor entre aspas para uso dentro de filtros lógicos (or/and)."""
+    text = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{text}"'
+
+
+def ilike_contains(term: str) -> str:
+    """
+    Gera o padrão `ilike` "contém" para um termo de pesquisa, escapando os
+    caracteres especiais do LIKE para que sejam tratados literalmente.
+    """
+    # O PostgREST converte '*' em '%', pelo que é removido do termo
+    escaped = term.replace('*', '')
+    escaped = escaped.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'*{escaped}*'
+
+
+def search_filter(columns: List[str], term: str) -> Tuple[str, str]:
+    """Filtro `or=(col.ilike.*termo*,...)` sobre várias colunas."""
+    pattern = quote_value(ilike_contains(term))
+    conditions = ','.join(f'{column}.ilike.{pattern}' for column in columns)
+    return ('or', f'({conditions})')
+
+
+def combine_or_filters(params: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """
+    Junta vários filtros `or` num único `and=(or(...),or(...))`, já que o
+    PostgREST só aceita um parâmetro `or` por pedido.
+    """
+    or_filters = [value for key, value in params if key == 'or']
+    if len(or_filters) < 2:
+        return params
+
+    combined = [(key, value) for key, value in params if key != 'or']
+    combined.append(('and', '(' + ','.join(f'or{value}' for value in or_filters) + ')'))
+    return combined
@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_weather_store(monkeypatch, tmp_path):
+    """Cada teste usa a sua própria cache meteorológica partilhada."""
+    monkeypatch.setenv("WEATHER_SHARED_CACHE_PATH", str(tmp_path / "weather_cache.db"))
@@ -0,0 +1,120 @@
+import io
+import json
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+
+from src.routes import students as students_routes
+from src.services.supabase_service import supabase_service
+from src.utils.bulk_import import iter_csv_records, iter_ndjson_records
+
+
+def test_csv_parser_strips_values_and_flags_extra_columns():
+    data = b"\xef\xbb\xbfname,email,phone\n Ana ,ana@x.pt, 910000000\nRui,rui@x.pt,,extra\nEva,eva@x.pt,\n"
+
+    rows = list(iter_csv_records(io.BytesIO(data)))
+
+    assert rows[0] == (2, {"name": "Ana", "email": "ana@x.pt", "phone": "910000000"}, None)
+    assert rows[1][1] is None and "colunas" in rows[1][2]
+    assert rows[2][1] == {"name": "Eva", "email": "eva@x.pt"}
+
+
+def test_ndjson_parser_reports_invalid_lines():
+    data = b'{"name": "Ana"}\n\nnot json\n[1, 2]\n'
+
+    rows = list(iter_ndjson_records(io.BytesIO(data)))
+
+    assert rows[0] == (1, {"name": "Ana"}, None)
+    assert rows[1][0] == 3 and rows[1][2].startswith("JSON inválido")
+    assert rows[2][0] == 4 and rows[2][1] is None
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(students_routes.students_bp)
+    return app.test_client()
+
+
+@pytest.fixture
+def saved(monkeypatch):
+    """Substitui a escrita no Supabase, registando cada chamada."""
+    calls = []
+    existing = {"old@x.pt"}
+
+    def bulk_upsert_students(students, on_conflict="email", merge=False):
+        calls.append({"students": students, "on_conflict": on_conflict, "merge": merge})
+        rows = [s for s in students if merge or on_conflict is None or s["email"] not in existing]
+        return {"data": [dict(s, id=index + 1) for index, s in enumerate(rows)]}
+
+    monkeypatch.setattr(supabase_service, "bulk_upsert_students", bulk_upsert_students)
+    monkeypatch.setattr(supabase_service, "get_existing_student_emails",
+                        lambda emails: existing & set(emails))
+    return calls
+
+
+def _post(client, body, mode=None, content_type="text/csv"):
+    url = "/api/students/bulk" + (f"?mode={mode}" if mode else "")
+    return client.post(url, data=body, content_type=content_type)
+
+
+def test_bulk_import_happy_path(client, saved):
+    response = _post(client, "name,email,phone\nAna,ana@x.pt,910000000\nRui,rui@x.pt,920000000\n")
+
+    body = response.get_json()
+    assert body["success"] is True
+    assert body["summary"]["imported"] == 2
+    assert [r["status"] for r in body["results"]] == ["imported", "imported"]
+    assert saved[0]["students"][0]["medical_form"] == "pending"
+
+
+def test_bulk_import_reports_per_row_validation_errors(client, saved):
+    lines = [
+        json.dumps({"name": "Ana", "email": "ana@x.pt", "phone": "910000000"}),
+        json.dumps({"name": "Sem email", "phone": "910000001"}),
+        "{broken",
+    ]
+    response = _post(client, "\n".join(lines), content_type="application/x-ndjson")
+
+    body = response.get_json()
+    assert body["summary"] == {"total": 3, "imported": 1, "updated": 0, "skipped": 0,
+                               "invalid": 2, "failed": 0}
+    assert body["results"][1] == {"row": 2, "status": "invalid", "error": "Campo email é obrigatório"}
+    assert len(saved[0]["students"]) == 1
+
+
+def test_existing_email_is_skipped_by_default(client, saved):
+    response = _post(client, "name,email,phone\nVelho,old@x.pt,910000000\nNovo,new@x.pt,920000000\n")
+
+    body = response.get_json()
+    assert [r["status"] for r in body["results"]] == ["skipped", "imported"]
+    assert saved[0]["on_conflict"] == "email" and saved[0]["merge"] is False
+
+
+def test_merge_updates_only_columns_present_in_the_row(client, saved):
+    response = _post(client, "name,email,phone,notes\nVelho,old@x.pt,910000000,\nNovo,new@x.pt,920000000,Olá\n",
+                     mode="merge")
+
+    body = response.get_json()
+    assert [r["status"] for r in body["results"]] == ["updated", "imported"]
+    merged = next(call for call in saved if call["merge"])
+    assert merged["students"] == [{"name": "Velho", "email": "old@x.pt", "phone": "910000000"}]
+    inserted = next(call for call in saved if not call["merge"])
+    assert inserted["students"][0]["status"] == "active"
+
+
+def test_merge_upsert_never_sends_created_at(monkeypatch):
+    http = MagicMock()
+    http.post.return_value = MagicMock(status_code=200, json=lambda: [])
+    monkeypatch.setattr(supabase_service, "http", http)
+
+    supabase_service.bulk_upsert_students(
+        [{"name": "A", "email": "a@x.pt"}, {"name": "B", "email": "b@x.pt", "notes": "x"}],
+        on_conflict="email", merge=True
+    )
+
+    assert http.post.call_count == 2
+    for call in http.post.call_args_list:
+        assert "merge-duplicates" in call.kwargs["headers"]["Prefer"]
+        assert all("created_at" not in row for row in call.kwargs["json"])
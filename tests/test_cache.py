@@ -0,0 +1,44 @@
+from unittest.mock import patch
+
+from src.utils.cache import TTLCache
+
+
+def test_lru_eviction_and_counters():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = TTLCache(maxsize=2, ttl=10)
+    with patch("src.utils.cache.time.monotonic", return_value=100.0):
+        cache.set("a", 1)
+    with patch("src.utils.cache.time.monotonic", return_value=111.0):
+        assert cache.get("a") is None
+
+    assert cache.stats()["expirations"] == 1
+
+
+def test_get_entry_serves_stale_values_within_max_stale():
+    cache = TTLCache(maxsize=2, ttl=10, max_stale=5)
+    with patch("src.utils.cache.time.monotonic", return_value=100.0):
+        cache.set("a", 1)
+    with patch("src.utils.cache.time.monotonic", return_value=112.0):
+        assert cache.get("a") is None
+        assert cache.get_entry("a") == (1, 12.0)
+    with patch("src.utils.cache.time.monotonic", return_value=116.0):
+        assert cache.get_entry("a") is None
+
+    stats = cache.stats()
+    assert stats["stale_hits"] == 1
+    assert stats["expirations"] == 1
+    assert len(cache) == 0
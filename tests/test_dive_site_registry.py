@@ -0,0 +1,134 @@
+import random
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+
+from src.models.user import db
+from src.routes import dive_sites as dive_sites_routes
+from src.services.dive_site_registry import DiveSiteRegistry, GridIndex, haversine_km
+
+
+def _random_sites(count, seed=7):
+    rng = random.Random(seed)
+    return [
+        {"key": f"site-{i}", "lat": rng.uniform(36.5, 42.0), "lng": rng.uniform(-10.0, -6.0)}
+        for i in range(count)
+    ]
+
+
+def test_grid_index_matches_brute_force():
+    sites = _random_sites(300)
+    index = GridIndex(sites)
+    rng = random.Random(11)
+
+    for _ in range(50):
+        lat, lng = rng.uniform(35.0, 43.0), rng.uniform(-12.0, -5.0)
+        brute = sorted(sites, key=lambda s: haversine_km(lat, lng, s["lat"], s["lng"]))
+
+        nearest = [site["key"] for _km, site in index.nearest(lat, lng, 5)]
+        assert nearest == [site["key"] for site in brute[:5]]
+
+        within = {site["key"] for _km, site in index.within(lat, lng, 40)}
+        assert within == {
+            site["key"] for site in brute if haversine_km(lat, lng, site["lat"], site["lng"]) <= 40
+        }
+
+
+def test_grid_index_handles_empty_and_small_sets():
+    assert GridIndex([]).nearest(38.7, -9.1, 3) == []
+    assert GridIndex([]).within(38.7, -9.1, 10) == []
+
+    sites = _random_sites(2)
+    assert len(GridIndex(sites).nearest(38.7, -9.1, 5)) == 2
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+
+
+def test_registry_seeds_defaults_and_caches_payload(app):
+    registry = DiveSiteRegistry()
+    registry.load()
+
+    assert set(registry.locations) == {"berlengas", "peniche", "sesimbra"}
+    payload = registry.locations_payload()
+    assert registry.locations_payload() is payload
+    assert registry.nearest(39.36, -9.40)[0]["key"] == "peniche"
+
+
+def test_registry_changes_invalidate_payload(app):
+    registry = DiveSiteRegistry()
+    registry.load()
+    payload = registry.locations_payload()
+    version = registry.version
+
+    registry.create({"key": "cabo-raso", "name": "Cabo Raso", "lat": 38.71, "lng": -9.49})
+    assert registry.version > version
+    assert "cabo-raso" in {site["key"] for site in registry.locations_payload()}
+    assert registry.locations_payload() is not payload
+
+    registry.update("cabo-raso", {"lat": 38.72})
+    assert registry.get("cabo-raso")["lat"] == 38.72
+
+    assert registry.delete("cabo-raso") is True
+    assert registry.get("cabo-raso") is None
+    assert registry.delete("cabo-raso") is False
+
+
+def test_registry_rejects_invalid_sites(app):
+    registry = DiveSiteRegistry()
+    registry.load()
+
+    with pytest.raises(ValueError):
+        registry.create({"key": "Bad Key", "name": "X", "lat": 38, "lng": -9})
+    with pytest.raises(ValueError):
+        registry.create({"key": "ok", "name": "X", "lat": 95, "lng": -9})
+    with pytest.raises(ValueError):
+        registry.create({"key": "peniche", "name": "Peniche", "lat": 39, "lng": -9})
+
+
+def test_accessors_pick_up_changes_from_another_process(app):
+    registry, other = DiveSiteRegistry(reload_interval=0), DiveSiteRegistry(reload_interval=0)
+    registry.load()
+    other.load()
+    changed = []
+    registry.subscribe(changed.extend)
+
+    other.update("peniche", {"lat": 39.5})
+    other.delete("sesimbra")
+
+    # Numa thread sem contexto da aplicação (ex.: poller) a verificação também corre
+    seen = {}
+    reader = threading.Thread(target=lambda: seen.update(registry.locations))
+    reader.start()
+    reader.join()
+
+    assert seen["peniche"]["lat"] == 39.5
+    assert "sesimbra" not in seen
+    assert registry.get("peniche")["lat"] == 39.5
+    assert sorted(changed) == ["peniche", "sesimbra"]
+
+
+def test_update_route_only_invalidates_weather_when_coordinates_change(app, monkeypatch):
+    registry = DiveSiteRegistry()
+    registry.load()
+    weather = MagicMock()
+    monkeypatch.setattr(dive_sites_routes, "dive_site_registry", registry)
+    monkeypatch.setattr(dive_sites_routes, "weather_service", weather)
+    app.register_blueprint(dive_sites_routes.dive_sites_bp)
+    client = app.test_client()
+
+    assert client.put("/api/dive-sites/peniche", json={"name": "Peniche Norte"}).status_code == 200
+    weather.invalidate.assert_not_called()
+
+    assert client.put("/api/dive-sites/peniche", json={"lat": 39.4}).status_code == 200
+    weather.invalidate.assert_called_once_with("peniche")
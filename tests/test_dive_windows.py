@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from src.services.dive_windows import STATUS_METRICS, STATUS_NAMES, classify, find_dive_windows, find_runs
+from src.services.weather_forecast import HourlyForecast
+from src.services.weather_service import WeatherService
+
+
+def _forecast(start, waves):
+    return HourlyForecast.from_stormglass({
+        "hours": [
+            {
+                "time": (start + timedelta(hours=i)).isoformat() + "+00:00",
+                "waveHeight": {"sg": wave},
+                "windSpeed": {"sg": 8},
+            }
+            for i, wave in enumerate(waves)
+        ]
+    })
+
+
+def test_classify_matches_scalar_status_calculation():
+    service = WeatherService()
+    rng = np.random.default_rng(7)
+    values = rng.uniform(0, 60, size=(40, len(STATUS_METRICS))).astype(np.float32)
+    values[::5, 2] = np.nan
+    values[::7, 4] = 0
+
+    codes = classify(values)
+
+    for row, code in zip(values, codes):
+        wave, wind, gust, precipitation, visibility = (None if np.isnan(v) else float(v) for v in row)
+        expected = service._calculate_hour_status({
+            "waveHeight": wave, "windSpeed": wind, "gust": gust,
+            "precipitation": precipitation, "visibility": visibility,
+        })
+        assert STATUS_NAMES[code] == expected
+
+
+def test_find_runs_and_dive_windows():
+    rows, starts, ends = find_runs(np.array([[1, 1, 0, 1, 1, 1], [0, 0, 0, 0, 0, 1]], dtype=bool), 2)
+    assert list(zip(rows, starts, ends)) == [(0, 0, 2), (0, 3, 6)]
+
+    start = datetime(2026, 10, 18)
+    forecasts = {
+        "berlengas": _forecast(start, [0.5, 0.6, 1.5, 0.4, 0.4, 0.4, 2.5]),
+        "sesimbra": _forecast(start + timedelta(hours=1), [1.5, 1.4, 0.3]),
+    }
+
+    green = find_dive_windows(forecasts, min_hours=2)
+    assert [(w["start"], w["hours"]) for w in green["berlengas"]] == [
+        ("2026-10-18T00:00:00", 2), ("2026-10-18T03:00:00", 3)
+    ]
+    assert green["sesimbra"] == []
+
+    yellow = find_dive_windows(forecasts, min_hours=3, level="YELLOW")
+    assert [(w["hours"], w["worst_status"]) for w in yellow["berlengas"]] == [(6, "YELLOW")]
+    assert [(w["end"], w["hours"]) for w in yellow["sesimbra"]] == [("2026-10-18T04:00:00", 3)]
@@ -0,0 +1,54 @@
+from src.utils.encryption import CryptoManager, SENSITIVE_FIELDS
+
+
+def test_batch_encrypt_and_decrypt_match_serial_results():
+    manager = CryptoManager()
+    manager.batch_workers = 4
+    records = [{"id": i, "name": f"Aluno {i}", "phone": f"91{i:07d}"} for i in range(150)]
+
+    encrypted = manager.encrypt_many(records, SENSITIVE_FIELDS)
+
+    assert [row["id"] for row in encrypted] == list(range(150))
+    assert all(row["phone"] != records[i]["phone"] for i, row in enumerate(encrypted))
+    assert manager.decrypt_many(encrypted, SENSITIVE_FIELDS) == records
+    assert manager.decrypt_many(encrypted[:3], SENSITIVE_FIELDS) == records[:3]
+
+
+def test_v2_format_is_compact_and_v1_still_decrypts(monkeypatch):
+    monkeypatch.setenv("ENCRYPTION_FORMAT", "v1")
+    legacy = CryptoManager()
+    v1_token = legacy.encrypt_string("+351 912 345 678")
+
+    monkeypatch.setenv("ENCRYPTION_FORMAT", "v2")
+    manager = CryptoManager()
+    v2_token = manager.encrypt_string("+351 912 345 678")
+
+    assert v2_token.startswith("v2:")
+    assert len(v2_token) < len(v1_token) / 2
+    assert manager.decrypt_string(v2_token) == "+351 912 345 678"
+    assert manager.decrypt_string(v1_token) == "+351 912 345 678"
+    assert manager.decrypt_string("v2:" + v2_token[3:-2] + "AA") != "+351 912 345 678"
+
+
+def test_blind_index_matches_normalised_phone_and_is_not_exposed(monkeypatch):
+    monkeypatch.setenv("BLIND_INDEX_ENABLED", "true")
+    manager = CryptoManager()
+
+    encrypted = manager.encrypt_dict({"id": 1, "phone": "912 345 678"}, SENSITIVE_FIELDS)
+
+    assert encrypted["phone_bidx"] == manager.blind_index("phone", "+351912345678")
+    assert encrypted["phone_bidx"] != manager.blind_index("phone", "912345679")
+    assert manager.blind_index("phone", "12345") is None
+    assert manager.decrypt_dict(encrypted, SENSITIVE_FIELDS) == {"id": 1, "phone": "912 345 678"}
+
+
+def test_blind_index_column_is_not_written_unless_enabled(monkeypatch):
+    monkeypatch.delenv("BLIND_INDEX_ENABLED", raising=False)
+    manager = CryptoManager()
+
+    encrypted = manager.encrypt_dict({"id": 1, "phone": "912 345 678"}, SENSITIVE_FIELDS)
+
+    assert "phone_bidx" not in encrypted
+    assert manager.index_dict(encrypted, SENSITIVE_FIELDS) == {
+        "phone_bidx": manager.blind_index("phone", "912345678")
+    }
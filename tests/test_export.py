@@ -0,0 +1,20 @@
+import gzip
+import json
+
+from src.utils.export import gzip_stream, iter_csv, iter_ndjson
+
+
+def test_csv_and_ndjson_streams_are_lazy_and_complete():
+    rows = ({"id": i, "name": f"Aluno {i}"} for i in range(3))
+    csv_text = "".join(iter_csv(rows, ["id", "name"]))
+
+    assert csv_text.splitlines() == ["id,name", "0,Aluno 0", "1,Aluno 1", "2,Aluno 2"]
+
+    ndjson_text = "".join(iter_ndjson({"id": i} for i in range(2)))
+    assert [json.loads(line) for line in ndjson_text.splitlines()] == [{"id": 0}, {"id": 1}]
+
+
+def test_gzip_stream_roundtrip():
+    chunks = ["a" * 10, "ção\n", "b" * 5]
+
+    assert gzip.decompress(b"".join(gzip_stream(chunks))).decode() == "".join(chunks)
@@ -0,0 +1,39 @@
+from unittest.mock import patch
+
+from src.utils.http_transport import HTTPTransport
+
+
+def test_session_is_shared_per_host():
+    transport = HTTPTransport()
+
+    first = transport.session_for("https://example.supabase.co/rest/v1/students")
+    second = transport.session_for("https://example.supabase.co/rest/v1/settings")
+    other = transport.session_for("https://api.stormglass.io/v2/weather/point")
+
+    assert first is second
+    assert first is not other
+
+
+def test_client_applies_service_timeout(monkeypatch):
+    monkeypatch.setenv("HTTP_TIMEOUT_STORMGLASS", "4")
+    transport = HTTPTransport()
+    client = transport.client("stormglass")
+    session = transport.session_for("https://api.stormglass.io/v2/weather/point", retry_responses=False)
+
+    with patch.object(session, "request") as request_mock:
+        client.get("https://api.stormglass.io/v2/weather/point")
+        client.get("https://api.stormglass.io/v2/weather/point", timeout=1)
+
+    assert request_mock.call_args_list[0].kwargs["timeout"] == 4.0
+    assert request_mock.call_args_list[1].kwargs["timeout"] == 1
+
+
+def test_quota_services_do_not_retry_responses():
+    transport = HTTPTransport()
+    url = "https://api.stormglass.io/v2/weather/point"
+
+    assert transport.client("stormglass").retry_responses is False
+    retry = transport.session_for(url, retry_responses=False).get_adapter(url).max_retries
+    assert (retry.status, retry.read) == (0, 0)
+    assert retry.connect == transport.max_retries
+    assert transport.session_for(url).get_adapter(url).max_retries.status == transport.max_retries
@@ -0,0 +1,157 @@
+from src.services import key_rotation
+from src.services.key_rotation import BlindIndexBackfillJob, KeyRotationJob
+from src.utils.encryption import CryptoManager
+
+
+class FakeStudents:
+    def __init__(self, rows):
+        self.rows = {row["id"]: dict(row) for row in rows}
+        self.patches = []
+        self.fail_after = None
+        self.concurrent_writes = {}
+
+    def get_encrypted_student_rows(self, after_id=None, limit=500):
+        if self.fail_after is not None and after_id is not None and after_id >= self.fail_after:
+            raise RuntimeError("Erro ao obter estudantes: 503")
+        ids = sorted(i for i in self.rows if after_id is None or i > after_id)
+        return [dict(self.rows[i]) for i in ids[:limit]]
+
+    def get_encrypted_students_by_ids(self, student_ids):
+        return [dict(self.rows[i]) for i in sorted(student_ids) if i in self.rows]
+
+    def update_encrypted_student(self, student_id, changes, expected_updated_at):
+        self.patches.append(student_id)
+        row = self.rows[student_id]
+        # Simula uma escrita de outro pedido entre a leitura e o PATCH
+        if self.concurrent_writes.get(student_id):
+            self.concurrent_writes[student_id] -= 1
+            row["updated_at"] = f"{row['updated_at']}+"
+        if row["updated_at"] != expected_updated_at:
+            return {"conflict": True}
+        row.update(changes, updated_at="later")
+        return {"data": row}
+
+
+def test_rotation_reencrypts_old_rows_and_resumes_from_checkpoint(monkeypatch, tmp_path):
+    monkeypatch.setenv("ENCRYPTION_KEY_ID", "old")
+    monkeypatch.setenv("ENCRYPTION_KEY", "old-secret")
+    old = CryptoManager()
+    rows = [
+        {"id": i, "updated_at": "t0", "phone": old.encrypt_string(f"91234567{i}")}
+        for i in range(1, 6)
+    ]
+
+    monkeypatch.setenv("ENCRYPTION_KEY_ID", "new")
+    monkeypatch.setenv("ENCRYPTION_KEY", "new-secret")
+    monkeypatch.setenv("ENCRYPTION_OLD_KEYS", "old:old-secret")
+    monkeypatch.setenv("BLIND_INDEX_ENABLED", "true")
+    manager = CryptoManager()
+    monkeypatch.setattr(key_rotation, "crypto_manager", manager)
+
+    service = FakeStudents(rows)
+    checkpoint = tmp_path / "rotation.json"
+    service.fail_after = 2
+    interrupted = KeyRotationJob(service, checkpoint_path=str(checkpoint), page_size=2).run()
+    assert interrupted["last_id"] == 2 and interrupted["finished_at"] is None
+
+    service.fail_after = None
+
+    job = KeyRotationJob(service, checkpoint_path=str(checkpoint), page_size=2)
+    assert job.progress["last_id"] == 2
+    progress = job.run()
+
+    assert progress["scanned"] == 5 and progress["rotated"] == 5
+    assert progress["finished_at"] is not None
+    assert service.patches == [1, 2, 3, 4, 5]
+    for row in service.rows.values():
+        assert manager.key_id_of(row["phone"]) == "new"
+        assert row["phone_bidx"] == manager.blind_index("phone", manager.decrypt_string(row["phone"]))
+    assert manager.decrypt_string(rows[0]["phone"]) == "912345671"
+
+
+def test_rotation_retries_rows_changed_concurrently(monkeypatch, tmp_path):
+    monkeypatch.setenv("ENCRYPTION_KEY_ID", "old")
+    monkeypatch.setenv("ENCRYPTION_KEY", "old-secret")
+    old = CryptoManager()
+    rows = [
+        {"id": i, "updated_at": "t0", "phone": old.encrypt_string(f"91234567{i}")}
+        for i in range(1, 4)
+    ]
+
+    monkeypatch.setenv("ENCRYPTION_KEY_ID", "new")
+    monkeypatch.setenv("ENCRYPTION_KEY", "new-secret")
+    monkeypatch.setenv("ENCRYPTION_OLD_KEYS", "old:old-secret")
+    manager = CryptoManager()
+    monkeypatch.setattr(key_rotation, "crypto_manager", manager)
+
+    service = FakeStudents(rows)
+    service.concurrent_writes = {2: 1, 3: 10}
+    checkpoint = tmp_path / "rotation.json"
+    job = KeyRotationJob(service, checkpoint_path=str(checkpoint), page_size=2, conflict_retries=2)
+    progress = job.run()
+
+    # A linha 2 fica resolvida na nova tentativa; a 3 continua em conflito
+    assert manager.key_id_of(service.rows[2]["phone"]) == "new"
+    assert progress["conflicts"] == 1 and progress["conflict_ids"] == [3]
+    assert progress["finished_at"] is None and "conflito" in progress["last_error"]
+
+    service.concurrent_writes = {}
+    progress = KeyRotationJob(service, checkpoint_path=str(checkpoint), page_size=2).run()
+    assert progress["conflicts"] == 0 and progress["finished_at"] is not None
+    assert progress["rotated"] == 3
+    for row in service.rows.values():
+        assert manager.key_id_of(row["phone"]) == "new"
+
+
+def test_blind_index_backfill_indexes_existing_rows(monkeypatch, tmp_path):
+    monkeypatch.delenv("BLIND_INDEX_ENABLED", raising=False)
+    legacy = CryptoManager()
+    rows = [
+        {"id": i, "updated_at": "t0", "phone": legacy.encrypt_string(f"91234567{i}")}
+        for i in range(1, 4)
+    ]
+    service = FakeStudents(rows)
+    checkpoint = tmp_path / "backfill.json"
+
+    monkeypatch.setattr(key_rotation, "crypto_manager", legacy)
+    skipped = BlindIndexBackfillJob(service, checkpoint_path=str(checkpoint), page_size=2).run()
+    assert skipped["indexed"] == 0 and "BLIND_INDEX_ENABLED" in skipped["last_error"]
+    assert service.patches == []
+
+    monkeypatch.setenv("BLIND_INDEX_ENABLED", "true")
+    manager = CryptoManager()
+    monkeypatch.setattr(key_rotation, "crypto_manager", manager)
+    job = BlindIndexBackfillJob(service, checkpoint_path=str(checkpoint), page_size=2)
+    progress = job.run()
+
+    assert progress["scanned"] == 3 and progress["indexed"] == 3
+    assert job.is_complete()
+    for row in service.rows.values():
+        assert row["phone_bidx"] == manager.blind_index("phone", manager.decrypt_string(row["phone"]))
+
+
+def test_blind_index_backfill_is_incomplete_while_conflicts_remain(monkeypatch, tmp_path):
+    monkeypatch.delenv("BLIND_INDEX_ENABLED", raising=False)
+    legacy = CryptoManager()
+    rows = [
+        {"id": i, "updated_at": "t0", "phone": legacy.encrypt_string(f"91234567{i}")}
+        for i in range(1, 4)
+    ]
+    service = FakeStudents(rows)
+    service.concurrent_writes = {1: 1, 2: 10}
+    checkpoint = tmp_path / "backfill.json"
+
+    monkeypatch.setenv("BLIND_INDEX_ENABLED", "true")
+    manager = CryptoManager()
+    monkeypatch.setattr(key_rotation, "crypto_manager", manager)
+    job = BlindIndexBackfillJob(service, checkpoint_path=str(checkpoint), page_size=2, conflict_retries=1)
+    progress = job.run()
+
+    assert "phone_bidx" in service.rows[1]
+    assert progress["conflict_ids"] == [2] and progress["indexed"] == 2
+    assert not job.is_complete()
+
+    service.concurrent_writes = {}
+    progress = job.run()
+    assert progress["indexed"] == 3 and progress["conflicts"] == 0
+    assert job.is_complete()
@@ -0,0 +1,62 @@
+from src.services.local_mirror import LocalMirror
+
+
+def _fake_fetch(rows):
+    calls = []
+
+    def fetch(table, watermark, limit):
+        calls.append(watermark)
+        pending = [
+            row for row in rows.get(table, [])
+            if watermark is None
+            or (row["updated_at"], row["id"]) > (watermark["updated_at"], watermark["id"])
+        ]
+        pending.sort(key=lambda row: (row["updated_at"], row["id"]))
+        return pending[:limit]
+
+    return fetch, calls
+
+
+def test_incremental_sync_and_local_queries(tmp_path):
+    rows = {
+        "students": [
+            {"id": 1, "name": "Ana Silva", "status": "active", "updated_at": "2025-09-01T10:00:00"},
+            {"id": 2, "name": "Rui 100%", "status": "inactive", "updated_at": "2025-09-01T11:00:00"},
+            {"id": 3, "name": "Rita", "status": "active", "updated_at": "2025-09-01T12:00:00"},
+        ]
+    }
+    fetch, calls = _fake_fetch(rows)
+    mirror = LocalMirror(str(tmp_path / "mirror.db"), fetch, page_size=2)
+
+    assert not mirror.is_ready("students")
+    assert mirror.sync_all()["students"] == 3
+    assert mirror.is_ready("students")
+
+    assert [r["id"] for r in mirror.query("students", filters=[("status", "eq", "active")])] == [1, 3]
+    assert [r["id"] for r in mirror.query("students", search=(["name"], "100%"))] == [2]
+    assert [r["id"] for r in mirror.query("students", after={"id": 1}, limit=1)] == [2]
+    assert mirror.count("students", filters=[("status", "eq", "active")]) == 2
+
+    rows["students"].append({"id": 4, "name": "Nuno", "status": "active", "updated_at": "2025-09-02T09:00:00"})
+    calls.clear()
+    assert mirror.sync_table("students") == 1
+    assert calls[0] == {"updated_at": "2025-09-01T12:00:00", "id": 3}
+
+    mirror.apply("students", {"id": 1, "name": "Ana Costa", "status": "inactive", "updated_at": "2025-09-03"})
+    assert mirror.get("students", 1)["name"] == "Ana Costa"
+    assert mirror.freshness("students")["source"] == "local_mirror"
+
+
+def test_failed_sync_keeps_serving_local_rows(tmp_path):
+    fetch, _ = _fake_fetch({"students": [{"id": 1, "updated_at": "2025-09-01"}]})
+    mirror = LocalMirror(str(tmp_path / "mirror.db"), fetch, tables=("students",))
+    mirror.sync_all()
+
+    def failing_fetch(table, watermark, limit):
+        raise RuntimeError("Supabase indisponível")
+
+    mirror.fetch_changes = failing_fetch
+    mirror.sync_all()
+
+    assert mirror.get("students", 1) == {"id": 1, "updated_at": "2025-09-01"}
+    assert mirror.freshness("students")["last_error"] == "Supabase indisponível"
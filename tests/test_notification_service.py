@@ -0,0 +1,101 @@
+import gzip
+import json
+import threading
+import time
+from unittest.mock import MagicMock
+
+from src.services.notification_service import NotificationService
+
+
+class FakeExpo:
+    def __init__(self, delay=0.0, fail_batch=None):
+        self.delay = delay
+        self.fail_batch = fail_batch
+        self.batches = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def post(self, url, data=None, headers=None):
+        assert headers["Content-Encoding"] == "gzip"
+        messages = json.loads(gzip.decompress(data))
+        with self.lock:
+            self.batches.append(messages)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+
+        response = MagicMock(status_code=200)
+        if self.fail_batch is not None and messages[0]["to"] == self.fail_batch:
+            response.status_code = 500
+            response.json.return_value = {"errors": [{"code": "INTERNAL"}]}
+            return response
+        tickets = []
+        for message in messages:
+            if message["to"].endswith("-gone"):
+                tickets.append({"status": "error", "details": {"error": "DeviceNotRegistered"}})
+            else:
+                tickets.append({"status": "ok", "id": f"ticket-{message['to']}"})
+        response.json.return_value = {"data": tickets}
+        return response
+
+
+def _service(expo, count, concurrency=3):
+    service = NotificationService(concurrency=concurrency)
+    service.http = expo
+    for i in range(count):
+        service.register_token(f"token-{i}")
+    return service
+
+
+def test_tokens_are_sent_in_concurrent_batches_of_100():
+    expo = FakeExpo(delay=0.05)
+    service = _service(expo, 450)
+
+    result = service.send_notification("Title", "Body")
+
+    assert sorted(len(batch) for batch in expo.batches) == [50, 100, 100, 100, 100]
+    assert 1 < expo.max_in_flight <= 3
+    assert result["sent"] == 450 and result["ok"] == 450 and result["errors"] == 0
+    assert [ticket["token"] for ticket in result["tickets"]] == service.tokens
+    assert result["tickets"][0]["id"] == "ticket-token-0"
+
+
+def test_failed_batch_and_unregistered_devices():
+    expo = FakeExpo(fail_batch="token-100")
+    service = _service(expo, 250)
+    service.register_token("token-gone")
+
+    result = service.send_notification("Title", "Body")
+
+    assert result["errors"] == 101
+    assert all(ticket["status"] == "error" for ticket in result["tickets"][100:200])
+    assert result["removed"] == 1
+    assert "token-gone" not in service.tokens and len(service.tokens) == 250
+
+
+def test_token_registered_while_sending_survives_cleanup():
+    expo = FakeExpo()
+    service = _service(expo, 1)
+    service.register_token("token-gone")
+    post = expo.post
+
+    def post_and_register(url, data=None, headers=None):
+        service.register_token("token-new")
+        return post(url, data=data, headers=headers)
+
+    expo.post = post_and_register
+    result = service.send_notification("Title", "Body")
+
+    assert result["removed"] == 1
+    assert service.tokens == ["token-0", "token-new"]
+
+
+def test_no_tokens_sends_nothing():
+    expo = FakeExpo()
+    result = _service(expo, 0).send_notification("Title", "Body")
+
+    assert expo.batches == []
+    assert result == {"sent": 0, "ok": 0, "errors": 0, "removed": 0, "tickets": []}
@@ -0,0 +1,38 @@
+import pytest
+
+from src.utils.pagination import (
+    decode_cursor,
+    encode_cursor,
+    keyset_params,
+    parse_content_range_total,
+)
+
+
+def test_cursor_roundtrip_and_keyset_params():
+    cursor = encode_cursor("updated_at", {"id": 42, "updated_at": "2025-09-01T10:00:00"})
+
+    assert decode_cursor(cursor, "updated_at")["id"] == 42
+    assert keyset_params("updated_at", cursor) == [
+        ("order", "updated_at.asc,id.asc"),
+        ("or", '(updated_at.gt."2025-09-01T10:00:00",and(updated_at.eq."2025-09-01T10:00:00",id.gt.42))'),
+    ]
+    assert keyset_params("id", encode_cursor("id", {"id": 7})) == [
+        ("order", "id.asc"),
+        ("id", "gt.7"),
+    ]
+
+
+def test_cursor_rejects_other_ordering_and_garbage():
+    cursor = encode_cursor("id", {"id": 7})
+
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, "updated_at")
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor", "id")
+
+
+def test_parse_content_range_total():
+    assert parse_content_range_total("0-49/1234") == 1234
+    assert parse_content_range_total("*/0") == 0
+    assert parse_content_range_total("0-49/*") is None
+    assert parse_content_range_total(None) is None
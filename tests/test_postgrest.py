@@ -0,0 +1,21 @@
+from src.utils.postgrest import combine_or_filters, search_filter
+
+
+def test_search_filter_escapes_like_and_logic_characters():
+    key, value = search_filter(["name", "email"], 'a_b%(c),"d"*')
+
+    assert key == "or"
+    assert value == (
+        '(name.ilike."*a\\\\_b\\\\%(c),\\"d\\"*",'
+        'email.ilike."*a\\\\_b\\\\%(c),\\"d\\"*")'
+    )
+
+
+def test_combine_or_filters_wraps_multiple_or_params():
+    params = [("status", "eq.active"), ("or", "(a.eq.1,b.eq.2)"), ("or", "(c.gt.3)")]
+
+    assert combine_or_filters(params) == [
+        ("status", "eq.active"),
+        ("and", "(or(a.eq.1,b.eq.2),or(c.gt.3))"),
+    ]
+    assert combine_or_filters(params[:2]) == params[:2]
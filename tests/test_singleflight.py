@@ -0,0 +1,72 @@
+import threading
+
+import pytest
+
+from src.utils.singleflight import SingleFlight
+
+
+def _run_concurrently(flight, fn, callers, timeout=None):
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flight.do("berlengas", fn, timeout=timeout))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return {"waveHeight": 0.8}
+
+    threads, results, errors = _run_concurrently(flight, fetch, 5)
+    while flight.stats()["shared"] < 4:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == [{"waveHeight": 0.8}] * 5 and not errors
+    assert flight.in_flight() == 0
+
+
+def test_errors_propagate_to_waiters_and_waiters_time_out():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise RuntimeError("Erro na API Stormglass: 503")
+
+    threads, results, errors = _run_concurrently(flight, failing, 3)
+    while flight.stats()["shared"] < 2:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert not results
+    assert [str(e) for e in errors] == ["Erro na API Stormglass: 503"] * 3
+
+    blocked = threading.Event()
+    leader = threading.Thread(target=flight.do, args=("berlengas", lambda: blocked.wait(5)))
+    leader.start()
+    while flight.in_flight() == 0:
+        pass
+    with pytest.raises(TimeoutError):
+        flight.do("berlengas", lambda: None, timeout=0.01)
+    blocked.set()
+    leader.join()
+    assert flight.stats()["timeouts"] == 1
@@ -0,0 +1,88 @@
+from datetime import datetime
+
+from src.services.stormglass_quota import StormglassQuota
+from src.services.weather_store import SharedWeatherStore
+
+
+class Clock:
+    def __init__(self, when):
+        self.now = (when - datetime(1970, 1, 1)).total_seconds()
+
+    def __call__(self):
+        return self.now
+
+
+def _quota(**kwargs):
+    clock = Clock(datetime(2025, 6, 1, 12, 0))
+    options = dict(daily_quota=100, reserve=0.1, min_interval=60, max_interval=86400, clock=clock)
+    options.update(kwargs)
+    return StormglassQuota(**options), clock
+
+
+def test_reserve_is_kept_for_priority_requests_and_day_rolls_over():
+    quota, clock = _quota()
+    for _ in range(90):
+        assert quota.can_spend()
+        quota.record_call(200)
+
+    assert quota.can_spend() is False
+    assert quota.can_spend(priority=True) is True
+    quota.record_call(402)
+    assert quota.can_spend(priority=True) is False
+    assert quota.remaining() == 0
+
+    clock.now += 12 * 3600
+    assert quota.remaining() == 100 and quota.can_spend()
+
+
+def test_api_metadata_overrides_local_accounting():
+    quota, _clock = _quota()
+    quota.record_call(200, {"dailyQuota": 50, "requestCount": 20})
+
+    assert quota.quota == 50
+    assert quota.remaining() == 30
+
+
+def test_plan_spreads_remaining_budget_by_traffic_and_volatility():
+    quota, _clock = _quota()
+    sites = ["berlengas", "peniche", "sesimbra"]
+    for _ in range(20):
+        quota.record_request("peniche")
+    quota.record_reading("sesimbra", {"waveHeight": 0.5, "windSpeed": 5, "status": "GREEN"})
+    quota.record_reading("sesimbra", {"waveHeight": 1.6, "windSpeed": 18, "status": "YELLOW"})
+
+    plan = quota.plan(sites)
+    assert plan["peniche"] < plan["berlengas"]
+    assert plan["sesimbra"] < plan["berlengas"]
+
+    # 12 horas restantes e 90 pedidos disponíveis: o plano não excede o orçamento
+    assert sum(12 * 3600 / interval for interval in plan.values()) <= 90 + 1e-6
+
+
+def test_intervals_are_clamped_and_exhaustion_uses_max_interval():
+    quota, _clock = _quota(min_interval=900, max_interval=3600)
+    assert set(quota.plan(["berlengas"]).values()) == {900}
+
+    quota.record_call(402)
+    assert quota.interval_for("berlengas", ["berlengas"]) == 3600
+
+
+def test_usage_is_shared_between_workers_and_survives_restarts(tmp_path):
+    path = str(tmp_path / "weather_cache.db")
+    first, clock = _quota(store=SharedWeatherStore(path), sync_interval=0)
+    for _ in range(30):
+        first.record_call(200)
+
+    second, _clock = _quota(store=SharedWeatherStore(path), sync_interval=0)
+    assert second.remaining() == 70
+    second.record_call(429)
+
+    assert first.remaining() == 0
+    assert first.can_spend(priority=True) is False
+
+    restarted, restarted_clock = _quota(store=SharedWeatherStore(path))
+    assert restarted.status([])["used"] == 31
+    assert restarted.status([])["exhausted"] is True
+
+    restarted_clock.now += 24 * 3600
+    assert restarted.remaining() == 100
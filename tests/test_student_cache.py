@@ -0,0 +1,82 @@
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.services.supabase_service import SupabaseService
+from src.utils.cache import TTLCache
+
+
+def _response(rows, status_code=200):
+    return MagicMock(status_code=status_code, json=lambda: rows)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = SupabaseService()
+    service.mirror = None
+    service.student_cache = TTLCache(maxsize=16, ttl=60)
+    service.http = MagicMock()
+    monkeypatch.setattr(service.student_stats, "record", lambda row: None)
+    return service
+
+
+def test_get_student_is_served_from_cache(service):
+    service.http.get.return_value = _response([{"id": 1, "name": "Ana"}])
+
+    assert service.get_student(1)["name"] == "Ana"
+    assert service.get_student(1)["name"] == "Ana"
+    assert service.http.get.call_count == 1
+
+
+def test_updates_invalidate_and_refresh_the_cache(service):
+    service.http.get.return_value = _response([{"id": 1, "name": "Ana"}])
+    service.get_student(1)
+
+    service.http.patch.return_value = _response([{"id": 1, "name": "Ana Maria"}])
+    service.update_student(1, {"name": "Ana Maria"})
+    assert service.get_student(1)["name"] == "Ana Maria"
+
+    service.http.patch.return_value = _response([{"id": 1, "name": "Ana Maria", "phone": "x"}])
+    service.update_encrypted_student(1, {"phone": "x"}, "2025-01-01")
+    service.http.get.return_value = _response([{"id": 1, "name": "Recarregada"}])
+    assert service.get_student(1)["name"] == "Recarregada"
+    assert service.http.get.call_count == 2
+
+
+def test_read_started_before_update_does_not_cache_the_old_row(service):
+    fetched = threading.Event()
+    release = threading.Event()
+
+    def slow_get(url, **kwargs):
+        fetched.set()
+        release.wait(5)
+        return _response([{"id": 1, "name": "Antes"}])
+
+    service.http.get.side_effect = slow_get
+    reader = threading.Thread(target=service.get_student, args=(1,))
+    reader.start()
+    fetched.wait(5)
+
+    # A atualização termina enquanto a leitura antiga ainda está em curso
+    service.http.patch.return_value = _response([])
+    service.update_student(1, {"name": "Depois"})
+    release.set()
+    reader.join(5)
+
+    assert service.student_cache.get(1) is None
+
+
+def test_invalidation_log_is_bounded_by_cache_size(service):
+    early = service._student_cache_generation()
+    for student_id in range(100):
+        service._forget_student(student_id)
+
+    assert len(service._student_invalidated) == service.student_cache.maxsize
+    # Uma leitura anterior às invalidações esquecidas não é guardada
+    service._remember_student({"id": 1, "name": "Antiga"}, early)
+    assert service.student_cache.get(1) is None
+
+    current = service._student_cache_generation()
+    service._remember_student({"id": 1, "name": "Nova"}, current)
+    assert service.student_cache.get(1)["name"] == "Nova"
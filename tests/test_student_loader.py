@@ -0,0 +1,36 @@
+from src.services.student_loader import StudentLoader, attach_students
+
+
+class FakeService:
+    def __init__(self):
+        self.calls = []
+
+    def get_students(self, ids):
+        self.calls.append(list(ids))
+        return {i: {"id": i, "name": f"Aluno {i}"} for i in ids if i != 99}
+
+
+def test_loader_batches_and_deduplicates_lookups():
+    service = FakeService()
+    loader = StudentLoader(service)
+
+    loader.prime([1, 2, 2, 99])
+    assert loader.load(2)["name"] == "Aluno 2"
+    assert loader.load(1)["name"] == "Aluno 1"
+    assert loader.load(99) is None
+    assert loader.load_many([1, 3]) == [{"id": 1, "name": "Aluno 1"}, {"id": 3, "name": "Aluno 3"}]
+
+    assert service.calls == [[1, 2, 99], [3]]
+
+
+def test_attach_students_uses_one_batch(monkeypatch):
+    service = FakeService()
+    monkeypatch.setattr(
+        "src.services.student_loader.get_student_loader", lambda: StudentLoader(service)
+    )
+    rows = [{"student_id": 1}, {"student_id": 2}, {"student_id": 1}]
+
+    attach_students(rows)
+
+    assert [row["student"]["id"] for row in rows] == [1, 2, 1]
+    assert service.calls == [[1, 2]]
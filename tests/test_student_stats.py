@@ -0,0 +1,87 @@
+import threading
+
+from src.services.student_stats import StudentStats
+
+
+def _rows():
+    return [
+        {"id": 1, "status": "active", "medical_form": "done", "waiver": "done",
+         "total_dives": 10, "certification_level": "Open Water"},
+        {"id": 2, "status": "inactive", "medical_form": "pending", "waiver": "done",
+         "total_dives": 3, "certification_level": "Open Water"},
+    ]
+
+
+def test_snapshot_reconciles_once_and_applies_writes_in_place():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return _rows()
+
+    stats = StudentStats(loader, reconcile_interval=3600)
+    first = stats.snapshot()
+
+    assert first["total"] == 2
+    assert first["active"] == 1
+    assert first["pending_docs"] == 1
+    assert first["total_dives"] == 13
+    assert first["certifications"] == {"Open Water": 2}
+
+    stats.record({"id": 2, "status": "active", "medical_form": "done", "waiver": "done",
+                  "total_dives": 5, "certification_level": "Advanced Open Water"})
+    stats.record({"id": 3, "status": "active", "medical_form": "pending", "waiver": "pending",
+                  "total_dives": 0, "certification_level": None})
+    second = stats.snapshot()
+
+    assert len(calls) == 1
+    assert second["total"] == 3
+    assert second["active"] == 3
+    assert second["inactive"] == 0
+    assert second["pending_docs"] == 1
+    assert second["total_dives"] == 15
+    assert second["certifications"] == {
+        "Open Water": 1,
+        "Advanced Open Water": 1,
+        "Unknown": 1,
+    }
+
+
+def test_snapshot_is_unavailable_until_first_reconcile_succeeds():
+    rows = []
+
+    def loader():
+        if not rows:
+            raise ConnectionError("supabase down")
+        return rows
+
+    stats = StudentStats(loader, reconcile_interval=3600)
+    assert stats.snapshot() is None
+    assert stats.last_error == "supabase down"
+
+    rows.extend(_rows())
+    assert stats.snapshot()["total"] == 2
+    assert stats.last_error is None
+
+
+def test_concurrent_cold_snapshots_wait_for_the_first_reconcile():
+    started, release = threading.Event(), threading.Event()
+
+    def loader():
+        started.set()
+        release.wait(5)
+        return _rows()
+
+    stats = StudentStats(loader, reconcile_interval=3600)
+    results = []
+    first = threading.Thread(target=lambda: results.append(stats.snapshot()))
+    first.start()
+    started.wait(5)
+
+    second = threading.Thread(target=lambda: results.append(stats.snapshot()))
+    second.start()
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert [result["total"] for result in results] == [2, 2]
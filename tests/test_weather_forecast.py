@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from src.services.weather_forecast import HourlyForecast
+from src.services.weather_service import WeatherService
+
+
+def _raw_forecast(start, hours):
+    return {
+        "hours": [
+            {
+                "time": (start + timedelta(hours=i)).isoformat() + "+00:00",
+                "waveHeight": {"sg": 0.5 + 0.1 * i, "noaa": 9.9},
+                "windSpeed": {"sg": 8},
+                "visibility": {"sg": None, "noaa": 10},
+            }
+            for i in range(hours)
+        ]
+    }
+
+
+def test_hourly_forecast_is_compact_and_sliceable():
+    start = datetime(2026, 10, 17, 6)
+    forecast = HourlyForecast.from_stormglass(_raw_forecast(start, 72))
+
+    assert len(forecast) == 72
+    assert forecast.nbytes < 3000
+    assert forecast.index_at(start + timedelta(hours=2, minutes=30)) == 2
+
+    hours = forecast.hours(start + timedelta(hours=1), start + timedelta(hours=3))
+    assert [hour["time"] for hour in hours] == ["2026-10-17T07:00:00", "2026-10-17T08:00:00"]
+    assert hours[0]["waveHeight"] == 0.6
+    assert hours[0]["visibility"] == 10.0
+    assert hours[0]["gust"] is None
+
+
+def test_forecast_and_current_conditions_share_one_fetch():
+    service = WeatherService()
+    now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    raw = _raw_forecast(now, 72)
+
+    with patch.object(service, "_request_stormglass_data", return_value=raw) as fetch_mock:
+        current = service.get_weather_data("peniche")
+        forecast = service.get_forecast("peniche", now, now + timedelta(hours=48))
+
+    assert fetch_mock.call_count == 1
+    assert current["waveHeight"] == 0.5
+    assert len(forecast["hours"]) == 48
+    assert forecast["hours"][0]["status"] == "GREEN"
+    assert forecast["hours"][-1]["status"] == "RED"
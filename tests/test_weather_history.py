@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from src.services.weather_history import HISTORY_METRICS, RingSeries, WeatherHistory, rollup
+
+
+def _payload(when, wave_height, status="GREEN", **extra):
+    payload = {"timestamp": when.isoformat(), "status": status, "waveHeight": wave_height,
+               "windSpeed": 10, "source": "stormglass_api"}
+    payload.update(extra)
+    return payload
+
+
+def test_ring_series_keeps_latest_readings_in_order():
+    series = RingSeries(capacity=3)
+    values = [0.0] * len(HISTORY_METRICS)
+    for timestamp in (10, 20, 30, 40):
+        assert series.append(timestamp, values, 0)
+
+    assert series.append(5, values, 0) is False
+    series.append(40, [1.0] * len(HISTORY_METRICS), 2)
+
+    times, rows, status = series.ordered()
+    assert times.tolist() == [20, 30, 40]
+    assert rows[-1, 0] == 1.0 and status.tolist() == [0, 0, 2]
+    assert series.ordered(start=25, end=40)[0].tolist() == [30]
+
+
+def test_rollup_min_max_avg_and_worst_status():
+    times = np.array([0, 600, 3600, 4000], dtype=np.int64)
+    values = np.array([[1.0], [3.0], [np.nan], [2.0]], dtype=np.float32)
+    status = np.array([0, 1, 2, 0], dtype=np.uint8)
+
+    result = rollup(times, values, status, 3600)
+    assert result["times"].tolist() == [0, 3600]
+    assert result["count"].tolist() == [2, 2]
+    assert result["min"][:, 0].tolist() == [1.0, 2.0]
+    assert result["max"][:, 0].tolist() == [3.0, 2.0]
+    assert result["avg"][:, 0].tolist() == [2.0, 2.0]
+    assert result["status"].tolist() == [1, 2]
+
+
+def test_history_query_and_hourly_rollup():
+    history = WeatherHistory(capacity=100)
+    now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    history.record("berlengas", _payload(now - timedelta(hours=30), 2.0, "RED"))
+    history.record("berlengas", _payload(now - timedelta(minutes=50), 0.5))
+    history.record("berlengas", _payload(now - timedelta(minutes=40), 1.5, "YELLOW"))
+    assert history.record("berlengas", _payload(now, 9.9, source="mock_data")) is False
+
+    points = history.query("berlengas", hours=24)
+    assert [point["waveHeight"] for point in points] == [0.5, 1.5]
+    assert points[1]["status"] == "YELLOW"
+
+    [hour] = history.query("berlengas", hours=24, bucket="1h")
+    assert hour["count"] == 2
+    assert hour["waveHeight"] == {"min": 0.5, "max": 1.5, "avg": 1.0}
+    assert hour["worst_status"] == "YELLOW"
+    assert hour["gust"] == {"min": None, "max": None, "avg": None}
+
+
+def test_backfill_runs_once_and_keeps_recent_readings():
+    history = WeatherHistory(capacity=100)
+    now = datetime.utcnow()
+    history.record("peniche", _payload(now - timedelta(minutes=5), 0.7))
+    calls = []
+
+    def fetch(location, hours):
+        calls.append((location, hours))
+        return [_payload(now - timedelta(hours=h), 1.0) for h in (3, 2, 1)]
+
+    assert history.backfill("peniche", 24, fetch) == 3
+    assert history.backfill("peniche", 24, fetch) == 0
+    assert calls == [("peniche", 24)]
+    assert [point["waveHeight"] for point in history.query("peniche", 24)] == [1.0, 1.0, 1.0, 0.7]
+
+
+def test_failed_backfill_is_retried():
+    history = WeatherHistory(capacity=100)
+    now = datetime.utcnow()
+    calls = []
+
+    def flaky_fetch(location, hours):
+        calls.append(location)
+        if len(calls) == 1:
+            raise RuntimeError("Erro ao obter histórico meteorológico: 503")
+        return [_payload(now - timedelta(hours=2), 1.0)]
+
+    assert history.backfill("peniche", 24, flaky_fetch) == 0
+    assert history.backfill("peniche", 24, flaky_fetch) == 1
+    assert history.backfill("peniche", 24, flaky_fetch) == 0
+    assert len(calls) == 2
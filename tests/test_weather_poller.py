@@ -0,0 +1,113 @@
+from src.services.weather_poller import POLLER_LEASE_KEY, WeatherPoller, parse_intervals
+from src.services.weather_store import SharedWeatherStore
+
+
+class FakeWeather:
+    def __init__(self):
+        self.locations = {"berlengas": {}, "peniche": {}}
+        self.readings = {}
+
+    def get_weather_data(self, location, track=True):
+        return self.readings.get(location)
+
+
+class FakeNotifier:
+    def __init__(self):
+        self.sent = []
+
+    def send_notification(self, title, message):
+        self.sent.append(message)
+
+
+def _reading(wave_height, source="stormglass_api"):
+    return {"location": "Berlengas", "waveHeight": wave_height, "windSpeed": 5, "gust": 8,
+            "precipitation": 0, "visibility": 10, "source": source}
+
+
+def _poller(**kwargs):
+    weather, notifier = FakeWeather(), FakeNotifier()
+    poller = WeatherPoller(weather=weather, notifier=notifier, default_interval=60, **kwargs)
+    return poller, weather, notifier
+
+
+def test_first_reading_sets_baseline_without_notifying():
+    poller, _weather, notifier = _poller()
+
+    assert poller.observe("berlengas", _reading(0.5)) is None
+    assert poller.sites["berlengas"]["status"] == "GREEN"
+    assert notifier.sent == []
+
+
+def test_transition_needs_confirmations():
+    poller, _weather, notifier = _poller(confirmations=2)
+    poller.observe("berlengas", _reading(0.5))
+
+    assert poller.observe("berlengas", _reading(1.5)) is None
+    assert poller.observe("berlengas", _reading(1.5)) == {"location": "berlengas", "from": "GREEN", "to": "YELLOW"}
+    assert notifier.sent == ["Berlengas agora YELLOW"]
+
+
+def test_cached_payload_read_again_is_not_a_confirmation():
+    poller, _weather, notifier = _poller(confirmations=2)
+    poller.observe("berlengas", dict(_reading(0.5), timestamp="t0"))
+
+    cached = dict(_reading(1.5), timestamp="t1")
+    assert poller.observe("berlengas", cached) is None
+    assert poller.observe("berlengas", cached) is None
+    assert poller.sites["berlengas"]["status"] == "GREEN"
+
+    assert poller.observe("berlengas", dict(_reading(1.5), timestamp="t2"))["to"] == "YELLOW"
+    assert notifier.sent == ["Berlengas agora YELLOW"]
+
+
+def test_readings_near_threshold_do_not_flap():
+    poller, _weather, notifier = _poller(confirmations=1, margin=0.1)
+    poller.observe("berlengas", _reading(0.5))
+    poller.observe("berlengas", _reading(1.25))  # acima de 1.2: YELLOW
+
+    # 1.15 já é GREEN pelos limites normais, mas não passa 1.2 com 10% de folga
+    for wave_height in (1.15, 1.25, 1.15, 1.1):
+        poller.observe("berlengas", _reading(wave_height))
+    assert poller.sites["berlengas"]["status"] == "YELLOW"
+
+    poller.observe("berlengas", _reading(1.0))
+    assert poller.sites["berlengas"]["status"] == "GREEN"
+    assert notifier.sent == ["Berlengas agora YELLOW", "Berlengas agora GREEN"]
+
+
+def test_poll_once_respects_intervals_and_ignores_mock_data():
+    poller, weather, notifier = _poller(confirmations=1, intervals={"peniche": 300})
+    weather.readings = {"berlengas": _reading(0.5), "peniche": _reading(0.5)}
+    poller.poll_once(now=0)
+
+    weather.readings = {"berlengas": _reading(2.5, source="mock_data"), "peniche": _reading(2.5)}
+    assert poller.poll_once(now=30) == []
+    assert poller.poll_once(now=60) == []
+    assert [t["location"] for t in poller.poll_once(now=300)] == ["peniche"]
+    assert poller.sites["berlengas"]["status"] == "GREEN"
+    assert len(notifier.sent) == 1
+
+
+def test_lease_is_renewed_before_each_site_and_round_stops_when_lost(tmp_path):
+    path = str(tmp_path / "weather_cache.db")
+    store, other_worker = SharedWeatherStore(path), SharedWeatherStore(path)
+    poller, weather, _notifier = _poller(store=store, lease_seconds=30)
+    weather.readings = {"berlengas": _reading(0.5), "peniche": _reading(0.5)}
+
+    def read(location, track=True):
+        # Durante a leitura o lease continua com este worker
+        assert not other_worker.acquire_lease(POLLER_LEASE_KEY, 30)
+        return weather.readings.get(location)
+
+    weather.get_weather_data = read
+    assert store.acquire_lease(POLLER_LEASE_KEY, 30)
+    poller.poll_once(now=0, renew=poller._renew_lease)
+    assert set(poller.sites) == {"berlengas", "peniche"}
+
+    renewals = iter([True, False])
+    poller.poll_once(now=60, renew=lambda: next(renewals))
+    assert poller.polls == 3
+
+
+def test_parse_intervals():
+    assert parse_intervals("Berlengas=600, peniche=1200,,bad") == {"berlengas": 600.0, "peniche": 1200.0}
@@ -1,3 +1,7 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
 import pytest
 from unittest.mock import patch
 
@@ -44,3 +48,85 @@ def test_force_status_invalid_status():
     with pytest.raises(ValueError):
         service.force_status("peniche", "BLUE")
 
+
+
+def test_get_weather_data_serves_stale_entry_and_refreshes_in_background():
+    service = WeatherService()
+    with patch("src.utils.cache.time.monotonic", return_value=1000.0):
+        service._cache.set("berlengas", {"old": True})
+
+    with patch("src.utils.cache.time.monotonic", return_value=1000.0 + service._cache_duration + 60), \
+         patch.object(service, "_refresh_in_background") as refresh_mock:
+        result = service.get_weather_data("berlengas")
+
+    assert result == {"old": True}
+    refresh_mock.assert_called_once_with("berlengas")
+
+    with patch.object(service, "_fetch_stormglass_data", return_value={"hours": [{}]}), \
+         patch.object(service, "_process_weather_data", return_value={"new": True}):
+        service._refresh("berlengas")
+
+    assert service.get_weather_data("berlengas") == {"new": True}
+    assert service.get_cache_stats()["refreshes"] == 1
+
+
+def test_get_all_locations_weather_runs_concurrently_and_respects_deadline():
+    service = WeatherService()
+    release = threading.Event()
+
+    def fetch(location):
+        if location == "sesimbra":
+            release.wait(5)
+        return {"hours": [{}]}
+
+    def process(raw_data, location, forecast=None):
+        return {"location": location.title(), "source": "stormglass_api"}
+
+    with patch.object(service, "_fetch_stormglass_data", side_effect=fetch), \
+         patch.object(service, "_process_weather_data", side_effect=process):
+        started = time.monotonic()
+        results = service.get_all_locations_weather(deadline=0.2)
+        elapsed = time.monotonic() - started
+        release.set()
+
+    assert elapsed < 1
+    assert [r["location"] for r in results] == ["Berlengas", "Peniche", "Sesimbra"]
+    assert [r["data_source"] for r in results] == ["live", "live", "mock"]
+
+
+def test_failed_refresh_serves_old_data_instead_of_mock():
+    service = WeatherService()
+
+    with patch("src.utils.cache.time.monotonic", return_value=1000.0):
+        service._cache.set("peniche", {"ok": "old"})
+    too_old = 1000.0 + service.refresh_interval("peniche") + service._max_stale + 60
+
+    with patch("src.utils.cache.time.monotonic", return_value=too_old), \
+         patch.object(service, "_fetch_stormglass_data", return_value=None):
+        data, source = service._get_weather_with_source("peniche")
+
+    assert (data, source) == ({"ok": "old"}, "stale")
+
+
+def test_exhausted_quota_skips_stormglass_request():
+    service = WeatherService()
+    service.quota.record_call(402)
+
+    with patch.object(service, "_fetch_stormglass_data") as fetch_mock:
+        assert service._fetch_and_cache("peniche", priority=True) is None
+
+    fetch_mock.assert_not_called()
+    assert service.refresh_interval("peniche") == service.quota.max_interval
+
+
+def test_next_update_follows_the_site_refresh_interval():
+    service = WeatherService()
+    now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    raw = {"hours": [{"time": (now + timedelta(hours=i)).isoformat() + "+00:00",
+                      "waveHeight": {"sg": 0.7}} for i in range(3)]}
+    service.quota.record_call(402)
+
+    data = service._process_weather_data(raw, "peniche")
+    next_update = datetime.fromisoformat(data["next_update"]) - datetime.fromisoformat(data["timestamp"])
+
+    assert abs(next_update.total_seconds() - service.quota.max_interval) < 5
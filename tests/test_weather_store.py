@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from src.services.weather_service import WeatherService
+from src.services.weather_store import SharedWeatherStore
+
+
+def test_fresh_worker_serves_data_fetched_by_another_worker():
+    now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    raw = {
+        "hours": [
+            {"time": (now + timedelta(hours=i)).isoformat() + "+00:00", "waveHeight": {"sg": 0.7}}
+            for i in range(72)
+        ]
+    }
+    first, second = WeatherService(), WeatherService()
+
+    with patch.object(first, "_request_stormglass_data", return_value=raw):
+        live = first.get_weather_data("peniche")
+
+    with patch.object(second, "_request_stormglass_data") as fetch_mock:
+        data, source = second._get_weather_with_source("peniche")
+        forecast = second.get_forecast("peniche", now, now + timedelta(hours=72))
+
+    fetch_mock.assert_not_called()
+    assert source == "cached"
+    assert data == live
+    assert len(forecast["hours"]) == 72
+    assert second.get_cache_stats()["shared_loads"] == 1
+
+
+def test_lease_is_exclusive_until_released(tmp_path):
+    path = str(tmp_path / "weather_cache.db")
+    worker_a, worker_b = SharedWeatherStore(path), SharedWeatherStore(path)
+
+    assert worker_a.acquire_lease("berlengas", 30)
+    assert not worker_b.acquire_lease("berlengas", 30)
+    worker_a.release_lease("berlengas")
+    assert worker_b.acquire_lease("berlengas", 30)
+
+
+def test_cold_miss_waits_for_the_worker_holding_the_lease():
+    first, second = WeatherService(), WeatherService()
+    second._lease_poll = 0.01
+    assert first._store.acquire_lease("peniche", 30)
+
+    def other_worker_finishes(*_args):
+        # Enquanto o segundo worker espera, o primeiro grava o resultado
+        first._save_to_store("peniche", {"location": "Peniche", "source": "stormglass_api"}, [])
+        first._store.release_lease("peniche")
+
+    with patch.object(second, "_request_stormglass_data") as fetch_mock, \
+         patch("src.services.weather_service.time.sleep", side_effect=other_worker_finishes):
+        data, source = second._get_weather_with_source("peniche")
+
+    fetch_mock.assert_not_called()
+    assert (data["location"], source) == ("Peniche", "cached")
+
+
+def test_invalidate_clears_shared_store_and_history():
+    first, second = WeatherService(), WeatherService()
+    payload = {"location": "Peniche", "source": "stormglass_api",
+               "timestamp": datetime.utcnow().isoformat(), "waveHeight": 0.7}
+    first._cache.set("peniche", payload)
+    first._save_to_store("peniche", payload, [])
+    first.history.record("peniche", payload)
+
+    first.invalidate("peniche")
+
+    assert first._store.get("current:peniche") is None
+    assert not second._load_from_store("peniche")
+    assert first.history.query("peniche") == []
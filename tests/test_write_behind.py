@@ -0,0 +1,149 @@
+import os
+
+from src.services.write_behind import WriteBehindBuffer
+
+
+def test_flush_sends_batches_and_requeues_on_failure():
+    sent = []
+    outcomes = [False, True, True]
+
+    def flush_fn(rows):
+        sent.append(list(rows))
+        return outcomes.pop(0)
+
+    buffer = WriteBehindBuffer("weather_history", flush_fn, batch_size=2, flush_interval_ms=60000)
+    buffer._ensure_started = lambda: None
+    for i in range(3):
+        buffer.append({"n": i})
+
+    assert buffer.flush() == 0
+    assert buffer.stats()["queued"] == 3
+    assert buffer.flush() == 3
+    assert sent[1:] == [[{"n": 0}, {"n": 1}], [{"n": 2}]]
+    assert buffer.stats()["failures"] == 1
+
+
+def test_overflow_spills_to_disk_and_is_replayed(tmp_path):
+    sent = []
+    buffer = WriteBehindBuffer(
+        "message_history",
+        lambda rows: sent.extend(rows) or True,
+        batch_size=10,
+        max_queue=1,
+        spill_path=str(tmp_path / "message_history.ndjson"),
+    )
+    buffer._ensure_started = lambda: None
+
+    assert buffer.append({"n": 1})
+    assert buffer.append({"n": 2})
+    assert buffer.stats()["spilled"] == 1
+
+    buffer.flush()
+    assert sent == [{"n": 1}, {"n": 2}]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_rows_spilled_while_draining_are_not_lost(tmp_path):
+    sent = []
+    buffer = WriteBehindBuffer(
+        "message_history", lambda rows: True, batch_size=10, max_queue=0,
+        spill_path=str(tmp_path / "message_history.ndjson"),
+    )
+    buffer._ensure_started = lambda: None
+    buffer.append({"n": 1})
+
+    def flush_fn(rows):
+        sent.extend(rows)
+        # Outra thread enche a fila enquanto o ficheiro é enviado
+        if len(sent) == 1:
+            buffer.append({"n": 2})
+        return True
+
+    buffer.flush_fn = flush_fn
+    buffer.flush()
+    assert sent == [{"n": 1}, {"n": 2}]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_only_failed_rows_are_requeued():
+    sent = []
+
+    def flush_fn(rows):
+        sent.append(list(rows))
+        # O grupo com "kind" falha, o resto é gravado
+        return [row for row in rows if "kind" in row] if len(sent) == 1 else True
+
+    buffer = WriteBehindBuffer("message_history", flush_fn, batch_size=10, flush_interval_ms=60000)
+    buffer._ensure_started = lambda: None
+    buffer.append({"n": 1})
+    buffer.append({"n": 2, "kind": "x"})
+
+    assert buffer.flush() == 1
+    assert buffer.stats()["queued"] == 1
+    assert buffer.flush() == 1
+    assert sent[1] == [{"n": 2, "kind": "x"}]
+
+
+def test_failed_flush_backs_off_exponentially():
+    buffer = WriteBehindBuffer(
+        "weather_history", lambda rows: False,
+        batch_size=1, flush_interval_ms=1000, max_backoff_ms=3000,
+    )
+    buffer._ensure_started = lambda: None
+    buffer.append({"n": 1})
+
+    backoffs = []
+    for _ in range(4):
+        buffer.flush()
+        backoffs.append(buffer.stats()["backoff"])
+    assert backoffs == [1.0, 2.0, 3.0, 3.0]
+
+    buffer.flush_fn = lambda rows: True
+    buffer.flush()
+    assert buffer.stats()["backoff"] == 0.0
+
+
+def test_spill_is_kept_until_sent_and_recovered_on_startup(tmp_path):
+    spill_path = tmp_path / "weather_history.ndjson"
+    spill_path.write_text('{"n": 1}\n{"n": 2}\n{"n": 3}\n')
+    outcomes = [True, False]
+    sent = []
+
+    def flush_fn(rows):
+        sent.append(list(rows))
+        return outcomes.pop(0) if outcomes else True
+
+    buffer = WriteBehindBuffer("weather_history", flush_fn, batch_size=1, spill_path=str(spill_path))
+    buffer.stop()
+
+    # O segundo lote falhou: as linhas em falta ficam no ficheiro do processo
+    draining = tmp_path / f"weather_history.ndjson.{os.getpid()}.flushing"
+    assert sent == [[{"n": 1}], [{"n": 2}]]
+    assert draining.read_text().splitlines() == ['{"n": 2}', '{"n": 3}']
+
+    # Um novo processo retoma o ficheiro deixado por um processo que terminou
+    draining.rename(tmp_path / "weather_history.ndjson.999999999.flushing")
+    recovered = []
+    restarted = WriteBehindBuffer(
+        "weather_history", lambda rows: recovered.extend(rows) or True,
+        batch_size=1, spill_path=str(spill_path),
+    )
+    restarted.stop()
+    assert recovered == [{"n": 2}, {"n": 3}]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_spill_files_of_live_processes_are_left_alone(tmp_path):
+    # O ficheiro pertence ao processo pai, que continua em execução
+    other = tmp_path / f"message_history.ndjson.{os.getppid()}"
+    other.write_text('{"n": 1}\n')
+    sent = []
+    buffer = WriteBehindBuffer(
+        "message_history", lambda rows: sent.extend(rows) or True,
+        spill_path=str(tmp_path / "message_history.ndjson"),
+    )
+    buffer._ensure_started = lambda: None
+
+    buffer.flush()
+    assert sent == []
+    assert other.exists()